@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+"""
+BORIS
+Behavioral Observation Research Interactive Software
+Copyright 2012-2016 Olivier Friard
+
+This file is part of BORIS.
+
+  BORIS is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 3 of the License, or
+  any later version.
+
+  BORIS is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not see <http://www.gnu.org/licenses/>.
+
+"""
+
+try:
+    from PyQt5.QtCore import *
+    from PyQt5.QtWidgets import *
+except:
+    from PyQt4.QtCore import *
+    from PyQt4.QtGui import *
+
+import sys
+import logging
+import multiprocessing
+import concurrent.futures
+
+from config import *
+import cancellation
+
+
+class AnalysisScheduler():
+    """
+    run the analysis of observations in a pool of processes
+
+    a task is run for each observation, the results are returned in order of tasks.
+    The GUI is kept responsive with a progress dialog that allows to cancel the analysis.
+    The functions of tasks must be defined at module level and must not use Qt.
+    When the analysis is cancelled the waiting tasks are cancelled and the running tasks
+    are notified (see cancellation.cancelled), so that they do not write files.
+    Each analysis is numbered: the tasks of a cancelled analysis still running during the next analysis stay cancelled.
+    """
+
+    def __init__(self, maxWorkers=0):
+        self.maxWorkers = maxWorkers if maxWorkers else multiprocessing.cpu_count()
+        self.executor = None
+        self.runs = 0   # number of the last analysis
+        self.cancelledRun = multiprocessing.Value("q", 0)   # number of the last analysis cancelled
+
+
+    def shutdown(self):
+        """
+        terminate the pool of processes
+        """
+        if self.executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+
+    def error(self, parent, progress, exception):
+        logging.critical("analysis error: {}".format(exception))
+        progress.close()
+        QMessageBox.critical(parent, programName, "Error during analysis:\n{}".format(exception))
+
+
+    def run(self, parent, label, function, tasks):
+        """
+        run function(*args) for each args of tasks and show progress
+
+        returns list of results in order of tasks
+        returns None if analysis was cancelled or failed
+        """
+
+        progress = QProgressDialog(label, "Cancel", 0, len(tasks), parent)
+        progress.setWindowTitle(programName)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+
+        # a single task is not worth the transfer to another process
+        if len(tasks) < 2 or self.maxWorkers < 2:
+            results = []
+            for idx, args in enumerate(tasks):
+                progress.setValue(idx)
+                QApplication.processEvents()
+                if progress.wasCanceled():
+                    return None
+                try:
+                    results.append(function(*args))
+                except:
+                    self.error(parent, progress, sys.exc_info()[1])
+                    return None
+            progress.setValue(len(tasks))
+            return results
+
+        if self.executor is None:
+            self.executor = concurrent.futures.ProcessPoolExecutor(self.maxWorkers, initializer=cancellation.init,
+                                                                   initargs=(self.cancelledRun,))
+
+        self.runs += 1
+        futures = [self.executor.submit(cancellation.run, self.runs, function, *args) for args in tasks]
+        pending = set(futures)
+
+        while pending:
+            done, pending = concurrent.futures.wait(pending, timeout=0.05, return_when=concurrent.futures.FIRST_COMPLETED)
+            progress.setValue(len(futures) - len(pending))
+            QApplication.processEvents()
+
+            if progress.wasCanceled():
+                logging.debug("analysis cancelled")
+                self.cancelledRun.value = self.runs
+                for future in pending:
+                    future.cancel()
+                return None
+
+            for future in done:
+                if future.exception() is not None:
+                    for f in pending:
+                        f.cancel()
+                    self.error(parent, progress, future.exception())
+                    # the pool can not be used after a crash of a process
+                    if isinstance(future.exception(), concurrent.futures.process.BrokenProcessPool):
+                        self.shutdown()
+                    return None
+
+        progress.setValue(len(tasks))
+
+        return [future.result() for future in futures]
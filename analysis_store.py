@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+"""
+BORIS
+Behavioral Observation Research Interactive Software
+Copyright 2012-2016 Olivier Friard
+
+This file is part of BORIS.
+
+  BORIS is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 3 of the License, or
+  any later version.
+
+  BORIS is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not see <http://www.gnu.org/licenses/>.
+
+"""
+
+import sqlite3
+import logging
+
+from config import *
+
+
+class AnalysisStore():
+    """
+    sqlite database with the events of all observations of a project for analysis
+
+    events of an observation are loaded once and reloaded only when the observation was invalidated
+    or when its events list was replaced.
+    The events of the selected observations, subjects and behaviors are accessible in the events view
+    """
+
+    def __init__(self):
+
+        self.db = sqlite3.connect(":memory:")
+        self.db.row_factory = sqlite3.Row
+        self.cursor = self.db.cursor()
+
+        self.cursor.execute("CREATE TABLE all_events (observation TEXT, subject TEXT, code TEXT, type TEXT, modifiers TEXT, occurence FLOAT, comment TEXT)")
+        self.cursor.execute("CREATE INDEX observation_idx ON all_events (observation, subject, code, modifiers, occurence)")
+        self.cursor.execute("CREATE INDEX subject_idx ON all_events (subject, code, modifiers, occurence)")
+
+        self.loaded = {}   # observation id -> (events list, number of events) when loaded
+        self.stateBehaviorsCodes = set()
+
+
+    def invalidate(self, obsId):
+        """
+        events of observation were modified
+        """
+        if obsId in self.loaded:
+            del self.loaded[obsId]
+
+
+    def update(self, pj, selectedObservations):
+        """
+        load events of selected observations that are not loaded or were modified
+        remove events of observations that were modified or removed
+        reload all events if the state behaviors changed
+        """
+
+        stateBehaviorsCodes = set([pj[ETHOGRAM][x]["code"] for x in pj[ETHOGRAM] if STATE in pj[ETHOGRAM][x][TYPE].upper()])
+        if stateBehaviorsCodes != self.stateBehaviorsCodes:
+            self.stateBehaviorsCodes = stateBehaviorsCodes
+            self.loaded = {}
+            self.cursor.execute("DELETE FROM all_events")
+
+        for obsId in list(self.loaded.keys()):
+            events, length = self.loaded[obsId]
+            if obsId not in pj[OBSERVATIONS] or pj[OBSERVATIONS][obsId][EVENTS] is not events or len(events) != length:
+                self.cursor.execute("DELETE FROM all_events WHERE observation = ?", (obsId,))
+                del self.loaded[obsId]
+
+        for obsId in selectedObservations:
+            if obsId in self.loaded or obsId not in pj[OBSERVATIONS]:
+                continue
+
+            logging.debug("load events of {} in analysis store".format(obsId))
+
+            events = pj[OBSERVATIONS][obsId][EVENTS]
+            self.cursor.execute("DELETE FROM all_events WHERE observation = ?", (obsId,))
+            self.cursor.executemany("INSERT INTO all_events (observation, subject, code, type, modifiers, occurence, comment) VALUES (?,?,?,?,?,?,?)",
+                                    [(obsId,
+                                      NO_FOCAL_SUBJECT if event[EVENT_SUBJECT_FIELD_IDX] == "" else event[EVENT_SUBJECT_FIELD_IDX],
+                                      event[EVENT_BEHAVIOR_FIELD_IDX],
+                                      STATE if event[EVENT_BEHAVIOR_FIELD_IDX] in self.stateBehaviorsCodes else POINT,
+                                      event[EVENT_MODIFIER_FIELD_IDX],
+                                      float(event[EVENT_TIME_FIELD_IDX]),
+                                      event[COMMENT_EVENT_FIELD_IDX]) for event in events])
+            self.loaded[obsId] = (events, len(events))
+
+        self.db.commit()
+
+
+    def select(self, pj, selectedSubjects, selectedObservations, selectedBehaviors):
+        """
+        update the store and define the events view with the selected subjects, observations and behaviors
+        return cursor
+        """
+
+        self.update(pj, selectedObservations)
+
+        for table, column, values in (("selected_observations", "observation", selectedObservations),
+                                      ("selected_subjects", "subject", selectedSubjects),
+                                      ("selected_codes", "code", selectedBehaviors)):
+            self.cursor.execute("DROP TABLE IF EXISTS {}".format(table))
+            self.cursor.execute("CREATE TEMP TABLE {} ({} TEXT PRIMARY KEY)".format(table, column))
+            self.cursor.executemany("INSERT OR IGNORE INTO {} VALUES (?)".format(table), [(x,) for x in values])
+
+        self.cursor.execute("DROP VIEW IF EXISTS events")
+        self.cursor.execute("""CREATE TEMP VIEW events AS
+                               SELECT observation, subject, code, type, modifiers, occurence, comment FROM all_events
+                               WHERE observation IN (SELECT observation FROM selected_observations)
+                                 AND subject IN (SELECT subject FROM selected_subjects)
+                                 AND code IN (SELECT code FROM selected_codes)""")
+        self.db.commit()
+
+        return self.cursor
@@ -26,7 +26,6 @@ This file is part of BORIS.
 __version__ = "2.98"
 __version_date__ = "2016-05-27"
 __DEV__ = False
-BITMAP_EXT = "jpg"
 
 
 import os
@@ -84,7 +83,6 @@ import qrc_boris
 video, live = 0, 1
 
 import time
-import json
 from decimal import *
 import re
 import hashlib
@@ -95,7 +93,8 @@ import urllib.request
 import urllib.error
 import tempfile
 import glob
-import statistics
+import multiprocessing
+import concurrent.futures
 
 import dialog
 if QT_VERSION_STR[0] == "4":
@@ -111,9 +110,21 @@ import coding_map
 import map_creator
 import select_modifiers
 from utilities import *
-import tablib
 import observations_list
 import plot_spectrogram
+import frame_reader
+import media_analysis
+import media_timeline
+import event_index
+import events_model
+import analysis_store
+import time_budget_analysis
+import project_functions
+import project_journal
+import project_saver
+import export_functions
+import analysis_scheduler
+import clip_extraction
 
 from config import *
 
@@ -217,6 +228,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
     behaviouralStringsSeparator = '|'
 
     duration = []
+    mediaTimeline = media_timeline.MediaTimeline([])   # start times of media files of player #1 (ms)
 
     simultaneousMedia = False # if second player was created
 
@@ -248,6 +260,10 @@ class MainWindow(QMainWindow, Ui_MainWindow):
     ffmpeg_bin = ''
     ffmpeg_cache_dir = ''
     ffmpeg_cache_dir_max_size = 0
+    frameCacheSize = frame_reader.FRAME_CACHE_DEFAULT_SIZE   # Mb
+    prefetchForward = frame_reader.PREFETCH_FORWARD   # frames decoded in advance after the current frame
+    prefetchBackward = frame_reader.PREFETCH_BACKWARD   # frames decoded in advance before the current frame
+    frameIndex = False   # use the timestamps of frames in frame-by-frame mode
 
     # dictionary for FPS storing
     fps = {}
@@ -257,6 +273,8 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
     # spectrogram
     chunk_length = 60  # spectrogram chunk length in seconds
+    spectrogramService = None  # background rendering of spectrogram chunks
+    spectroOverview = None  # zoomable view of the spectrogram of the whole media
 
     memMedia = ""
 
@@ -362,13 +380,43 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.lbSpeed.setMinimumWidth(40)
         self.statusbar.addPermanentWidget(self.lbSpeed)
 
+        # project saving in background
+        self.lbSaving = QLabel("Saving project...")
+        self.lbSaving.setFrameStyle(QFrame.StyledPanel)
+        self.lbSaving.setVisible(False)
+        self.statusbar.addPermanentWidget(self.lbSaving)
+
         # set painter for twEvents to highlight current row
         self.twEvents.setItemDelegate(StyledItemDelegateTriangle(self.twEvents))
 
-        self.twEvents.setColumnCount( len(tw_events_fields) )
-        self.twEvents.setHorizontalHeaderLabels(tw_events_fields)
-
-        self.imagesList = set()
+        # events of current observation
+        self.eventsModel = events_model.EventsModel(self)
+        self.twEvents.setModel(self.eventsModel)
+
+        # changes of events not yet saved in the project file
+        self.journal = project_journal.ProjectJournal()
+        self.eventsModel.journal = self.journal
+        # hash of project without events when loaded or saved (the other changes are not recorded in the journal)
+        self.savedMetadata = None
+
+        self.projectSaver = project_saver.ProjectSaver(self)
+        self.projectSaver.saved.connect(self.project_saved)
+
+        # events of all observations for analysis
+        self.analysisStore = analysis_store.AnalysisStore()
+        # events modified from the events table
+        self.eventsModel.rowsInserted.connect(lambda: self.analysisStore.invalidate(self.eventsModel.observationId))
+        self.eventsModel.rowsRemoved.connect(lambda: self.analysisStore.invalidate(self.eventsModel.observationId))
+        self.eventsModel.dataChanged.connect(lambda: self.analysisStore.invalidate(self.eventsModel.observationId))
+
+        # analysis of observations in parallel
+        self.analysisScheduler = analysis_scheduler.AnalysisScheduler()
+
+        self.frameReaders = {}   # FFmpeg frame readers by media file
+        self.frameIndexes = {}   # timestamps of frames by media file
+        self.frameTimeline = None   # first frame of media files of player #1 (from the timestamps of frames)
+        self.frameCache = frame_reader.FrameCache(self.frameCacheSize)
+        self.framePrefetcher = None
         self.FFmpegGlobalFrame = 0
 
         self.menu_options()
@@ -461,6 +509,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.actionCheckStateEvents.setEnabled(flagObs)
 
         self.actionShow_spectrogram.setEnabled(flagObs)
+        self.actionSpectrogram_overview.setEnabled(flagObs)
         self.actionDistance.setEnabled(flagObs and (self.playMode == FFMPEG))
 
 
@@ -554,6 +603,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         # menu Tools
         self.actionMapCreator.triggered.connect(self.map_creator)
         self.actionShow_spectrogram.triggered.connect(self.show_spectrogram)
+        self.actionSpectrogram_overview.triggered.connect(self.show_spectrogram_overview)
         self.actionDistance.triggered.connect(self.distance)
 
         # menu Analyze
@@ -588,7 +638,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.actionFrame_forward.triggered.connect(self.frame_forward)
 
         # table Widget double click
-        self.twEvents.itemDoubleClicked.connect(self.twEvents_doubleClicked)
+        self.twEvents.doubleClicked.connect(self.twEvents_doubleClicked)
         self.twEthogram.itemDoubleClicked.connect(self.twEthogram_doubleClicked)
         self.twSubjects.itemDoubleClicked.connect(self.twSubjects_doubleClicked)
 
@@ -726,106 +776,76 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             print("time offset not recognized!")
             return
 
-        flagUnpairedEventFound = False
+        # number of ffmpeg processes running in parallel
+        nWorkers, ok = QInputDialog.getInt(self, "Extract sequences", "Number of ffmpeg processes running in parallel:", multiprocessing.cpu_count(), 1, 256, 1)
+        if not ok:
+            return
 
         cursor = self.loadEventsInDB(plot_parameters["selected subjects"], selectedObservations, plot_parameters["selected behaviors"])
 
-        for obsId in selectedObservations:
-
-            for nplayer in [PLAYER1, PLAYER2]:
-
-                if not self.pj[OBSERVATIONS][obsId][FILE][nplayer]:
-                    continue
+        jobs, flagUnpairedEventFound = clip_extraction.extraction_jobs(self.pj, cursor, selectedObservations,
+                                                                       plot_parameters["selected subjects"],
+                                                                       plot_parameters["selected behaviors"],
+                                                                       timeOffset, exportDir)
 
-                duration1 = []   # in seconds
-                for mediaFile in self.pj[OBSERVATIONS][obsId][FILE][nplayer]:
-                    duration1.append(self.pj[OBSERVATIONS][obsId]["media_info"]["length"][mediaFile])
-
-                logging.debug("duration player {}: {}".format(nplayer, duration1))
-
-                for subject in plot_parameters["selected subjects"]:
-
-                    for behavior in plot_parameters["selected behaviors"]:
-
-                        cursor.execute("SELECT occurence FROM events WHERE observation = ? AND subject = ? AND code = ?", (obsId, subject, behavior))
-                        rows = [{"occurence":float2decimal(r["occurence"])}  for r in cursor.fetchall()]
-
-                        if STATE in self.eventType(behavior).upper() and len(rows) % 2:  # unpaired events
-                            flagUnpairedEventFound = True
-                            continue
-
-                        for idx, row in enumerate(rows):
+        # sequences already extracted (by an interrupted extraction)
+        extractedNb = len([job for job in jobs if os.path.isfile(job["output"])])
+        if extractedNb:
+            response = dialog.MessageDialog(programName, "{} of the {} sequences are already extracted in this directory.".format(extractedNb, len(jobs)),
+                                            ["Skip them", "Extract again", CANCEL])
+            if response == CANCEL:
+                return
+            if response == "Skip them":
+                jobs = [job for job in jobs if not os.path.isfile(job["output"])]
 
-                            mediaFileIdx = [idx1 for idx1, x in enumerate(duration1) if row["occurence"] >= sum(duration1[0:idx1])][-1]
+        extractor = clip_extraction.ClipExtractor(self.ffmpeg_bin)
 
-                            globalStart = Decimal("0.000") if row["occurence"] < timeOffset else round(row["occurence"] - timeOffset, 3)
-                            start = round(row["occurence"] - timeOffset - sum(duration1[0:mediaFileIdx]), 3)
-                            if start < timeOffset:
-                                start = Decimal("0.000")
+        progress = QProgressDialog("Extracting sequences", "Cancel", 0, len(jobs) * 100, self)
+        progress.setWindowTitle(programName)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
 
-                            if POINT in self.eventType(behavior).upper():
+        with concurrent.futures.ThreadPoolExecutor(nWorkers) as executor:
 
-                                #globalStart = Decimal("0.000") if row["occurence"] < timeOffset else round(row["occurence"] - timeOffset, 3)
-                                globalStop = round(row["occurence"] + timeOffset, 3)
-
-                                #start = round(row["occurence"] - timeOffset - sum(duration1[0:mediaFileIdx]), 3)
-                                #if start < timeOffset:
-                                #    start = Decimal("0.000")
-                                stop = round(row["occurence"] + timeOffset - sum(duration1[0:mediaFileIdx]))
-
-                                ffmpeg_command = """{ffmpeg_bin} -i "{input}" -y -ss {start} -to {stop} "{dir}{sep}{obsId}_{player}_{subject}_{behavior}_{globalStart}-{globalStop}{extension}" """\
-                                .format(ffmpeg_bin=ffmpeg_bin,
-                                        input=self.pj[OBSERVATIONS][obsId][FILE][nplayer][mediaFileIdx],
-                                        start=start,
-                                        stop=stop,
-                                        globalStart=globalStart,
-                                        globalStop=globalStop,
-                                        dir=exportDir,
-                                        sep=os.sep,
-                                        obsId=obsId,
-                                        player="PLAYER{}".format(nplayer),
-                                        subject=subject,
-                                        behavior=behavior,
-                                        extension=os.path.splitext(self.pj[OBSERVATIONS][obsId][FILE][nplayer][mediaFileIdx])[-1])
-
-                                logging.debug("ffmpeg command: {}".format( ffmpeg_command ))
-                                p = subprocess.Popen(ffmpeg_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-                                out, error = p.communicate()
+            futures = [executor.submit(extractor.extract, job) for job in jobs]
+            pending = set(futures)
 
+            while pending:
+                done, pending = concurrent.futures.wait(pending, timeout=0.1)
 
-                            if STATE in self.eventType(behavior).upper():
-                                if idx % 2 == 0:
+                running = extractor.running_progress()
+                progress.setValue(int((len(futures) - len(pending) + sum(running.values())) * 100))
+                progress.setLabelText("Extracting sequences: {} / {}\n{}".format(len(futures) - len(pending), len(futures),
+                                      "\n".join(["{}: {} %".format(os.path.basename(x), int(running[x] * 100)) for x in sorted(running)])))
+                QApplication.processEvents()
 
-                                    #globalStart = round(row["occurence"], 3)
-                                    globalStop = round(rows[idx + 1]["occurence"] + timeOffset, 3)
+                if progress.wasCanceled():
+                    for future in pending:
+                        future.cancel()
+                    extractor.cancel()
+                    break
 
-                                    #start = round(row["occurence"] - sum( duration1[0:mediaFileIdx]), 3)
-                                    stop = round(rows[idx + 1]["occurence"] + timeOffset - sum( duration1[0:mediaFileIdx]))
+        progress.close()
 
-                                    ffmpeg_command = """{ffmpeg_bin} -i "{input}" -y -ss {start} -to {stop} "{dir}{sep}{obsId}_{player}_{subject}_{behavior}_{globalStart}-{globalStop}{extension}" """.format(ffmpeg_bin=ffmpeg_bin,
-                                    input=self.pj[OBSERVATIONS][obsId][FILE][nplayer][mediaFileIdx],
-                                    start=start,
-                                    stop=stop,
-                                    globalStart=globalStart,
-                                    globalStop=globalStop,
-                                    dir=exportDir,
-                                    sep=os.sep,
-                                    obsId=obsId,
-                                    player="PLAYER{}".format(nplayer),
-                                    subject=subject,
-                                    behavior=behavior,
-                                    extension=os.path.splitext(self.pj[OBSERVATIONS][obsId][FILE][nplayer][mediaFileIdx])[-1])
+        errors = [future.result() for future in futures if not future.cancelled() and future.result()]
+        if errors:
+            logging.critical("\n".join(errors))
+            QMessageBox.critical(None, programName, "{} sequence(s) can not be extracted:\n{}".format(len(errors), "\n".join(errors[:10])),
+                                 QMessageBox.Ok | QMessageBox.Default, QMessageBox.NoButton)
 
-                                    logging.debug("ffmpeg command: {}".format(ffmpeg_command))
-                                    p = subprocess.Popen(ffmpeg_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-                                    out, error = p.communicate()
+        if flagUnpairedEventFound:
+            QMessageBox.warning(self, programName, "Some state events are not paired. They were excluded from extraction",
+                                QMessageBox.Ok | QMessageBox.Default, QMessageBox.NoButton)
 
-        self.statusbar.showMessage("Sequences extracted to {} directory".format(exportDir), 0)
+        if extractor.cancelled:
+            self.statusbar.showMessage("Extraction of sequences cancelled", 0)
+        else:
+            self.statusbar.showMessage("Sequences extracted to {} directory".format(exportDir), 0)
 
 
     def generate_spectrogram(self):
         """
-        generate spectrogram of all media files loaded in player #1
+        generate spectrogram of all media files loaded in player #1 in background
         """
 
         # check temp dir for images from ffmpeg
@@ -834,10 +854,19 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         else:
             tmp_dir = self.ffmpeg_cache_dir
 
-        import plot_spectrogram
-        for media in self.pj[OBSERVATIONS][self.observationId][FILE][PLAYER1]:
-            if os.path.isfile(media):
-                _ = plot_spectrogram.graph_spectrogram(mediaFile=media, tmp_dir=tmp_dir, chunk_size=self.chunk_length, ffmpeg_bin=self.ffmpeg_bin)  # return first chunk PNG file (not used)
+        if self.spectrogramService is None:
+            self.spectrogramService = plot_spectrogram.SpectrogramService(tmp_dir, self.chunk_length, self.ffmpeg_bin, self)
+            self.spectrogramService.pyramidReady.connect(self.spectrogram_overview_ready)
+        self.spectrogramService.start(self.pj[OBSERVATIONS][self.observationId][FILE][PLAYER1])
+
+
+    def stop_spectrogram_generation(self):
+        """
+        stop the background generation of spectrogram
+        """
+        if self.spectrogramService is not None:
+            self.spectrogramService.stop()
+            self.spectrogramService = None
 
 
     def show_spectrogram(self):
@@ -848,14 +877,10 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             self.spectro.show()
         except:
             logging.debug("spectro show not OK")
-            # remember if player paused
-            flagPaused = self.mediaListPlayer.get_state() == vlc.State.Paused
-            self.pause_video()
-
 
             if dialog.MessageDialog(programName, ("You chose to visualize the spectrogram during this observation.<br>"
                                                   "Choose YES to generate the spectrogram.\n\n"
-                                                  "Spectrogram generation can take some time for long media, be patient"), [YES, NO ]) == YES:
+                                                  "The spectrogram is generated in background"), [YES, NO ]) == YES:
 
                 self.generate_spectrogram()
 
@@ -869,15 +894,69 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
                 self.pj[OBSERVATIONS][self.observationId]["visualize_spectrogram"] = True
 
-                self.spectro = plot_spectrogram.Spectrogram("{}.wav.0-{}.spectrogram.png".format(currentMediaTmpPath, self.chunk_length))
+                self.spectro = plot_spectrogram.Spectrogram("{}.wav.0-{}.spectrogram.png".format(currentMediaTmpPath, self.chunk_length), chunkSize=self.chunk_length)
                 # connect signal from spectrogram class to testsignal function to receive keypress events
                 self.spectro.setWindowFlags(Qt.WindowStaysOnTopHint)
                 self.spectro.sendEvent.connect(self.signal_from_spectrogram)
                 self.spectro.show()
                 self.timer_spectro.start()
 
-            if not flagPaused:
-                self.play_video()
+
+    def current_media_path(self):
+        """
+        returns the path of the media file in player #1
+        """
+        return urllib.parse.unquote(url2path(self.mediaplayer.get_media().get_mrl()))
+
+
+    def show_spectrogram_overview(self):
+        """
+        show the zoomable spectrogram of the whole current media
+        the tiles of all zoom levels are generated in background (once for a media file)
+        """
+
+        if self.playerType != VLC:
+            QMessageBox.warning(self, programName, "The spectrogram visualization is not available for live observations")
+            return
+
+        mediaFile = self.current_media_path()
+
+        if self.spectroOverview:
+            self.spectroOverview.close()
+
+        self.spectroOverview = plot_spectrogram.SpectrogramOverview(mediaFile)
+        self.spectroOverview.setWindowFlags(Qt.WindowStaysOnTopHint)
+        self.spectroOverview.sendEvent.connect(self.signal_from_spectrogram)
+        self.spectroOverview.timeSelected.connect(self.spectrogram_overview_time_selected)
+        self.spectroOverview.show()
+
+        self.generate_spectrogram()
+        self.spectrogramService.build_pyramid(mediaFile)
+
+
+    def spectrogram_overview_ready(self, mediaFile, pyramidDir):
+        """
+        display the tiles of the spectrogram overview
+        """
+        if self.spectroOverview and self.spectroOverview.mediaFile == mediaFile:
+            self.spectroOverview.set_pyramid(pyramidDir)
+
+
+    def spectrogram_overview_time_selected(self, time_):
+        """
+        seek current media to the time double-clicked in the spectrogram overview
+        """
+
+        if self.playMode != VLC or self.current_media_path() != self.spectroOverview.mediaFile:
+            return
+
+        self.mediaplayer.set_time(int(time_ * 1000))
+
+        if self.simultaneousMedia:
+            # synchronize 2nd player
+            self.mediaplayer2.set_time(int(self.mediaplayer.get_time() - self.pj[OBSERVATIONS][self.observationId][TIME_OFFSET_SECOND_PLAYER] * 1000))
+
+        self.timer_out()
 
 
     def timer_spectro_out(self):
@@ -901,7 +980,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                 # get time in current media
                 currentMedia, frameCurrentMedia = self.getCurrentMediaByFrame(PLAYER1, self.FFmpegGlobalFrame, list(self.fps.values())[0] )
 
-                currentMediaTime = frameCurrentMedia / list(self.fps.values())[0] * 1000
+                currentMediaTime = self.media_frame_time(currentMedia, frameCurrentMedia, list(self.fps.values())[0])
 
         currentChunk = int(currentMediaTime / 1000 / self.chunk_length)
 
@@ -921,19 +1000,14 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
             currentChunkFileName = "{}.wav.{}-{}.spectrogram.png".format(currentMediaTmpPath, currentChunk * self.chunk_length, (currentChunk + 1) * self.chunk_length)
 
-            if not os.path.isfile(currentChunkFileName):
-                self.timer_spectro.stop()
-
-                if dialog.MessageDialog(programName, ("Spectrogram file not found.<br>"
-                                                      "Do you want to generate it now?<br>"
-                                                      "Spectrogram generation can take some time for long media, be patient"), [YES, NO ]) == YES:
-
-                    self.generate_spectrogram()
-                    self.timer_spectro.start()
-
-                return
+            if os.path.isfile(currentChunkFileName):
+                self.spectro.pixmap.load(currentChunkFileName)
+            else:
+                # the chunk is rendered in background (before the others), a placeholder is displayed until it is available
+                self.generate_spectrogram()
+                self.spectrogramService.prioritize(urllib.parse.unquote(url2path(self.mediaplayer.get_media().get_mrl())), currentChunk)
+                self.spectro.pixmap = self.spectro.placeholder()
 
-            self.spectro.pixmap.load(currentChunkFileName)
             self.spectro.w, self.spectro.h = self.spectro.pixmap.width(), self.spectro.pixmap.height()
 
             self.spectro.item = QGraphicsPixmapItem(self.spectro.pixmap)
@@ -941,12 +1015,13 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             self.spectro.scene.addItem(self.spectro.item)
             self.spectro.item.setPos(0, 0)
 
+            # the chunk will be loaded again while the placeholder is displayed
+            self.spectro.memChunk = currentChunk if os.path.isfile(currentChunkFileName) else None
+
         get_time = (currentMediaTime % (self.chunk_length * 1000) / (self.chunk_length*1000))
 
         self.spectro.item.setPos(-int(get_time * self.spectro.w), 0 )
 
-        self.spectro.memChunk = currentChunk
-
 
     def map_creator(self):
         """
@@ -989,7 +1064,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
                 if not self.initialize_new_observation_vlc():
                     self.observationId = ""
-                    self.twEvents.setRowCount(0)
+                    self.eventsModel.clear()
                     self.menu_options()
 
             self.menu_options()
@@ -1075,7 +1150,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
                     if not self.initialize_new_observation_vlc():
                         self.observationId = ''
-                        self.twEvents.setRowCount(0)
+                        self.eventsModel.clear()
                         self.menu_options()
 
                 self.menu_options()
@@ -1128,8 +1203,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             if self.playerType == VLC:
 
                 if self.playMode == FFMPEG:
-                    frameDuration = Decimal(1000 / list(self.fps.values())[0])
-                    currentFrame = round( newTime/ frameDuration )
+                    currentFrame = self.time_frame(newTime)
                     self.FFmpegGlobalFrame = currentFrame
                     if self.FFmpegGlobalFrame > 0:
                         self.FFmpegGlobalFrame -= 1
@@ -1149,33 +1223,40 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
                     elif self.media_list.count() > 1:
 
-                        if newTime  < sum(self.duration):
+                        if newTime  < self.mediaTimeline.total():
+                            self.play_global_time(newTime)
+                        else:
+                            QMessageBox.warning(self, programName, "The indicated position is behind the total media duration ({})".format(seconds2time(self.mediaTimeline.total()/1000)))
 
-                            # remember if player paused (go previous will start playing)
-                            flagPaused = self.mediaListPlayer.get_state() == vlc.State.Paused
+                    self.timer_out()
+                    self.timer_spectro_out()
 
-                            tot = 0
-                            for idx, d in enumerate(self.duration):
-                                if newTime >= tot and newTime < tot + d:
-                                    self.mediaListPlayer.play_item_at_index(idx)
 
-                                    # wait until media is played
-                                    while True:
-                                        if self.mediaListPlayer.get_state() in [vlc.State.Playing, vlc.State.Ended]:
-                                            break
+    def play_global_time(self, newTime):
+        """
+        play the media file of player #1 at global time newTime (in ms)
+        the pause state of player is kept
+        """
 
-                                    if flagPaused:
-                                        self.mediaListPlayer.pause()
+        idx, mediaTime = self.mediaTimeline.locate(newTime)
+        if idx is None:
+            return
 
-                                    self.mediaplayer.set_time(newTime - sum(self.duration[0 : self.media_list.index_of_item(self.mediaplayer.get_media())]))
+        # remember if player paused (go previous will start playing)
+        flagPaused = self.mediaListPlayer.get_state() == vlc.State.Paused
 
-                                    break
-                                tot += d
-                        else:
-                            QMessageBox.warning(self, programName, "The indicated position is behind the total media duration ({})".format(seconds2time(sum(self.duration)/1000)))
+        self.mediaListPlayer.play_item_at_index(idx)
+        app.processEvents()
 
-                    self.timer_out()
-                    self.timer_spectro_out()
+        # wait until media is played
+        while True:
+            if self.mediaListPlayer.get_state() in [vlc.State.Playing, vlc.State.Ended]:
+                break
+
+        if flagPaused:
+            self.mediaListPlayer.pause()
+
+        self.mediaplayer.set_time(int(mediaTime))
 
 
     def previous_media_file(self):
@@ -1291,6 +1372,9 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         """
 
         if self.observationId:
+            # the changes of events are already recorded in the journal of project (not the other changes)
+            if self.journal.fileName and self.savedMetadata == project_functions.project_metadata_hash(self.pj):
+                return
             logging.info("automatic backup")
             self.save_project_activated()
 
@@ -1358,6 +1442,10 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         preferencesWindow.lbFFmpegPath.setText("FFmpeg path: {}".format(self.ffmpeg_bin))
         preferencesWindow.leFFmpegCacheDir.setText(self.ffmpeg_cache_dir)
         preferencesWindow.sbFFmpegCacheDirMaxSize.setValue(self.ffmpeg_cache_dir_max_size)
+        preferencesWindow.sbFrameCacheSize.setValue(self.frameCacheSize)
+        preferencesWindow.sbPrefetchForward.setValue(self.prefetchForward)
+        preferencesWindow.sbPrefetchBackward.setValue(self.prefetchBackward)
+        preferencesWindow.cbFrameIndex.setChecked(self.frameIndex)
 
         if preferencesWindow.exec_():
 
@@ -1397,6 +1485,11 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
             self.ffmpeg_cache_dir = preferencesWindow.leFFmpegCacheDir.text()
             self.ffmpeg_cache_dir_max_size = preferencesWindow.sbFFmpegCacheDirMaxSize.value()
+            self.frameCacheSize = preferencesWindow.sbFrameCacheSize.value()
+            self.frameCache.set_max_size(self.frameCacheSize)
+            self.prefetchForward = preferencesWindow.sbPrefetchForward.value()
+            self.prefetchBackward = preferencesWindow.sbPrefetchBackward.value()
+            self.frameIndex = preferencesWindow.cbFrameIndex.isChecked()
 
             self.menu_options()
 
@@ -1414,15 +1507,106 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         frameCurrentMedia
         """
         currentMedia, frameCurrentMedia = '', 0
+
+        if self.frame_indexes_available():
+            idx, frameCurrentMedia = self.frameTimeline.locate(requiredFrame)
+            if idx is None:
+                return currentMedia, 0
+            return self.pj[OBSERVATIONS][self.observationId][FILE][player][idx], frameCurrentMedia
+
         frameMs = 1000 / fps
-        for idx, media in enumerate(self.pj[OBSERVATIONS][self.observationId][FILE][player]):
-            if requiredFrame * frameMs < sum(self.duration[0:idx + 1 ]):
-                currentMedia = media
-                frameCurrentMedia = requiredFrame - sum(self.duration[0:idx]) / frameMs
-                break
+        idx = self.mediaTimeline.media_at(requiredFrame * frameMs)
+        if idx is not None:
+            currentMedia = self.pj[OBSERVATIONS][self.observationId][FILE][player][idx]
+            frameCurrentMedia = requiredFrame - self.mediaTimeline.offset(idx) / frameMs
         return currentMedia, round(frameCurrentMedia)
 
 
+    def frame_indexes_available(self):
+        """
+        True if the timestamps of frames of all media files of player #1 are loaded
+        """
+        return bool(self.frameIndexes) and all([media in self.frameIndexes for media in self.pj[OBSERVATIONS][self.observationId][FILE][PLAYER1]])
+
+
+    def load_frame_indexes(self):
+        """
+        load the timestamps of frames of media files of player #1
+        the timestamps are read with ffprobe the first time and stored in the FFmpeg cache directory
+        """
+
+        cacheDir = self.ffmpeg_cache_dir if self.ffmpeg_cache_dir else tempfile.gettempdir()
+        mediaFiles = [media for media in self.pj[OBSERVATIONS][self.observationId][FILE][PLAYER1] if media not in self.frameIndexes]
+        if not mediaFiles:
+            return
+
+        # the frames decoded without timestamps are numbered from the frame rate
+        for media in self.frameReaders:
+            self.frameReaders[media].stop()
+        self.frameReaders = {}
+        self.frameCache.clear()
+
+        progress = QProgressDialog("Reading the timestamps of frames", "Cancel", 0, len(mediaFiles), self)
+        progress.setWindowTitle(programName)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            for idx, media in enumerate(mediaFiles):
+                future = executor.submit(media_analysis.load_frame_index, self.ffmpeg_bin, media, cacheDir)
+                while not future.done():
+                    progress.setValue(idx)
+                    QApplication.processEvents()
+                    if progress.wasCanceled():
+                        self.frameIndexes = {}
+                        return
+                    time.sleep(0.05)
+                if future.exception() is not None or not future.result():
+                    logging.warning("timestamps of frames of {} not available: {}".format(media, future.exception()))
+                    self.statusbar.showMessage("The timestamps of frames are not available, they are computed from the frame rate", 5000)
+                    self.frameIndexes = {}
+                    break
+                self.frameIndexes[media] = future.result()
+
+        progress.setValue(len(mediaFiles))
+
+        if self.frame_indexes_available():
+            self.frameTimeline = media_timeline.MediaTimeline([len(self.frameIndexes[media]) for media in self.pj[OBSERVATIONS][self.observationId][FILE][PLAYER1]])
+
+
+    def media_frame_time(self, media, frameIdx, fps):
+        """
+        returns the time (in ms) of frame frameIdx in media
+        """
+        if self.frame_indexes_available():
+            return self.frameIndexes[media].time(frameIdx) * 1000
+        return frameIdx * 1000 / fps
+
+
+    def frame_time(self, globalFrame):
+        """
+        returns the global time (in ms) of frame globalFrame in frame-by-frame mode
+        """
+        fps = list(self.fps.values())[0]
+        if self.frame_indexes_available():
+            currentMedia, frameCurrentMedia = self.getCurrentMediaByFrame(PLAYER1, globalFrame, fps)
+            if currentMedia:
+                idx = self.pj[OBSERVATIONS][self.observationId][FILE][PLAYER1].index(currentMedia)
+                return self.mediaTimeline.offset(idx) + self.media_frame_time(currentMedia, frameCurrentMedia, fps)
+        return globalFrame * 1000 / fps
+
+
+    def time_frame(self, globalTime):
+        """
+        returns the global index of frame displayed at global time (in ms) in frame-by-frame mode
+        """
+        if self.frame_indexes_available():
+            idx = self.mediaTimeline.media_index(globalTime)
+            media = self.pj[OBSERVATIONS][self.observationId][FILE][PLAYER1][idx]
+            return self.frameTimeline.offset(idx) + self.frameIndexes[media].frame((globalTime - self.mediaTimeline.offset(idx)) / 1000)
+        return round(globalTime / (1000 / list(self.fps.values())[0]))
+
+
     def getCurrentMediaByTime(self, player, obsId, globalTime):
         """
         get:
@@ -1440,11 +1624,9 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         print('globalTimeMs',globalTimeMs)
         print( self.duration )
 
-        for idx, media in enumerate(self.pj[OBSERVATIONS][obsId][FILE][player]):
-            if globalTimeMs < sum(self.duration[0:idx + 1]):
-                currentMedia = media
-                currentMediaTime = globalTimeMs - sum(self.duration[0:idx])
-                break
+        idx, currentMediaTime = self.mediaTimeline.locate(globalTimeMs)
+        if idx is not None:
+            currentMedia = self.pj[OBSERVATIONS][obsId][FILE][player][idx]
 
         return currentMedia, round(currentMediaTime/1000,3)
 
@@ -1458,8 +1640,6 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         logging.debug("FFmpegTimerOut function")
 
-        global BITMAP_EXT
-
         fps = list(self.fps.values())[0]
 
         logging.debug("fps {0}".format(fps))
@@ -1471,60 +1651,37 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         requiredFrame = self.FFmpegGlobalFrame + 1
 
         logging.debug("required frame: {0}".format( requiredFrame ))
-        logging.debug("sum self.duration {0}".format( sum(self.duration)))
+        logging.debug("total duration {0}".format(self.mediaTimeline.total()))
+
+        currentMedia, frameCurrentMedia = self.getCurrentMediaByFrame(PLAYER1, requiredFrame, fps)
 
         # check if end of last media
-        if requiredFrame * frameMs >= sum(self.duration):
+        if not currentMedia:
             logging.debug("end of last media")
             return
 
-        currentMedia, frameCurrentMedia = self.getCurrentMediaByFrame(PLAYER1, requiredFrame, fps)
-
         if "visualize_spectrogram" in self.pj[OBSERVATIONS][self.observationId] and self.pj[OBSERVATIONS][self.observationId]["visualize_spectrogram"]:
             self.timer_spectro_out()
 
+        # one persistent ffmpeg frame reader by media file
+        if currentMedia not in self.frameReaders:
+            self.frameReaders[currentMedia] = frame_reader.FFmpegFrameReader(self.ffmpeg_bin, currentMedia, fps, self.frameCache,
+                                                                             self.frameIndexes[currentMedia] if self.frame_indexes_available() else None)
+        reader = self.frameReaders[currentMedia]
 
-        md5FileName = hashlib.md5(currentMedia.encode("utf-8")).hexdigest()
-
-        #logging.debug('imagesList {0}'.format(self.imagesList))
-        logging.debug('image {0}'.format( '%s-%d' % (md5FileName, int(frameCurrentMedia / fps))))
-
-        ffmpeg_command = '"{ffmpeg_bin}" -ss {pos} -loglevel quiet -i "{currentMedia}" -vframes {fps} -qscale:v 2 "{imageDir}{sep}BORIS_{fileName}-{pos}_%d.{extension}"'.format(
-        ffmpeg_bin=self.ffmpeg_bin,
-        pos=int(frameCurrentMedia / fps),
-        currentMedia=currentMedia,
-        fps=str(round(fps) +1),
-        imageDir=self.imageDirectory,
-        sep=os.sep,
-        fileName=md5FileName,
-        extension=BITMAP_EXT)
-
-        logging.debug("ffmpeg command: {0}".format(ffmpeg_command))
-
-        p = subprocess.Popen(ffmpeg_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True )
-        out, error = p.communicate()
-        out, error = out.decode('utf-8'), error.decode('utf-8')
-
-        if error:
-            logging.debug('ffmpeg error: {0}'.format( error ))
+        frame = reader.frame(frameCurrentMedia)
 
-        self.imagesList.update( [ '%s-%d' % (md5FileName, int(frameCurrentMedia/ fps)) ] )
-
-
-        img = "{imageDir}{sep}BORIS_{fileName}-{second}_{frame}.{extension}".format(imageDir=self.imageDirectory,
-                                                                                    sep=os.sep,
-                                                                                    fileName=md5FileName,
-                                                                                    second=int(frameCurrentMedia / fps),
-                                                                                    frame=int((frameCurrentMedia - int(frameCurrentMedia / fps) * fps) + 1),
-                                                                                    extension=BITMAP_EXT)
-
-        if not os.path.isfile(img):
-            logging.warning("image not found: {0}".format(img))
+        if frame is None:
+            logging.warning("frame {0} not available for {1}".format(frameCurrentMedia, currentMedia))
             return
 
-        self.pixmap = QPixmap(img)
-        if self.pixmap.isNull():
-            BITMAP_EXT = "png"
+        # decode the neighbouring frames in background
+        if self.framePrefetcher is None:
+            self.framePrefetcher = frame_reader.FramePrefetcher()
+            self.framePrefetcher.start()
+        self.framePrefetcher.prefetch(reader, frameCurrentMedia, self.prefetchForward, self.prefetchBackward)
+
+        self.pixmap = QPixmap.fromImage(QImage(frame, reader.width, reader.height, reader.width * 3, QImage.Format_RGB888))
 
         self.lbFFmpeg.setPixmap(self.pixmap.scaled(self.lbFFmpeg.size(), Qt.KeepAspectRatio))
         self.FFmpegGlobalFrame = requiredFrame
@@ -1542,24 +1699,10 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         StateBehaviorsCodes = [self.pj[ETHOGRAM][x]['code'] for x in [y for y in self.pj[ETHOGRAM]
                                 if 'State' in self.pj[ETHOGRAM][y][TYPE]]]
 
-        self.currentStates = {}
-
-        # add states for no focal subject
-        self.currentStates[ '' ] = []
-        for sbc in StateBehaviorsCodes:
-            if len([x[ pj_obs_fields['code']] for x in self.pj[OBSERVATIONS][self.observationId][EVENTS]
-                       if x[pj_obs_fields['subject']] == '' and x[pj_obs_fields['code']] == sbc and x[pj_obs_fields['time']] <= currentTime /1000]) % 2: # test if odd
-                self.currentStates[''].append(sbc)
-
-        # add states for all configured subjects
-        for idx in self.pj[SUBJECTS]:
-
-            # add subject index
-            self.currentStates[ idx ] = []
-            for sbc in StateBehaviorsCodes:
-                if len( [ x[ pj_obs_fields['code'] ] for x in self.pj[OBSERVATIONS][self.observationId][EVENTS ]
-                           if x[ pj_obs_fields['subject'] ] == self.pj[SUBJECTS][idx]['name'] and x[ pj_obs_fields['code'] ] == sbc and x[ pj_obs_fields['time'] ] <= currentTime / 1000 ] ) % 2: # test if odd
-                    self.currentStates[idx].append(sbc)
+        # add states for all configured subjects and for no focal subject
+        self.currentStates = self.get_current_states_by_subject(StateBehaviorsCodes,
+                                                                dict(self.pj[SUBJECTS], **{"": {"name": ""}}),
+                                                                Decimal(currentTime / 1000))
 
         # show current states
         if self.currentSubject:
@@ -1914,7 +2057,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                 mediaFPS = self.pj[OBSERVATIONS][self.observationId]["media_info"]["fps"][mediaFile]
             except:
                 logging.debug("media_info key not found")
-                nframe, videoTime, videoDuration, fps, hasVideo, hasAudio = accurate_media_analysis( self.ffmpeg_bin, mediaFile)
+                nframe, videoTime, videoDuration, fps, hasVideo, hasAudio = cached_media_analysis(self.ffmpeg_bin, mediaFile)
                 if "media_info" not in self.pj[OBSERVATIONS][self.observationId]:
                     self.pj[OBSERVATIONS][self.observationId]["media_info"] = {"length": {}, "fps": {}}
                     if "length" not in self.pj[OBSERVATIONS][self.observationId]["media_info"]:
@@ -1941,6 +2084,8 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
             self.media_list.add_media(media)
 
+        self.mediaTimeline = media_timeline.MediaTimeline(self.duration)
+
         # add media list to media player list
         self.mediaListPlayer.set_media_list(self.media_list)
 
@@ -2088,17 +2233,10 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
             currentMediaTmpPath = tmp_dir + os.sep + os.path.basename(urllib.parse.unquote(url2path(self.mediaplayer.get_media().get_mrl())))
 
-            if not os.path.isfile("{}.wav.0-{}.spectrogram.png".format(currentMediaTmpPath, self.chunk_length)):
-                if dialog.MessageDialog(programName, ("Spectrogram file not found.\n"
-                                                      "Do you want to generate it now?\n"
-                                                      "Spectrogram generation can take some time for long media, be patient"), [YES, NO ]) == YES:
-
-                    self.generate_spectrogram()
-                else:
-                    self.pj[OBSERVATIONS][self.observationId]["visualize_spectrogram"] = False
-                    return True
+            # chunks not yet available are rendered in background
+            self.generate_spectrogram()
 
-            self.spectro = plot_spectrogram.Spectrogram("{}.wav.0-{}.spectrogram.png".format(currentMediaTmpPath, self.chunk_length))
+            self.spectro = plot_spectrogram.Spectrogram("{}.wav.0-{}.spectrogram.png".format(currentMediaTmpPath, self.chunk_length), chunkSize=self.chunk_length)
             # connect signal from spectrogram class to testsignal function to receive keypress events
             self.spectro.setWindowFlags(Qt.WindowStaysOnTopHint)
             self.spectro.sendEvent.connect(self.signal_from_spectrogram)
@@ -2132,31 +2270,12 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
     def loadEventsInTW(self, obsId):
         """
-        load events in table widget
+        load events in table view
         """
 
-        self.twEvents.setRowCount(len(self.pj[OBSERVATIONS][obsId][EVENTS]))
-        row = 0
-
-        for event in self.pj[OBSERVATIONS][obsId][EVENTS]:
-
-            for field_type in tw_events_fields:
+        stateBehaviorsCodes = [self.pj[ETHOGRAM][x]["code"] for x in self.pj[ETHOGRAM] if STATE in self.pj[ETHOGRAM][x][TYPE].upper()]
 
-                if field_type in pj_events_fields:
-
-                    field = event[ pj_obs_fields[field_type] ]
-                    if field_type == "time":
-                        field = str( self.convertTime( field) )
-
-                    twi = QTableWidgetItem(field )
-                    self.twEvents.setItem(row, tw_obs_fields[field_type], twi)
-
-                else:
-                    self.twEvents.setItem(row, tw_obs_fields[field_type], QTableWidgetItem(""))
-
-            row += 1
-
-        self.update_events_start_stop()
+        self.eventsModel.set_events(obsId, self.pj[OBSERVATIONS][obsId][EVENTS], stateBehaviorsCodes, self.convertTime)
 
 
     def selectObservations(self, mode):
@@ -2668,12 +2787,18 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             self.actionFrame_by_frame.setChecked(False)
             self.playMode = VLC
 
+            self.stop_spectrogram_generation()
+
             try:
                 self.spectro.close()
                 del self.spectro
             except:
                 pass
 
+            if self.spectroOverview:
+                self.spectroOverview.close()
+                self.spectroOverview = None
+
             try:
                 self.ffmpegLayout.deleteLater()
                 self.lbFFmpeg.deleteLater()
@@ -2681,7 +2806,15 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
                 self.FFmpegTimer.stop()
                 self.FFmpegGlobalFrame = 0
-                self.imagesList = set()
+                if self.framePrefetcher:
+                    self.framePrefetcher.stop()
+                    self.framePrefetcher = None
+                for media in self.frameReaders:
+                    self.frameReaders[media].stop()
+                self.frameReaders = {}
+                self.frameIndexes = {}
+                self.frameTimeline = None
+                self.frameCache.clear()
             except:
                 pass
 
@@ -2694,7 +2827,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.lbFocalSubject.setVisible(False)
         self.lbCurrentStates.setVisible(False)
 
-        self.twEvents.setRowCount(0)
+        self.eventsModel.clear()
 
         self.lbTime.clear()
         self.lbSubject.clear()
@@ -2827,6 +2960,30 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             except:
                 self.ffmpeg_cache_dir_max_size = 0
 
+            self.frameCacheSize = frame_reader.FRAME_CACHE_DEFAULT_SIZE
+            try:
+                self.frameCacheSize = int(settings.value("frame_cache_size"))
+                if not self.frameCacheSize:
+                    self.frameCacheSize = frame_reader.FRAME_CACHE_DEFAULT_SIZE
+            except:
+                self.frameCacheSize = frame_reader.FRAME_CACHE_DEFAULT_SIZE
+            self.frameCache.set_max_size(self.frameCacheSize)
+
+            self.prefetchForward, self.prefetchBackward = frame_reader.PREFETCH_FORWARD, frame_reader.PREFETCH_BACKWARD
+            try:
+                if settings.value("frame_prefetch_forward") is not None:
+                    self.prefetchForward = int(settings.value("frame_prefetch_forward"))
+                if settings.value("frame_prefetch_backward") is not None:
+                    self.prefetchBackward = int(settings.value("frame_prefetch_backward"))
+            except:
+                self.prefetchForward, self.prefetchBackward = frame_reader.PREFETCH_FORWARD, frame_reader.PREFETCH_BACKWARD
+
+            self.frameIndex = False
+            try:
+                self.frameIndex = (settings.value("frame_index") == 'true')
+            except:
+                self.frameIndex = False
+
 
     def saveConfigFile(self, lastCheckForNewVersion=0):
         """
@@ -2860,6 +3017,10 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         settings.setValue("ffmpeg_cache_dir", self.ffmpeg_cache_dir)
         settings.setValue("ffmpeg_cache_dir_max_size", self.ffmpeg_cache_dir_max_size)
+        settings.setValue("frame_cache_size", self.frameCacheSize)
+        settings.setValue("frame_prefetch_forward", self.prefetchForward)
+        settings.setValue("frame_prefetch_backward", self.prefetchBackward)
+        settings.setValue("frame_index", self.frameIndex)
 
 
 
@@ -2889,89 +3050,29 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         """
         returns type of event for code
         """
-
-        for idx in self.pj[ETHOGRAM]:
-            if self.pj[ETHOGRAM][idx]['code'] == code:
-                return self.pj[ETHOGRAM][idx][TYPE]
-        return None
-
+        return project_functions.event_type(self.pj, code)
 
 
     def loadEventsInDB(self, selectedSubjects, selectedObservations, selectedBehaviors):
         """
-        populate the db databse with events from selectedObservations, selectedSubjects and selectedBehaviors
+        select in the analysis database the events from selectedObservations, selectedSubjects and selectedBehaviors
+        the events are available in the events table
         """
-        db = sqlite3.connect(":memory:")
-        db.row_factory = sqlite3.Row
-
-        cursor = db.cursor()
-
-        cursor.execute("CREATE TABLE events (observation TEXT, subject TEXT, code TEXT, type TEXT, modifiers TEXT, occurence FLOAT, comment TEXT);")
-
-        for subject_to_analyze in selectedSubjects:
-
-            for obsId in selectedObservations:
-
-                for event in self.pj[OBSERVATIONS][obsId][EVENTS]:
-
-                    if event[2] in selectedBehaviors:
-
-                        # extract time, code, modifier and comment ( time:0, subject:1, code:2, modifier:3, comment:4 )
-                        if (subject_to_analyze == NO_FOCAL_SUBJECT and event[1] == '') \
-                            or ( event[1] == subject_to_analyze ):
-
-                            subjectStr = NO_FOCAL_SUBJECT if event[1] == "" else  event[1]
-
-                            eventType = STATE if STATE in self.eventType(event[2]).upper() else POINT
-
-                            r = cursor.execute("""INSERT INTO events (observation, subject, code, type, modifiers, occurence, comment) VALUES (?,?,?,?,?,?,?)""", \
-                            (obsId, subjectStr, event[2], eventType, event[3], str(event[0]), event[4]))
-
-        db.commit()
-        return cursor
-
-
+        return self.analysisStore.select(self.pj, selectedSubjects, selectedObservations, selectedBehaviors)
 
 
     def extract_observed_subjects(self, selected_observations):
         """
         extract unique subjects from obs_id observation
         """
-
-        observed_subjects = []
-
-        # extract events from selected observations
-        all_events =   [ self.pj[OBSERVATIONS][x][EVENTS] for x in self.pj[OBSERVATIONS] if x in selected_observations]
-        for events in all_events:
-            for event in events:
-                observed_subjects.append( event[pj_obs_fields['subject']] )
-
-        # remove duplicate
-        observed_subjects = list( set( observed_subjects ) )
-
-        return observed_subjects
+        return project_functions.extract_observed_subjects(self.pj, selected_observations)
 
 
     def extract_observed_behaviors(self, selected_observations, selectedSubjects):
-        '''
+        """
         extract unique behaviors from obs_id observation
-        '''
-
-        observed_behaviors = []
-
-        # extract events from selected observations
-        all_events =   [ self.pj[OBSERVATIONS][x][EVENTS] for x in self.pj[OBSERVATIONS] if x in selected_observations]
-
-        for events in all_events:
-            for event in events:
-                if event[1] in selectedSubjects or ( not event[1] and NO_FOCAL_SUBJECT in selectedSubjects):
-                    observed_behaviors.append( event[pj_obs_fields["code"]] )
-
-
-        # remove duplicate
-        observed_behaviors = list( set( observed_behaviors ) )
-
-        return observed_behaviors
+        """
+        return project_functions.extract_observed_behaviors(self.pj, selected_observations, selectedSubjects)
 
 
     def choose_obs_subj_behav(self, selectedObservations, maxTime, flagShowIncludeModifiers=True, flagShowExcludeBehaviorsWoEvents=True):
@@ -3108,10 +3209,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                 totalMediaLength = self.observationTotalMediaLength(obsId)
                 logging.debug("media length for {0} : {1}".format(obsId,totalMediaLength ))
             else: # LIVE
-                if self.pj[OBSERVATIONS][obsId][EVENTS]:
-                    totalMediaLength = max(self.pj[OBSERVATIONS][obsId][EVENTS])[0]
-                else:
-                    totalMediaLength = Decimal("0.0")
+                totalMediaLength = project_functions.last_event_time(self.pj, obsId)
             if totalMediaLength in [0, -1]:
                 selectedObsTotalMediaLength = -1
                 break
@@ -3122,7 +3220,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             if dialog.MessageDialog(programName, "A media length is not available.<br>Use last event time as media length?", [YES, NO]) == YES:
                 maxTime = 0 # max length for all events all subjects
                 for obsId in selectedObservations:
-                    maxTime += max(self.pj[OBSERVATIONS][obsId][EVENTS])[0]
+                    maxTime += project_functions.last_event_time(self.pj, obsId)
                 logging.debug("max time all events all subjects: {0}".format(maxTime))
                 selectedObsTotalMediaLength = maxTime
             else:
@@ -3138,211 +3236,25 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         if not plot_parameters["selected subjects"] or not plot_parameters["selected behaviors"]:
             return
 
-        cursor = self.loadEventsInDB(plot_parameters["selected subjects"], selectedObservations, plot_parameters["selected behaviors"] )
-
-        out = []
-        for subject in plot_parameters["selected subjects"]:
-
-            for behavior in plot_parameters["selected behaviors"]:
-
-                if plot_parameters["include modifiers"]:
-
-                    cursor.execute("SELECT distinct modifiers FROM events WHERE subject = ? AND code = ?", (subject, behavior))
-                    distinct_modifiers = list(cursor.fetchall())
+        # events are grouped by observation in parallel (compact events are sent to the processes)
+        events = dict([(obsId, project_functions.observation_events(self.pj, obsId)) for obsId in selectedObservations])
+        obsRank = time_budget_analysis.observations_ranks(selectedObservations)
+        groupsList = self.analysisScheduler.run(self, "Time budget analysis", time_budget_analysis.observation_groups,
+                                                [(events[obsId], obsRank[obsId],
+                                                  plot_parameters["selected subjects"], plot_parameters["selected behaviors"],
+                                                  plot_parameters["include modifiers"]) for obsId in selectedObservations])
+        if groupsList is None:
+            return
 
-                    if not distinct_modifiers:
-                        if not plot_parameters["exclude behaviors"]:
-                            out.append({"subject": subject,
-                                        "behavior": behavior,
-                                        "modifiers": "-",
-                                        "duration": "-",
-                                        "duration_mean": "-",
-                                        "duration_stdev": "-",
-                                        "number": 0,
-                                        "inter_duration_mean": "-",
-                                        "inter_duration_stdev": "-"})
-                        continue
-
-                    if POINT in self.eventType(behavior).upper():
-                        for modifier in distinct_modifiers:
-                            if len(selectedObservations) > 1:
-                                cursor.execute("SELECT occurence,observation FROM events WHERE subject = ? AND code = ? AND modifiers = ? ORDER BY observation, occurence",
-                                               (subject, behavior, modifier[0]))
-                            else:
-                                cursor.execute("SELECT occurence,observation FROM events WHERE subject = ? AND code = ? AND modifiers = ? AND occurence BETWEEN ? and ? ORDER BY observation, occurence",
-                                               (subject, behavior, modifier[0], str(plot_parameters["start time"]), str(plot_parameters["end time"])))
-
-                            rows = cursor.fetchall()
-
-                            # inter events duration
-                            all_event_interdurations = []
-                            for idx, row in enumerate(rows):
-                                if idx and row[1] == rows[idx - 1][1]:
-                                    all_event_interdurations.append(float(row[0]) - float(rows[idx - 1][0]))
-
-                            out.append({"subject": subject,
-                                        "behavior": behavior,
-                                        "modifiers": modifier[0],
-                                        "duration": "-",
-                                        "duration_mean": "-",
-                                        "duration_stdev": "-",
-                                        "number": len(rows),
-                                        "inter_duration_mean": round(statistics.mean(all_event_interdurations), 3) if len(all_event_interdurations) else "NA",
-                                        "inter_duration_stdev": round(statistics.stdev(all_event_interdurations), 3) if len(all_event_interdurations) > 1 else "NA"
-                                        })
-
-
-                    if STATE in self.eventType(behavior).upper():
-                        for modifier in distinct_modifiers:
-                            cursor.execute("SELECT occurence,observation FROM events WHERE subject = ? AND code = ? AND modifiers = ? ORDER BY observation, occurence",
-                                          (subject, behavior, modifier[0]))
-                            '''
-                            if len(selectedObservations) > 1:
-                                cursor.execute("SELECT occurence,observation FROM events WHERE subject = ? AND code = ? AND modifiers = ? ORDER BY observation, occurence",
-                                               (subject, behavior, modifier[0]))
-                            else:
-                                cursor.execute("SELECT occurence,observation FROM events WHERE subject = ? AND code = ? AND modifiers = ? AND occurence BETWEEN ? and ? ORDER BY observation, occurence",
-                                               (subject, behavior, modifier[0], str(plot_parameters["start time"]), str(plot_parameters["end time"])))
-                            '''
-                            rows = list(cursor.fetchall())
-                            if len(rows) % 2:
-                                out.append({"subject": subject, "behavior": behavior,
-                                            "modifiers": modifier[0], "duration": UNPAIRED,
-                                            "duration_mean": UNPAIRED, "duration_stdev": UNPAIRED,
-                                            "number": UNPAIRED, "inter_duration_mean": UNPAIRED,
-                                            "inter_duration_stdev": UNPAIRED})
-                            else:
-                                all_event_durations, all_event_interdurations = [], []
-                                for idx, row in enumerate(rows):
-                                    # event
-                                    if idx % 2 == 0:
-                                        new_init, new_end = float(row[0]), float(rows[idx + 1][0])
-                                        if len(selectedObservations) == 1:
-                                            if (new_init < plot_parameters["start time"] and new_end < plot_parameters["start time"]) \
-                                               or \
-                                               (new_init > plot_parameters["end time"] and new_end > plot_parameters["end time"]):
-                                                continue
-
-                                            if new_init < plot_parameters["start time"]:
-                                                new_init = float(plot_parameters["start time"])
-                                            if new_end > plot_parameters["end time"]:
-                                                new_end = float(plot_parameters["end time"])
-
-                                        all_event_durations.append( new_end - new_init)
-
-                                    # inter event if same observation
-                                    if idx % 2 and idx != len(rows) - 1 and row[1] == rows[idx + 1][1]:
-                                        if plot_parameters["start time"] <= row[0] <= plot_parameters["end time"] and plot_parameters["start time"] <= rows[idx + 1][0] <= plot_parameters["end time"]:
-                                            all_event_interdurations.append(float(rows[idx + 1][0]) - float(row[0]))
-
-                                        #all_event_interdurations.append(float( rows[idx + 1][0]) - float(row[0]))
-
-                                out.append({"subject": subject,
-                                            "behavior": behavior,
-                                            "modifiers": modifier[0],
-                                            "duration": round(sum(all_event_durations), 3),
-                                            "duration_mean": round(statistics.mean(all_event_durations), 3) if len(all_event_durations) else "NA",
-                                            "duration_stdev": round(statistics.stdev(all_event_durations), 3) if len(all_event_durations) > 1 else "NA",
-                                            "number": len(all_event_durations),
-                                            "inter_duration_mean": round(statistics.mean(all_event_interdurations), 3) if len(all_event_interdurations) else "NA",
-                                            "inter_duration_stdev": round(statistics.stdev(all_event_interdurations), 3) if len(all_event_interdurations) > 1 else "NA"
-                                            })
-
-                else:  # no modifiers
-
-                    if POINT in self.eventType(behavior).upper():
-
-                        if len(selectedObservations) > 1:
-                            cursor.execute("SELECT occurence,observation FROM events WHERE subject = ? AND code = ? ORDER BY observation, occurence", (subject, behavior))
-                        else:
-                            cursor.execute("SELECT occurence,observation FROM events WHERE subject = ? AND code = ? AND occurence BETWEEN ? and ? ORDER BY observation, occurence",
-                                           (subject, behavior, str(plot_parameters["start time"]), str(plot_parameters["end time"])))
-
-                        rows = list(cursor.fetchall())
-
-                        if len(selectedObservations) == 1:
-                            new_rows = []
-                            for occurence, observation in rows:
-                                new_occurence = max(float(plot_parameters["start time"]), occurence)
-                                new_occurence = min( new_occurence, float( plot_parameters["end time"]) )
-                                new_rows.append( [new_occurence, observation])
-                            rows = list(new_rows)
-
-                        if not len(rows):
-                            if not plot_parameters["exclude behaviors"]:
-                                out.append({"subject": subject, "behavior": behavior, "modifiers": "NA",
-                                            "duration": "-", "duration_mean": "-", "duration_stdev": "-", "number": 0,
-                                            "inter_duration_mean": "-", "inter_duration_stdev": "-"})
-                            continue
-
-                        # inter events duration
-                        all_event_interdurations = []
-                        for idx, row in enumerate(rows):
-                            if idx and row[1] == rows[idx - 1][1]:
-                                all_event_interdurations.append(float(row[0]) - float(rows[idx-1][0]))
-
-                        out.append({"subject": subject,
-                                    "behavior": behavior,
-                                    "modifiers": "NA",
-                                    "duration": "-",
-                                    "duration_mean": "-",
-                                    "duration_stdev": "-",
-                                    "number": len(rows),
-                                    "inter_duration_mean" : round(statistics.mean(all_event_interdurations), 3) if len(all_event_interdurations) else "NA",
-                                    "inter_duration_stdev": round(statistics.stdev(all_event_interdurations), 3) if len(all_event_interdurations) > 1 else "NA"
-                                    })
-
-
-                    if STATE in self.eventType(behavior).upper():
-                        cursor.execute( "SELECT occurence,observation FROM events where subject = ? AND code = ? ORDER BY observation, occurence", (subject, behavior))
-                        rows = list(cursor.fetchall())
-
-                        if not len(rows):
-                            if not plot_parameters["exclude behaviors"]: # include behaviors without events
-                                out.append({"subject": subject , "behavior": behavior,
-                                            "modifiers": "NA", "duration": 0, "duration_mean": 0,
-                                            "duration_stdev": "NA", "number": 0, "inter_duration_mean": "-",
-                                            "inter_duration_stdev": "-"})
-                            continue
-                        if len(rows) % 2:
-                            out.append({"subject": subject, "behavior": behavior, "modifiers": "NA",
-                                        "duration": UNPAIRED, "duration_mean": UNPAIRED, "duration_stdev": UNPAIRED,
-                                        "number": UNPAIRED, "inter_duration_mean": UNPAIRED,
-                                        "inter_duration_stdev": UNPAIRED})
-                        else:
-                            all_event_durations, all_event_interdurations = [], []
-                            for idx, row in enumerate(rows):
-                                # event
-                                if idx % 2 == 0:
-                                    new_init, new_end = float(row[0]), float(rows[idx + 1][0])
-                                    if len(selectedObservations) == 1:
-                                        if (new_init < plot_parameters["start time"] and new_end < plot_parameters["start time"]) \
-                                           or \
-                                           (new_init > plot_parameters["end time"] and new_end > plot_parameters["end time"]):
-                                            continue
-
-                                        if new_init < plot_parameters["start time"]:
-                                            new_init = float(plot_parameters["start time"])
-                                        if new_end > plot_parameters["end time"]:
-                                            new_end = float(plot_parameters["end time"])
-
-                                    all_event_durations.append( new_end - new_init)
-
-                                # inter event if same observation
-                                if idx % 2 and idx != len(rows) - 1 and row[1] == rows[idx + 1][1]:
-                                    if plot_parameters["start time"] <= row[0] <= plot_parameters["end time"] and plot_parameters["start time"] <= rows[idx + 1][0] <= plot_parameters["end time"]:
-                                        all_event_interdurations.append(float(rows[idx + 1][0]) - float(row[0]))
-
-                            out.append({"subject": subject,
-                                        "behavior": behavior,
-                                        "modifiers": "NA",
-                                        "duration": round(sum(all_event_durations), 3),
-                                        "duration_mean": round(statistics.mean(all_event_durations), 3) if len(all_event_durations) else "NA",
-                                        "duration_stdev": round(statistics.stdev(all_event_durations), 3) if len(all_event_durations) > 1 else "NA",
-                                        "number": len(all_event_durations),
-                                        "inter_duration_mean": round(statistics.mean(all_event_interdurations), 3) if len(all_event_interdurations) else "NA",
-                                        "inter_duration_stdev": round(statistics.stdev(all_event_interdurations), 3) if len(all_event_interdurations) > 1 else "NA"
-                                        })
+        out = time_budget_analysis.time_budget(events,
+                                               {self.pj[ETHOGRAM][x]["code"]: self.pj[ETHOGRAM][x][TYPE] for x in self.pj[ETHOGRAM]},
+                                               plot_parameters["selected subjects"],
+                                               plot_parameters["selected behaviors"],
+                                               plot_parameters["include modifiers"],
+                                               plot_parameters["exclude behaviors"],
+                                               plot_parameters["start time"],
+                                               plot_parameters["end time"],
+                                               groups=time_budget_analysis.merge_groups(groupsList))
 
         # widget for results visualization
         self.tb = timeBudgetResults(logging.getLogger().getEffectiveLevel(), self.pj)
@@ -3410,7 +3322,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             try:
                 mediaLength = self.pj[OBSERVATIONS][obsId]["media_info"]["length"][mediaFile]
             except:
-                nframe, videoTime, videoDuration, fps, hasVideo, hasAudio = accurate_media_analysis( self.ffmpeg_bin, mediaFile)
+                nframe, videoTime, videoDuration, fps, hasVideo, hasAudio = cached_media_analysis(self.ffmpeg_bin, mediaFile)
                 if "media_info" not in self.pj[OBSERVATIONS][obsId]:
                     self.pj[OBSERVATIONS][obsId]["media_info"] = {"length": {}, "fps": {}}
                     if "length" not in self.pj[OBSERVATIONS][obsId]["media_info"]:
@@ -3449,7 +3361,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             try:
                 mediaLength = self.pj[OBSERVATIONS][obsId]["media_info"]["length"][mediaFile]
             except:
-                nframe, videoTime, videoDuration, fps, hasVideo, hasAudio = accurate_media_analysis( self.ffmpeg_bin, mediaFile)
+                nframe, videoTime, videoDuration, fps, hasVideo, hasAudio = cached_media_analysis(self.ffmpeg_bin, mediaFile)
                 if "media_info" not in self.pj[OBSERVATIONS][obsId]:
                     self.pj[OBSERVATIONS][obsId]["media_info"] = {"length": {}, "fps": {}}
                     if "length" not in self.pj[OBSERVATIONS][obsId]["media_info"]:
@@ -3833,35 +3745,12 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             QMessageBox.warning(self, programName, "File not found")
             return
 
-        s = open(projectFileName, "r").read()
-
         try:
-            self.pj = json.loads(s)
+            self.pj, self.projectChanged = project_functions.load_project(projectFileName)
         except:
             QMessageBox.critical(self, programName, "This project file seems corrupted")
             return
 
-        self.projectChanged = False
-
-        # transform time to decimal
-        for obs in self.pj[OBSERVATIONS]:
-            self.pj[OBSERVATIONS][obs]["time offset"] = Decimal(str(self.pj[OBSERVATIONS][obs]["time offset"]) )
-
-            for idx,event in enumerate(self.pj[OBSERVATIONS][obs][EVENTS]):
-                self.pj[OBSERVATIONS][obs][EVENTS][idx][pj_obs_fields["time"]] = Decimal(str(self.pj[OBSERVATIONS][obs][EVENTS][idx][pj_obs_fields["time"]]))
-
-        # add coding_map key to old project files
-        if not "coding_map" in self.pj:
-            self.pj["coding_map"] = {}
-            self.projectChanged = True
-
-        # add subject description
-        if 'project_format_version' in self.pj:
-            for idx in [x for x in self.pj[SUBJECTS]]:
-                if not 'description' in self.pj[SUBJECTS][ idx ] :
-                    self.pj[SUBJECTS][ idx ]['description'] = ""
-                    self.projectChanged = True
-
         # check if project file version is newer than current BORIS project file version
         if 'project_format_version' in self.pj and Decimal(self.pj['project_format_version']) > Decimal(project_format_version):
             QMessageBox.critical(self, programName, "This project file was created with a more recent version of BORIS.\nUpdate your version of BORIS to load it")
@@ -3920,11 +3809,6 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                         self.projectChanged = True
         '''
 
-        for obs in self.pj[OBSERVATIONS]:
-            if not "time offset second player" in self.pj[OBSERVATIONS][obs]:
-                self.pj[OBSERVATIONS][obs]["time offset second player"] = Decimal("0.0")
-                self.projectChanged = True
-
         # if one file is present in player #1 -> set "media_info" key with value of media_file_info
         '''
         for obs in self.pj[OBSERVATIONS]:
@@ -3954,6 +3838,16 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         self.projectChanged = memProjectChanged
 
+        # changes of events not saved during the last session
+        if projectFileName:
+            changes = project_journal.replay(self.pj, projectFileName)
+            if changes:
+                self.projectChanged = True
+                self.statusbar.showMessage("{} changes not saved were recovered from the journal of project".format(changes), 0)
+        self.journal.start(projectFileName, self.pj)
+        # the changes made at the load of an old project file are not recorded in the journal
+        self.savedMetadata = None if memProjectChanged else project_functions.project_metadata_hash(self.pj)
+
         self.load_behaviors_in_twEthogram([self.pj[ETHOGRAM][x]["code"] for x in self.pj[ETHOGRAM]])
 
         self.load_subjects_in_twSubjects()
@@ -3984,6 +3878,11 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             if response == CANCEL:
                 return
 
+            if response == DISCARD:
+                self.journal.discard()
+
+        self.projectSaver.wait()
+
         if QT_VERSION_STR[0] == "4":
             fileName = QFileDialog(self).getOpenFileName(self, "Open project", "", "Project files (*.boris);;Old project files (*.obs);;All files (*)")
         else:
@@ -4031,6 +3930,12 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             if response == CANCEL:
                 return
 
+            if response == DISCARD:
+                self.journal.discard()
+
+        self.projectSaver.wait()
+        self.journal.stop()
+
         self.dwEthogram.setVisible(False)
         self.dwSubjects.setVisible(False)
 
@@ -4085,10 +3990,15 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                 if response == CANCEL:
                     return
 
+                if response == DISCARD:
+                    self.journal.discard()
+
+                self.projectSaver.wait()
+
             # empty main window tables
             self.twEthogram.setRowCount(0)   # behaviors
             self.twSubjects.setRowCount(0)
-            self.twEvents.setRowCount(0)
+            self.eventsModel.clear()
 
 
         newProjectWindow = projectDialog(logging.getLogger().getEffectiveLevel())
@@ -4275,6 +4185,9 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
             if mode == NEW:
                 self.projectFileName = ''
+                self.journal.stop()
+            else:
+                self.journal.pj = self.pj
 
             self.project = True
 
@@ -4321,27 +4234,33 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
     def save_project_json(self, projectFileName):
         """
-        save project to JSON file
+        save project to JSON file in background (see project_saved)
         """
-        def decimal_default(obj):
-            if isinstance(obj, Decimal):
-                return float(obj)
-            raise TypeError
 
-        logging.debug("save project json {0}:".format(projectFileName))
+        self.projectSaver.save(self.pj, projectFileName, self.journal.position())
+        self.savedMetadata = project_functions.project_metadata_hash(self.pj)
+        self.lbSaving.setVisible(True)
 
-        self.pj["project_format_version"] = project_format_version
+        # the changes made during the save will be saved by the next save
+        self.projectChanged = False
 
-        try:
-            f = open(projectFileName, "w")
-            f.write(json.dumps(self.pj, indent=1, default=decimal_default))
-            f.close()
-        except:
-            logging.critical("The project file can not be saved")
-            QMessageBox.critical(self, programName, "The project file can not be saved!")
+
+    def project_saved(self, projectFileName, error, journalPosition):
+        """
+        end of the save of project in background
+        """
+
+        self.lbSaving.setVisible(self.projectSaver.busy())
+
+        if error:
+            self.projectChanged = True
+            self.savedMetadata = None
+            QMessageBox.critical(self, programName, "The project file can not be saved!\n{}".format(error))
             return
 
-        self.projectChanged = False
+        # the changes recorded in the journal before the save are now in the project file
+        self.journal.saved(projectFileName, self.pj, journalPosition)
+        self.statusbar.showMessage("Project saved in {}".format(projectFileName), 5000)
 
 
     def save_project_as_activated(self):
@@ -4407,31 +4326,11 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         # extract State events
         StateBehaviorsCodes = [self.pj[ETHOGRAM][x]['code'] for x in [y for y in self.pj[ETHOGRAM] if 'State' in self.pj[ETHOGRAM][y][TYPE]]]
 
-        self.currentStates = {}
-        # add states for no focal subject
-
-        # TODO: replace with function (see timerout)
-
+        # add states for all configured subjects and for no focal subject
         self.currentStates = self.get_current_states_by_subject(StateBehaviorsCodes,
-                                                                self.pj[OBSERVATIONS][self.observationId][EVENTS],
                                                                 dict(self.pj[SUBJECTS], **{"": {"name": ""}}),
                                                                 currentTime)
 
-        '''
-        self.currentStates[""] = []
-        for sbc in StateBehaviorsCodes:
-            if len([x[pj_obs_fields['code']] for x in self.pj[OBSERVATIONS][self.observationId][EVENTS ] if x[ pj_obs_fields['subject'] ] == '' and x[ pj_obs_fields['code'] ] == sbc and x[ pj_obs_fields['time'] ] <= currentTime  ] ) % 2: # test if odd
-                self.currentStates[''].append(sbc)
-        '''
-
-        # add states for all configured subjects
-        for idx in self.pj[SUBJECTS]:
-            # add subject index
-            self.currentStates[idx] = []
-            for sbc in StateBehaviorsCodes:
-                if len([x[pj_obs_fields['code']] for x in self.pj[OBSERVATIONS][self.observationId][EVENTS ] if x[ pj_obs_fields['subject']] == self.pj[SUBJECTS][idx]['name'] and x[ pj_obs_fields['code'] ] == sbc and x[ pj_obs_fields['time'] ] <= currentTime  ] ) % 2: # test if odd
-                    self.currentStates[idx].append(sbc)
-
         # show current states
         if self.currentSubject:
             # get index of focal subject (by name)
@@ -4473,11 +4372,12 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         if not self.liveObservationStarted:
 
-            if self.twEvents.rowCount():
+            if self.eventsModel.rowCount():
 
                 if dialog.MessageDialog(programName, "Delete the current events?", [YES, NO]) == YES:
-                    self.twEvents.setRowCount(0)
                     self.pj[OBSERVATIONS][self.observationId][EVENTS] = []
+                    self.journal.clear(self.observationId)
+                    self.loadEventsInTW(self.observationId)
                 self.projectChanged = True
             self.textButton.setText("Stop live observation")
             self.liveStartTime = QTime()
@@ -4522,75 +4422,13 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         cursor = self.loadEventsInDB(plot_parameters["selected subjects"], selectedObservations, plot_parameters["selected behaviors"])
 
-        flagUnpairedEventFound = False
-
-        for obsId in selectedObservations:
-
-            for nplayer in [PLAYER1, PLAYER2]:
-
-                if not self.pj[OBSERVATIONS][obsId][FILE][nplayer]:
-                    continue
-
-                duration1 = []   # in seconds
-                for mediaFile in self.pj[OBSERVATIONS][obsId][FILE][nplayer]:
-                    duration1.append(self.pj[OBSERVATIONS][obsId]["media_info"]["length"][mediaFile])
-
-                subtitles = {}
-                for subject in plot_parameters["selected subjects"]:
-
-                    for behavior in plot_parameters["selected behaviors"]:
-
-                        cursor.execute( "SELECT occurence, modifiers FROM events where observation = ? AND subject = ? AND  code = ? ORDER BY code, occurence", (obsId, subject, behavior) )
-                        rows = list(cursor.fetchall() )
-                        if STATE in self.eventType(behavior).upper() and len( rows ) % 2:
-                            #continue
-                            flagUnpairedEventFound = True
-                            continue
-
-                        for idx, row in enumerate(rows):
-
-                            print( row["occurence"] )
-
-                            mediaFileIdx = [idx1 for idx1, x in enumerate(duration1) if row["occurence"] >= sum(duration1[0:idx1])][-1]
-                            if mediaFileIdx not in subtitles:
-                                subtitles[mediaFileIdx] = []
-
-                            # subtitle color
-                            if subject == NO_FOCAL_SUBJECT:
-                                col = "white"
-                            else:
-                                col = subtitlesColors[plot_parameters["selected subjects"].index(subject) % len(subtitlesColors)]
-
-                            behaviorStr = behavior
-                            if plot_parameters["include modifiers"] and row[1]:
-                                behaviorStr += " ({0})".format(row[1].replace("|", ", "))
-
-                            if POINT in self.eventType(behavior).upper():
-                                laps =  "{0} --> {1}".format(seconds2time(row["occurence"]).replace(".", ","), seconds2time(row["occurence"] + 0.5).replace(".", ",") )
-                                subtitles[mediaFileIdx].append( [laps, """<font color="{0}">{1}: {2}</font>""".format(col, subject, behaviorStr) ] )
-
-                            if STATE in self.eventType(behavior).upper():
-                                if idx % 2 == 0:
-
-                                    start = seconds2time(round(row["occurence"] - sum( duration1[0:mediaFileIdx]), 3)).replace(".", ",")
-                                    stop = seconds2time(round(rows[idx + 1]["occurence"] - sum( duration1[0:mediaFileIdx]), 3)).replace(".", ",")
-
-                                    laps =  "{start} --> {stop}".format(start=start, stop=stop)
-                                    subtitles[mediaFileIdx].append( [laps, """<font color="{0}">{1}: {2}</font>""".format(col, subject, behaviorStr) ] )
-
-                #print(subtitles)
-                try:
-                    for mediaIdx in subtitles:
-                        #print(mediaIdx, mediaIdx)
-                        subtitles[mediaIdx].sort()
-                        with open( "{exportDir}{sep}{fileName}.srt".format(exportDir=exportDir, sep=os.sep, fileName=os.path.basename(self.pj[OBSERVATIONS][obsId][FILE][nplayer][mediaIdx])), "w") as f:
-                            for idx, sub in enumerate(subtitles[mediaIdx]):
-                                f.write("{0}{3}{1}{3}{2}{3}{3}".format(idx + 1, sub[0], sub[1], os.linesep))
-                except:
-                    errorMsg = sys.exc_info()[1]
-                    logging.critical(errorMsg)
-                    QMessageBox.critical(None, programName, str(errorMsg), QMessageBox.Ok | QMessageBox.Default, QMessageBox.NoButton)
-
+        flagUnpairedEventFound, errors = export_functions.create_subtitles(self.pj, cursor, selectedObservations,
+                                                                           plot_parameters["selected subjects"],
+                                                                           plot_parameters["selected behaviors"],
+                                                                           plot_parameters["include modifiers"],
+                                                                           exportDir)
+        for errorMsg in errors:
+            QMessageBox.critical(None, programName, errorMsg, QMessageBox.Ok | QMessageBox.Default, QMessageBox.NoButton)
 
         self.statusbar.showMessage("Subtitles file(s) created in {} directory".format(exportDir), 0)
 
@@ -4621,103 +4459,33 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                 fileName = QFileDialog(self).getSaveFileName(self, "Export aggregated events in SQL format", "", "SQL dump file file (*.sql);;All files (*)")
             else:
                 fileName, _ = QFileDialog(self).getSaveFileName(self, "Export aggregated events in SQL format", "", "SQL dump file file (*.sql);;All files (*)")
-            if includeMediaInfo == NO:
-                out = "CREATE TABLE events (id INTEGER PRIMARY KEY ASC, observation TEXT, date DATE, subject TEXT, behavior TEXT, modifiers TEXT, event_type TEXT, start FLOAT, stop FLOAT, comment_start TEXT, comment_stop TEXT);" + os.linesep
-            else:
-                out = ""
-                pass # TODO
-            out += "BEGIN TRANSACTION;" + os.linesep
-            template = """INSERT INTO events (observation, date, subject, behavior, modifiers, event_type, start, stop, comment_start, comment_stop) VALUES ("{observation}","{date}","{subject}","{behavior}","{modifiers}","{event_type}",{start},{stop},"{comment_start}","{comment_stop}");""" + os.linesep
 
         if format_ == "tab":
             if QT_VERSION_STR[0] == "4":
                 fileName = QFileDialog(self).getSaveFileName(self, "Export aggregated events in tabular format", "", "Events file (*.tsv *.txt);;All files (*)")
             else:
                 fileName, _ = QFileDialog(self).getSaveFileName(self, "Export aggregated events in tabular format", "", "Events file (*.tsv *.txt);;All files (*)")
-            if includeMediaInfo == YES:
-                out = "Observation id{0}Observation date{0}Media file{0}Total media length{0}FPS{0}Subject{0}Behavior{0}Modifiers{0}Behavior type{0}Start{0}Stop{0}Comment start{0}Comment stop{1}".format("\t", os.linesep)
-                template = "{observation}\t{date}\t{media_file}\t{total_length}\t{fps}\t{subject}\t{behavior}\t{modifiers}\t{event_type}\t{start}\t{stop}\t{comment_start}\t{comment_stop}" + os.linesep
-            else:
-                out = "Observation id{0}Observation date{0}Subject{0}Behavior{0}Modifiers{0}Behavior type{0}Start{0}Stop{0}Comment start{0}Comment stop{1}".format("\t", os.linesep)
-                template = "{observation}\t{date}\t{subject}\t{behavior}\t{modifiers}\t{event_type}\t{start}\t{stop}\t{comment_start}\t{comment_stop}" + os.linesep
 
         if not fileName:
             return
 
         self.statusbar.showMessage("Exporting aggregated events", 0)
-        flagUnpairedEventFound = False
-
-        for obsId in selectedObservations:
-
-            duration1 = []   # in seconds
-            if self.pj[OBSERVATIONS][obsId]["type"] in [MEDIA]:
-                try:
-                    for mediaFile in self.pj[OBSERVATIONS][obsId][FILE][PLAYER1]:
-                        duration1.append(self.pj[OBSERVATIONS][obsId]["media_info"]["length"][mediaFile])
-                except:
-                    pass
-
-            cursor = self.loadEventsInDB(plot_parameters["selected subjects"], selectedObservations, plot_parameters["selected behaviors"])
-
-            for subject in plot_parameters["selected subjects"]:
-
-                for behavior in plot_parameters["selected behaviors"]:
-
-                    cursor.execute("SELECT occurence, modifiers, comment FROM events WHERE observation = ? AND subject = ? AND code = ? ", (obsId, subject, behavior))
-                    rows = list(cursor.fetchall())
-
-                    if STATE in self.eventType(behavior).upper() and len(rows) % 2:  # unpaired events
-                        flagUnpairedEventFound = True
-                        continue
-
-                    for idx, row in enumerate(rows):
 
-                        if self.pj[OBSERVATIONS][obsId]["type"] in [MEDIA]:
-                            mediaFileIdx = [idx1 for idx1, x in enumerate(duration1) if row["occurence"] >= sum(duration1[0:idx1])][-1]
-                            mediaFileString = self.pj[OBSERVATIONS][obsId][FILE][PLAYER1][mediaFileIdx]
-                            fpsString = self.pj[OBSERVATIONS][obsId]["media_info"]["fps"][self.pj[OBSERVATIONS][obsId][FILE][PLAYER1][mediaFileIdx]]
-                        else:
-                            mediaFileString = "LIVE"
-                            fpsString = "NA"
-
-                        if POINT in self.eventType(behavior).upper():
-
-                            out += template.format(observation=obsId,
-                                                    date=self.pj[OBSERVATIONS][obsId]["date"].replace("T", " "),
-                                                    media_file=mediaFileString,
-                                                    total_length=sum(duration1),
-                                                    fps=fpsString,
-                                                    subject=subject,
-                                                    behavior=behavior,
-                                                    modifiers=row["modifiers"].strip(),
-                                                    event_type=POINT,
-                                                    start=row["occurence"],
-                                                    stop=0,
-                                                    comment_start=row["comment"],
-                                                    comment_stop="")
+        out, template = export_functions.aggregated_events_template(format_, includeMediaInfo)
 
-                        if STATE in self.eventType(behavior).upper():
-                            if idx % 2 == 0:
-                                out += template.format(observation=obsId,
-                                                        date=self.pj[OBSERVATIONS][obsId]["date"].replace("T", " "),
-                                                        media_file=mediaFileString,
-                                                        total_length=sum(duration1),
-                                                        fps=fpsString,
-                                                        subject=subject,
-                                                        behavior=behavior,
-                                                        modifiers=row["modifiers"].strip(),
-                                                        event_type=STATE,
-                                                        start=row["occurence"],
-                                                        stop=rows[idx + 1]["occurence"],
-                                                        comment_start=row["comment"],
-                                                        comment_stop=rows[idx + 1]["comment"])
+        results = self.analysisScheduler.run(self, "Exporting aggregated events", export_functions.observation_aggregated_events_process,
+                                             [(project_functions.observation_project(self.pj, obsId), obsId,
+                                               plot_parameters["selected subjects"], plot_parameters["selected behaviors"], template)
+                                              for obsId in selectedObservations])
+        if results is None:
+            return
 
-        if format_ == "sql":
-            out += "END TRANSACTION;" + os.linesep
+        out += "".join([obsOut for obsOut, _ in results]) + export_functions.aggregated_events_footer(format_)
+        flagUnpairedEventFound = True in [flagUnpaired for _, flagUnpaired in results]
 
         try:
             with open(fileName, "w") as f:
-                f.write( out )
+                f.write(out)
         except:
             errorMsg = sys.exc_info()[1]
             logging.critical(errorMsg)
@@ -4909,7 +4677,7 @@ item []:
             else:
                 out = "Current media file name: <b>{}</b><br>".format(url2path(media.get_mrl()))
 
-            QMessageBox.about(self, programName + " - Media file information", "{}<br><br>Total duration: {} s".format(out, self.convertTime(sum(self.duration)/1000)))
+            QMessageBox.about(self, programName + " - Media file information", "{}<br><br>Total duration: {} s".format(out, self.convertTime(self.mediaTimeline.total()/1000)))
 
 
     def switch_playing_mode(self):
@@ -4925,7 +4693,7 @@ item []:
 
             self.playMode = VLC
 
-            globalCurrentTime = int( self.FFmpegGlobalFrame  * (1000 / list(self.fps.values())[0]))
+            globalCurrentTime = int(self.frame_time(self.FFmpegGlobalFrame))
 
             logging.debug("switch_playing_mode new global current time: {} {}".format( globalCurrentTime, type(globalCurrentTime) ))
 
@@ -4934,19 +4702,18 @@ item []:
             logging.debug("globalCurrentTime: {0}".format(globalCurrentTime))
             logging.debug("self.duration: {0}".format(self.duration))
 
-            for idx, media in enumerate(self.pj[OBSERVATIONS][self.observationId][FILE][PLAYER1]):
-                if globalCurrentTime < sum(self.duration[0:idx + 1]):
+            idx, currentMediaTime = self.mediaTimeline.locate(globalCurrentTime)
+            if idx is not None:
 
-                    self.mediaListPlayer.play_item_at_index( idx )
+                self.mediaListPlayer.play_item_at_index( idx )
 
-                    while True:
-                        if self.mediaListPlayer.get_state() in [vlc.State.Playing, vlc.State.Ended]:
-                            break
+                while True:
+                    if self.mediaListPlayer.get_state() in [vlc.State.Playing, vlc.State.Ended]:
+                        break
 
-                    self.mediaListPlayer.pause()
+                self.mediaListPlayer.pause()
 
-                    currentMediaTime = int(globalCurrentTime - sum(self.duration[0:idx]))
-                    break
+                currentMediaTime = int(currentMediaTime)
 
             logging.debug("current media time: {0}".format(currentMediaTime))
             self.mediaplayer.set_time( currentMediaTime )
@@ -4995,22 +4762,19 @@ item []:
             else:
                 self.imageDirectory = self.ffmpeg_cache_dir
 
-            # load list of images in a set
-            if not self.imagesList:
-                self.imagesList.update([f.replace( self.imageDirectory + os.sep, '').split('_')[0] for f in glob.glob(self.imageDirectory + os.sep + '*')])
-
             logging.debug("frame-by-frame mode activated. Image directory {0}".format(self.imageDirectory))
 
             # show frame-by_frame tab
             self.toolBox.setCurrentIndex(1)
 
-            globalTime = (sum(self.duration[0 : self.media_list.index_of_item(self.mediaplayer.get_media())]) + self.mediaplayer.get_time())
+            globalTime = (self.mediaTimeline.offset(self.media_list.index_of_item(self.mediaplayer.get_media())) + self.mediaplayer.get_time())
 
             logging.debug("switch_playing_mode  globalTime {0} s".format( globalTime/1000 ))
 
-            fps = list(self.fps.values())[0]
+            if self.frameIndex:
+                self.load_frame_indexes()
 
-            globalCurrentFrame = round(globalTime / (1000/fps))
+            globalCurrentFrame = self.time_frame(globalTime)
 
             self.FFmpegGlobalFrame = globalCurrentFrame
 
@@ -5049,16 +4813,15 @@ item []:
 
                 if self.playMode == FFMPEG:
 
-                    for idx, media in enumerate(self.pj[OBSERVATIONS][self.observationId][FILE][PLAYER1]):
-                        if self.FFmpegGlobalFrame < sum(self.duration[0:idx + 1]):
+                    media, _ = self.getCurrentMediaByFrame(PLAYER1, self.FFmpegGlobalFrame, list(self.fps.values())[0])
+                    if media:
 
-                            dirName, fileName = os.path.split(media)
+                        dirName, fileName = os.path.split(media)
 
-                            snapshotFilePath = dirName + os.sep + os.path.splitext(fileName)[0] + "_" + str(self.FFmpegGlobalFrame) + ".png"
+                        snapshotFilePath = dirName + os.sep + os.path.splitext(fileName)[0] + "_" + str(self.FFmpegGlobalFrame) + ".png"
 
-                            self.lbFFmpeg.pixmap().save(snapshotFilePath)
-                            self.statusbar.showMessage("Snapshot saved in {}".format(snapshotFilePath), 0)
-                            break
+                        self.lbFFmpeg.pixmap().save(snapshotFilePath)
+                        self.statusbar.showMessage("Snapshot saved in {}".format(snapshotFilePath), 0)
 
                 else:  # VLC
 
@@ -5241,7 +5004,7 @@ item []:
             self.no_observation()
             return
 
-        if self.twEvents.selectedItems():
+        if self.twEvents.selectedIndexes():
 
             editWindow = DlgEditEvent(logging.getLogger().getEffectiveLevel())
             editWindow.setWindowTitle("Edit event parameters")
@@ -5250,7 +5013,7 @@ item []:
             editWindow.pj = self.pj
             editWindow.currentModifier = ""
 
-            row = self.twEvents.selectedItems()[0].row()
+            row = self.twEvents.selectedIndexes()[0].row()
 
             if self.timeFormat == HHMMSS:
                 editWindow.dsbTime.setVisible(False)
@@ -5451,35 +5214,39 @@ item []:
         if self.pj[OBSERVATIONS][self.observationId][EVENTS]:
             ct = self.getLaps()
             if ct >= self.pj[OBSERVATIONS][self.observationId][EVENTS][-1][0]:
-                ROW = len( self.pj[OBSERVATIONS][self.observationId][EVENTS] )
+                newRow = len( self.pj[OBSERVATIONS][self.observationId][EVENTS] )
             else:
-                cr_list =  [idx for idx, x in enumerate(self.pj[OBSERVATIONS][self.observationId][EVENTS][:-1]) if x[0] <= ct and self.pj[OBSERVATIONS][self.observationId][EVENTS][idx+1][0] > ct ]
+                # index of last event with time <= current time
+                newRow = self.current_events_index().events_before(ct) - 1
 
-                if cr_list:
-                    ROW = cr_list[0]
-                    if not self.trackingCursorAboveEvent:
-                        ROW +=  1
-                else:
-                    ROW = -1
+                if newRow != -1 and not self.trackingCursorAboveEvent:
+                    newRow +=  1
 
-            self.twEvents.setItemDelegate(StyledItemDelegateTriangle(self.twEvents))
-            self.twEvents.scrollToItem( self.twEvents.item(ROW, 0) )
+            if newRow != ROW:
+                oldRow, ROW = ROW, newRow
+                # repaint only the rows of the previous and the new tracking cursor
+                for row in (oldRow, newRow):
+                    if 0 <= row < self.eventsModel.rowCount():
+                        self.twEvents.viewport().update(0, self.twEvents.rowViewportPosition(row) - 5,
+                                                        self.twEvents.viewport().width(), self.twEvents.rowHeight(row) + 10)
+                self.twEvents.scrollTo(self.eventsModel.index(ROW, 0))
 
-    def get_current_states_by_subject(self, stateBehaviorsCodes, events, subjects, time):
+    def current_events_index(self):
+        """
+        return the index of events of the current observation
+        the events are reloaded if the events list was replaced or modified outside of the events model
+        """
+        if not self.eventsModel.is_current(self.observationId, self.pj[OBSERVATIONS][self.observationId][EVENTS]):
+            self.loadEventsInTW(self.observationId)
+        return self.eventsModel.eventsIndex
+
+
+    def get_current_states_by_subject(self, stateBehaviorsCodes, subjects, time):
         """
         get current states for subjects at given time
 
         """
-        currentStates = {}
-        for idx in subjects:
-            currentStates[idx] = []
-            for sbc in stateBehaviorsCodes:
-                if len([x[ EVENT_BEHAVIOR_FIELD_IDX ] for x in events
-                                                       if x[EVENT_SUBJECT_FIELD_IDX] == subjects[idx]["name"]
-                                                          and x[EVENT_BEHAVIOR_FIELD_IDX] == sbc
-                                                          and x[EVENT_TIME_FIELD_IDX] <= time]) % 2: # test if odd
-                    currentStates[idx].append(sbc)
-        return currentStates
+        return self.current_events_index().current_states(stateBehaviorsCodes, subjects, time)
 
 
 
@@ -5505,6 +5272,10 @@ item []:
             # highlight current event in tw events and scroll event list
             self.get_events_current_row()
 
+            # current position in spectrogram overview
+            if self.spectroOverview and self.spectroOverview.isVisible() and self.current_media_path() == self.spectroOverview.mediaFile:
+                self.spectroOverview.set_cursor(mediaTime / 1000)
+
             # check if second video
             if self.simultaneousMedia:
 
@@ -5547,7 +5318,7 @@ item []:
 
             currentTimeOffset = Decimal(currentTime / 1000) + Decimal(self.pj[OBSERVATIONS][self.observationId][TIME_OFFSET])
 
-            totalGlobalTime = sum(self.duration)
+            totalGlobalTime = self.mediaTimeline.total()
 
             if self.mediaplayer.get_length():
 
@@ -5562,7 +5333,7 @@ item []:
 
                 # add current states for all subject and for "no focal subject"
 
-                self.currentStates = self.get_current_states_by_subject(StateBehaviorsCodes, self.pj[OBSERVATIONS][self.observationId][EVENTS], dict(self.pj[SUBJECTS], **{"": {"name": ""}}), currentTimeOffset)
+                self.currentStates = self.get_current_states_by_subject(StateBehaviorsCodes, dict(self.pj[SUBJECTS], **{"": {"name": ""}}), currentTimeOffset)
                 '''
                 subjects_and_nofocal = dict(self.pj[SUBJECTS], **{"": {"name": ""}})  # add "" for NO FOCAL SUBJECT
                 for idx in subjects_and_nofocal:
@@ -5586,12 +5357,7 @@ item []:
                 # show current state(s)
                 txt = []
                 for cs in self.currentStates[idx]:
-                    for ev in self.pj[OBSERVATIONS][self.observationId][EVENTS]:
-                        if ev[EVENT_TIME_FIELD_IDX] > currentTimeOffset:
-                            break
-                        if ev[EVENT_SUBJECT_FIELD_IDX] == self.currentSubject:
-                            if ev[EVENT_BEHAVIOR_FIELD_IDX] == cs:
-                                cm[cs] = ev[EVENT_MODIFIER_FIELD_IDX]
+                    cm[cs] = self.current_events_index().current_modifier(self.currentSubject, cs, currentTimeOffset)
                     # state and modifiers (if any)
                     txt.append(cs + " ({}) ".format(cm[cs])*(cm[cs] != ""))
 
@@ -5709,66 +5475,12 @@ item []:
 
 
 
-    def update_events_start_stop(self):
-        """
-        update status start/stop of events in Events table
-        take consideration of subject
-
-        do not return value
-        """
-
-        stateEventsList = [self.pj[ETHOGRAM][x]['code'] for x in self.pj[ETHOGRAM] if STATE in self.pj[ETHOGRAM][x][TYPE].upper()]
-
-        for row in range(0, self.twEvents.rowCount()):
-
-            t = self.twEvents.item(row, tw_obs_fields['time'] ).text()
-
-            if ":" in t:
-                time = time2seconds(t)
-            else:
-                time = Decimal(t)
-
-            code = self.twEvents.item(row, tw_obs_fields['code'] ).text()
-            subject = self.twEvents.item(row, tw_obs_fields['subject'] ).text()
-
-            # check if code is state
-            if code in stateEventsList:
-                # how many code before with same subject?
-                if len([x[pj_obs_fields['code']] for x in self.pj[OBSERVATIONS][self.observationId][EVENTS] if x[pj_obs_fields["code"]] == code and x[pj_obs_fields["time"]] < time and x[pj_obs_fields["subject"]] == subject]) % 2: # test if odd
-                    self.twEvents.item(row, tw_obs_fields[TYPE]).setText(STOP)
-                else:
-                    self.twEvents.item(row, tw_obs_fields[TYPE]).setText(START)
-
-
     def update_events_start_stop2(self, events):
         """
         returns events with status (START/STOP or POINT)
         take consideration of subject
-
         """
-
-        stateEventsList = [self.pj[ETHOGRAM][x]["code"] for x in self.pj[ETHOGRAM] if STATE in self.pj[ETHOGRAM][x][TYPE].upper()]
-
-        eventsFlagged = []
-        for event in events:
-
-            time, subject, code = event[0:3]
-
-            # check if code is state
-            if code in stateEventsList:
-
-                # how many code before with same subject?
-                if len([x[pj_obs_fields['code']] for x in events if x[pj_obs_fields['code']] == code and x[ pj_obs_fields['time']] < time and x[pj_obs_fields['subject']] == subject]) % 2: # test if odd
-                    flag = STOP
-                else:
-                    flag = START
-
-            else:
-                flag = POINT
-
-            eventsFlagged.append(event + [flag])
-
-        return eventsFlagged
+        return export_functions.events_with_status(self.pj, events)
 
 
     def checkSameEvent(self, obsId, time, subject, code ):
@@ -5883,18 +5595,12 @@ item []:
             # current modifiers
             cm = {}
             for cs in csj :
-                for ev in self.pj[OBSERVATIONS][self.observationId][EVENTS ]:
-                    if ev[0] > memTime:  # time
-                        break
-
-                    if ev[1] == self.currentSubject:  # current subject name
-                        if ev[2] == cs:   # code
-                            cm[cs] = ev[3]
+                cm[cs] = self.current_events_index().current_modifier(self.currentSubject, cs, memTime)
 
             for cs in csj :
                 if (event['excluded'] and cs in event['excluded'].split(',')) or ( event['code'] == cs and cm[cs] != modifier_str):
                     # add excluded state event to observations (= STOP them)
-                    self.pj[OBSERVATIONS][self.observationId][EVENTS].append([memTime - Decimal("0.001"), self.currentSubject, cs, cm[cs], ""])
+                    self.eventsModel.insert_event([memTime - Decimal("0.001"), self.currentSubject, cs, cm[cs], ""])
 
 
         # remove key code from modifiers
@@ -5910,22 +5616,13 @@ item []:
         else:
             subject = self.currentSubject
 
-        # add event to pj
+        # add event to pj at its sorted position
+        self.current_events_index()
         if "row" in event:
-            self.pj[OBSERVATIONS][self.observationId][EVENTS][event['row']] =  [memTime, subject, event['code'], modifier_str, comment]
-        else:
-            self.pj[OBSERVATIONS][self.observationId][EVENTS].append( [memTime, subject, event['code'], modifier_str, comment] )
-
-        # sort events in pj
-        self.pj[OBSERVATIONS][self.observationId][EVENTS].sort()
-
-        # reload all events in tw
-
-        self.loadEventsInTW(self.observationId)
-
-        item = self.twEvents.item([i for i,t in enumerate( self.pj[OBSERVATIONS][self.observationId][EVENTS]) if t[0] == memTime][0], 0)
+            self.eventsModel.remove_rows([event['row']])
+        row = self.eventsModel.insert_event([memTime, subject, event['code'], modifier_str, comment])
 
-        self.twEvents.scrollToItem( item )
+        self.twEvents.scrollTo(self.eventsModel.index(row, 0))
 
         self.projectChanged = True
 
@@ -5987,14 +5684,14 @@ item []:
                 if self.playMode == FFMPEG:
                     # cumulative time
 
-                    memLaps = Decimal( self.FFmpegGlobalFrame * ( 1000 / list(self.fps.values())[0]) / 1000).quantize(Decimal(".001"))
+                    memLaps = Decimal(self.frame_time(self.FFmpegGlobalFrame) / 1000).quantize(Decimal(".001"))
 
                     return memLaps
 
                 else: # playMode == VLC
 
                     # cumulative time
-                    memLaps = Decimal(str(round(( sum(self.duration[0 : self.media_list.index_of_item(self.mediaplayer.get_media()) ]) \
+                    memLaps = Decimal(str(round(( self.mediaTimeline.offset(self.media_list.index_of_item(self.mediaplayer.get_media())) \
                               + self.mediaplayer.get_time()) / 1000 , 3)))
 
                     return memLaps
@@ -6290,10 +5987,7 @@ item []:
 
             row = self.twEvents.selectedIndexes()[0].row()
 
-            if ':' in self.twEvents.item(row, 0).text():
-                time_ = time2seconds(  self.twEvents.item(row, 0).text()  )
-            else:
-                time_  = Decimal( self.twEvents.item(row, 0).text() )
+            time_ = self.pj[OBSERVATIONS][self.observationId][EVENTS][row][EVENT_TIME_FIELD_IDX]
 
             # substract time offset
             time_ -= self.pj[OBSERVATIONS][self.observationId][TIME_OFFSET]
@@ -6316,29 +6010,7 @@ item []:
 
                 else: # more media in player 1
 
-                    # remember if player paused (go previous will start playing)
-                    flagPaused = self.mediaListPlayer.get_state() == vlc.State.Paused
-
-                    tot = 0
-                    for idx, d in enumerate(self.duration):
-                        if newTime >= tot and newTime < tot+d:
-                            self.mediaListPlayer.play_item_at_index(idx)
-
-                            # wait until media is played
-                            while True:
-                                if self.mediaListPlayer.get_state() in [vlc.State.Playing, vlc.State.Ended]:
-                                    break
-
-                            '''while self.mediaListPlayer.get_state() != vlc.State.Playing and self.mediaListPlayer.get_state() != vlc.State.Ended:
-                                pass'''
-
-                            if flagPaused:
-                                self.mediaListPlayer.pause()
-
-                            self.mediaplayer.set_time( newTime -  sum(self.duration[0 : self.media_list.index_of_item(self.mediaplayer.get_media()) ]))
-                            break
-
-                        tot += d
+                    self.play_global_time(newTime)
 
                 self.timer_out()
                 self.timer_spectro_out()
@@ -6346,9 +6018,7 @@ item []:
 
             if self.playMode == FFMPEG:
 
-                frameDuration = Decimal(1000 / list(self.fps.values())[0])
-
-                currentFrame = round( newTime/ frameDuration )
+                currentFrame = self.time_frame(newTime)
 
                 self.FFmpegGlobalFrame = currentFrame
 
@@ -6402,7 +6072,7 @@ item []:
             return timeSeconds
 
 
-        if self.twEvents.rowCount():
+        if self.eventsModel.rowCount():
             text, ok = QInputDialog.getText(self, "Select events in time interval", "Interval: (example: 12.5-14.7 or 02:45.780-03:15.120 )", QLineEdit.Normal, "")
 
             if ok and text != '':
@@ -6428,12 +6098,8 @@ item []:
                     return
                 self.twEvents.clearSelection()
                 self.twEvents.setSelectionMode( QAbstractItemView.MultiSelection )
-                for r in range(0, self.twEvents.rowCount()):
-                    if ':' in self.twEvents.item(r, 0).text():
-                        time = time2seconds(self.twEvents.item(r, 0).text())
-                    else:
-                        time = Decimal(self.twEvents.item(r, 0).text())
-                    if from_sec <= time <= to_sec:
+                for r, event in enumerate(self.pj[OBSERVATIONS][self.observationId][EVENTS]):
+                    if from_sec <= event[EVENT_TIME_FIELD_IDX] <= to_sec:
                         self.twEvents.selectRow(r)
 
         else:
@@ -6454,6 +6120,7 @@ item []:
 
         if dialog.MessageDialog(programName, "Do you really want to delete all events from the current observation?", [YES, NO]) == YES:
             self.pj[OBSERVATIONS][self.observationId][EVENTS] = []
+            self.journal.clear(self.observationId)
             self.projectChanged = True
             self.loadEventsInTW(self.observationId)
 
@@ -6472,9 +6139,9 @@ item []:
         else:
             # list of rows to delete (set for unique)
             rows = set([item.row() for item in self.twEvents.selectedIndexes()])
-            self.pj[OBSERVATIONS][self.observationId][EVENTS] = [event for idx, event in enumerate(self.pj[OBSERVATIONS][self.observationId][EVENTS]) if not idx in rows]
+            self.current_events_index()
+            self.eventsModel.remove_rows(rows)
             self.projectChanged = True
-            self.loadEventsInTW( self.observationId )
 
 
     def edit_selected_events(self):
@@ -6494,17 +6161,19 @@ item []:
             dialogWindow.all_subjects = [self.pj[SUBJECTS][k]["name"].upper() for k in self.pj[SUBJECTS]]
 
             if dialogWindow.exec_():
-                for idx, event in enumerate(self.pj[OBSERVATIONS][self.observationId][EVENTS]):
-                    if idx in rowsToEdit:
-                        if dialogWindow.rbSubject.isChecked():
-                            event[SUBJECT_EVENT_FIELD] = dialogWindow.leText.text()
-                        if dialogWindow.rbBehavior.isChecked():
-                            event[BEHAVIOR_EVENT_FIELD] = dialogWindow.leText.text()
-                        if dialogWindow.rbComment.isChecked():
-                            event[COMMENT_EVENT_FIELD] = dialogWindow.leText.text()
-                        self.pj[OBSERVATIONS][self.observationId][EVENTS][idx] = event
-                        self.projectChanged = True
-                self.loadEventsInTW(self.observationId)
+                self.current_events_index()
+                # the edited events can move (sorted events)
+                for editedEvent in [self.pj[OBSERVATIONS][self.observationId][EVENTS][idx] for idx in sorted(rowsToEdit)]:
+                    idx = self.eventsModel.row(editedEvent)
+                    event = list(editedEvent)
+                    if dialogWindow.rbSubject.isChecked():
+                        event[SUBJECT_EVENT_FIELD] = dialogWindow.leText.text()
+                    if dialogWindow.rbBehavior.isChecked():
+                        event[BEHAVIOR_EVENT_FIELD] = dialogWindow.leText.text()
+                    if dialogWindow.rbComment.isChecked():
+                        event[COMMENT_EVENT_FIELD] = dialogWindow.leText.text()
+                    self.eventsModel.replace_event(idx, event)
+                    self.projectChanged = True
 
 
     def export_tabular_events(self, outputFormat):
@@ -6512,14 +6181,6 @@ item []:
         export events from selected observations in various formats: ODS, TSV, XLS
         """
 
-        def complete(l, max):
-            """
-            complete list with empty string until len = max
-            """
-            while len(l) < max:
-                l.append("")
-            return l
-
         # ask user observations to analyze
         result, selectedObservations = self.selectObservations(MULTIPLE)
 
@@ -6543,6 +6204,7 @@ item []:
             if not exportDir:
                 return
 
+        tasks = []
         for obsId in selectedObservations:
 
             if len(selectedObservations) == 1:
@@ -6564,162 +6226,27 @@ item []:
             else:
                 fileName = exportDir + os.sep + safeFileName(obsId) + "." + outputFormat
 
-            eventsWithStatus = self.update_events_start_stop2(self.pj[OBSERVATIONS][obsId][EVENTS])
-
-            # check max number of modifiers
-            max_modifiers = 0
-            for event in eventsWithStatus:
-                for c in pj_events_fields:
-                    if c == "modifier" and event[pj_obs_fields[c]]:
-                        max_modifiers = max(max_modifiers, len(event[pj_obs_fields[c]].split('|')))
-
-            # media file number
-            mediaNb = 0
-            if self.pj[OBSERVATIONS][obsId]["type"] in [MEDIA]:
-                for idx in self.pj[OBSERVATIONS][obsId][FILE]:
-                    for media in self.pj[OBSERVATIONS][obsId][FILE][idx]:
-                        mediaNb += 1
-
-            rows = []
-
-            # observation id
-            rows.append(["Observation id", obsId])
-            rows.append([""])
-
-            # media file name
-            if self.pj[OBSERVATIONS][obsId]["type"] in [MEDIA]:
-                rows.append(["Media file(s)"])
-            else:
-                rows.append(["Live observation"])
-            rows.append([""])
-
-            if self.pj[OBSERVATIONS][obsId][TYPE] in [MEDIA]:
-
-                for idx in self.pj[OBSERVATIONS][obsId][FILE]:
-                    for media in self.pj[OBSERVATIONS][obsId][FILE][idx]:
-                        rows.append(["Player #{0}".format(idx), media])
-            rows.append([""])
-
-            # date
-            if "date" in self.pj[OBSERVATIONS][obsId]:
-                rows.append(["Observation date", self.pj[OBSERVATIONS][obsId]["date"].replace('T', ' ')])
-            rows.append([""])
-
-            # description
-            if "description" in self.pj[OBSERVATIONS][obsId]:
-                rows.append(["Description", eol2space(self.pj[OBSERVATIONS][obsId]["description"])])
-            rows.append([""])
-
-            # time offset
-            if "time offset" in self.pj[OBSERVATIONS][obsId]:
-                rows.append(["Time offset (s)", self.pj[OBSERVATIONS][obsId]["time offset"]])
-            rows.append([""])
-
-            # independant variables
-            if "independent_variables" in self.pj[OBSERVATIONS][obsId]:
-                rows.append(["independent variables"])
-
-                rows.append(["variable", "value"])
-
-                for variable in self.pj[OBSERVATIONS][obsId]["independent_variables"]:
-                    rows.append(  [ variable, self.pj[OBSERVATIONS][obsId]["independent_variables"][variable] ])
-
-            rows.append([""])
-
-            # write table header
-            col = 0
-            header = ["Time"]
-            if includeMediaInfo == YES:
-                header.extend(["Media file path", "Media total length", "FPS"])
-
-            header.extend(["Subject", "Behavior"])
-            for x in range(1, max_modifiers + 1):
-                header.append("Modifier {}".format(x))
-            header.extend(["Comment", "Status"])
-
-            rows.append(header)
-
-            duration1 = []   # in seconds
-            if self.pj[OBSERVATIONS][obsId]["type"] in [MEDIA]:
-                try:
-                    for mediaFile in self.pj[OBSERVATIONS][obsId][FILE][PLAYER1]:
-                        duration1.append(self.pj[OBSERVATIONS][obsId]["media_info"]["length"][mediaFile])
-                except:
-                    pass
-
-            for event in eventsWithStatus:
-
-                if (((event[SUBJECT_EVENT_FIELD] in plot_parameters["selected subjects"])
-                   or (event[SUBJECT_EVENT_FIELD] == "" and NO_FOCAL_SUBJECT in plot_parameters["selected subjects"]))
-                   and (event[BEHAVIOR_EVENT_FIELD] in plot_parameters["selected behaviors"])):
-
-                    fields = []
-                    fields.append(float(event[EVENT_TIME_FIELD_IDX]))
-
-                    if includeMediaInfo == YES:
-                        mediaFileIdx = [idx1 for idx1, x in enumerate(duration1) if event[EVENT_TIME_FIELD_IDX] >= sum(duration1[0:idx1])][-1]
-                        fields.append(self.pj[OBSERVATIONS][obsId][FILE][PLAYER1][mediaFileIdx])
-                        # media total length
-                        fields.append(str(sum(duration1)))
-                        # fps
-                        fields.append(self.pj[OBSERVATIONS][obsId]["media_info"]["fps"][self.pj[OBSERVATIONS][obsId][FILE][PLAYER1][mediaFileIdx]])
-
-                    fields.append(event[EVENT_SUBJECT_FIELD_IDX])
-                    fields.append(event[EVENT_BEHAVIOR_FIELD_IDX])
-
-                    modifiers = event[EVENT_MODIFIER_FIELD_IDX].split("|")
-                    while len(modifiers) < max_modifiers:
-                        modifiers.append("")
-
-                    for m in modifiers:
-                        fields.append(m)
-                    fields.append(event[COMMENT_EVENT_FIELD_IDX].replace(os.linesep, " "))
-                    # status
-                    fields.append(event[-1])
-
-                    rows.append( fields )
-
-            maxLen = max([len(r) for r in rows])
-            data = tablib.Dataset()
-
             # check if worksheet name will be > 31 char
+            title = ""
             if outputFormat == "xls":
                 if len(obsId) > 31:
-                    data.title = obsId[0:31]
+                    title = obsId[0:31]
                     QMessageBox.warning(None, programName, ("The worksheet name <b>{0}</b> was shortened to <b>{1}</b> due to XLS format limitations.\n"
                                                             "The limit on worksheet name length is 31 characters").format(obsId, obsId[0:31]),
                                         QMessageBox.Ok | QMessageBox.Default, QMessageBox.NoButton)
-
             else:
-                data.title = obsId
-
-            for row in rows:
-                data.append( complete(row, maxLen))
-
-            try:
-                if outputFormat == "tsv":
-                    with open(fileName, "w") as f:
-                        f.write(data.tsv)
-                if outputFormat == "ods":
-                    with open(fileName, "wb") as f:
-                        f.write(data.ods)
-                if outputFormat == "xls":
-                    with open(fileName, "wb") as f:
-                        f.write(data.xls)
-                '''
-                if outputFormat == "xlsx":
-                    with open(fileName, "wb") as f:
-                        f.write(data.xlsx)
-                '''
+                title = obsId
 
-            except:
-                #errorMsg = sys.exc_info()[1].strerror
-                errorMsg = sys.exc_info()[1]
+            tasks.append((project_functions.observation_project(self.pj, obsId), obsId,
+                          plot_parameters["selected subjects"], plot_parameters["selected behaviors"], includeMediaInfo,
+                          title, fileName, outputFormat))
 
-                logging.critical(errorMsg)
-                QMessageBox.critical(None, programName, str(errorMsg), QMessageBox.Ok | QMessageBox.Default, QMessageBox.NoButton)
+        errors = self.analysisScheduler.run(self, "Exporting events", export_functions.export_observation_events, tasks)
+        if errors is None:
+            return
 
-            del data
+        for errorMsg in [x for x in errors if x]:
+            QMessageBox.critical(None, programName, errorMsg, QMessageBox.Ok | QMessageBox.Default, QMessageBox.NoButton)
 
         self.statusbar.showMessage("Events exported", 0)
 
@@ -6733,9 +6260,6 @@ item []:
         for use with BSA (see http://penelope.unito.it/bsa)
         """
 
-        def replace_spaces(l):
-            return [x.replace(" ", "_") for x in l]
-
         # ask user observations to analyze
         result, selectedObservations = self.selectObservations(MULTIPLE)
 
@@ -6754,66 +6278,44 @@ item []:
 
         #cursor = self.loadEventsInDB(selectedSubjects, selectedObservations, selectedBehaviors)
 
-        if fileName:
-            try:
-                with open(fileName, "w") as outFile:
-                    for obsId in selectedObservations:
-                        # observation id
-                        outFile.write("# observation id: {0}{1}".format(obsId, os.linesep) )
-                        # observation descrition
-                        outFile.write("# observation description: {0}{1}".format(self.pj[OBSERVATIONS][obsId]["description"].replace(os.linesep, " "), os.linesep))
-                        # media file name
-                        if self.pj[OBSERVATIONS][obsId][TYPE] in [MEDIA]:
-                            outFile.write("# Media file name: {0}{1}{1}".format(", ".join([os.path.basename(x) for x in self.pj[OBSERVATIONS][obsId][FILE][PLAYER1]]), os.linesep))
-                        if self.pj[OBSERVATIONS][obsId][TYPE] in [LIVE]:
-                            outFile.write("# Live observation{0}{0}".format(os.linesep))
-
-                    for subj in plot_parameters["selected subjects"]:
-                        if subj:
-                            subj_str = "{0}{1}:{0}".format(os.linesep, subj)
-                        else:
-                            subj_str = "{0}No focal subject:{0}".format(os.linesep)
-                        outFile.write(subj_str)
-
-
-                        for obsId in selectedObservations:
-                            s = ""
-
-                            currentStates = []
-
-                            eventsWithStatus = self.update_events_start_stop2(self.pj[OBSERVATIONS][obsId][EVENTS])
-
-                            for event in eventsWithStatus:
-
-                                if event[EVENT_SUBJECT_FIELD_IDX] == subj or (subj == NO_FOCAL_SUBJECT and event[EVENT_SUBJECT_FIELD_IDX] == ""):
-
-                                    if event[-1] == POINT:
-                                        if currentStates:
-                                            s += "+".join(replace_spaces(currentStates)) + "+" + event[EVENT_BEHAVIOR_FIELD_IDX].replace(" ", "_")
-                                        else:
-                                            s += event[EVENT_BEHAVIOR_FIELD_IDX].replace(" ", "_")
-                                        s += self.behaviouralStringsSeparator
-
-                                    if event[-1] == "START":
-                                        currentStates.append(event[EVENT_BEHAVIOR_FIELD_IDX])
-                                        s += "+".join(replace_spaces(currentStates)) + self.behaviouralStringsSeparator
+        if not fileName:
+            return
 
-                                    if event[-1] == "STOP":
-                                        if event[EVENT_BEHAVIOR_FIELD_IDX] in currentStates:
-                                            currentStates.remove( event[EVENT_BEHAVIOR_FIELD_IDX])
-                                        if currentStates:
-                                            s += "+".join(replace_spaces(currentStates)) + self.behaviouralStringsSeparator
+        results = self.analysisScheduler.run(self, "Exporting events as strings", export_functions.observation_strings,
+                                             [(project_functions.observation_project(self.pj, obsId), obsId,
+                                               plot_parameters["selected subjects"], self.behaviouralStringsSeparator)
+                                              for obsId in selectedObservations])
+        if results is None:
+            return
+        strings = dict(zip(selectedObservations, results))
 
+        try:
+            with open(fileName, "w") as outFile:
+                for obsId in selectedObservations:
+                    # observation id
+                    outFile.write("# observation id: {0}{1}".format(obsId, os.linesep) )
+                    # observation descrition
+                    outFile.write("# observation description: {0}{1}".format(self.pj[OBSERVATIONS][obsId]["description"].replace(os.linesep, " "), os.linesep))
+                    # media file name
+                    if self.pj[OBSERVATIONS][obsId][TYPE] in [MEDIA]:
+                        outFile.write("# Media file name: {0}{1}{1}".format(", ".join([os.path.basename(x) for x in self.pj[OBSERVATIONS][obsId][FILE][PLAYER1]]), os.linesep))
+                    if self.pj[OBSERVATIONS][obsId][TYPE] in [LIVE]:
+                        outFile.write("# Live observation{0}{0}".format(os.linesep))
+
+                for subj in plot_parameters["selected subjects"]:
+                    if subj:
+                        subj_str = "{0}{1}:{0}".format(os.linesep, subj)
+                    else:
+                        subj_str = "{0}No focal subject:{0}".format(os.linesep)
+                    outFile.write(subj_str)
 
-                            # remove last separator (if separator not empty)
-                            if self.behaviouralStringsSeparator:
-                                s = s[0 : -len(self.behaviouralStringsSeparator)]
-                            if s:
-                                outFile.write(s + os.linesep)
-            except:
-                errorMsg = sys.exc_info()[1]
-                logging.critical(errorMsg)
-                QMessageBox.critical(None, programName, str(errorMsg), QMessageBox.Ok | QMessageBox.Default, QMessageBox.NoButton)
+                    for obsId in selectedObservations:
+                        if strings[obsId][subj]:
+                            outFile.write(strings[obsId][subj] + os.linesep)
+        except:
+            errorMsg = sys.exc_info()[1]
+            logging.critical(errorMsg)
+            QMessageBox.critical(None, programName, str(errorMsg), QMessageBox.Ok | QMessageBox.Default, QMessageBox.NoButton)
 
 
     def closeEvent(self, event):
@@ -6830,6 +6332,15 @@ item []:
             if response == CANCEL:
                 event.ignore()
 
+            if response == "Discard":
+                self.journal.discard()
+
+        if event.isAccepted():
+            self.projectSaver.wait()
+            self.journal.stop()
+            self.analysisScheduler.shutdown()
+            self.stop_spectrogram_generation()
+
         self.saveConfigFile()
 
         try:
@@ -6837,6 +6348,9 @@ item []:
         except:
             pass
 
+        if self.spectroOverview:
+            self.spectroOverview.close()
+
     def actionQuit_activated(self):
         self.close()
 
@@ -6934,9 +6448,9 @@ item []:
         if self.playerType == VLC:
 
             if self.playMode == FFMPEG:
-                currentTime = self.FFmpegGlobalFrame / list(self.fps.values())[0]
-                if int((currentTime - self.fast ) * list(self.fps.values())[0]) > 0:
-                    self.FFmpegGlobalFrame = int((currentTime - self.fast ) * list(self.fps.values())[0])
+                currentTime = self.frame_time(self.FFmpegGlobalFrame) / 1000
+                if currentTime - self.fast > 0:
+                    self.FFmpegGlobalFrame = self.time_frame((currentTime - self.fast) * 1000)
                 else:
                     self.FFmpegGlobalFrame = 0   # position to init
                 self.FFmpegTimerOut()
@@ -6953,35 +6467,14 @@ item []:
 
                 elif self.media_list.count() > 1:
 
-                    newTime = (sum(self.duration[0 : self.media_list.index_of_item(self.mediaplayer.get_media()) ]) + self.mediaplayer.get_time()) - self.fast * 1000
+                    newTime = (self.mediaTimeline.offset(self.media_list.index_of_item(self.mediaplayer.get_media())) + self.mediaplayer.get_time()) - self.fast * 1000
                     if newTime < self.fast * 1000:
                         newTime = 0
 
                     logging.debug( 'newTime: {0}'.format(newTime))
-                    logging.debug( 'sum self.duration: {0}'.format(sum(self.duration)))
-
-                    # remember if player paused (go previous will start playing)
-                    flagPaused = self.mediaListPlayer.get_state() == vlc.State.Paused
-
-                    logging.debug('flagPaused: {0}'.format(flagPaused))
+                    logging.debug( 'total duration: {0}'.format(self.mediaTimeline.total()))
 
-                    tot = 0
-                    for idx, d in enumerate(self.duration):
-                        if newTime >= tot and newTime < tot+d:
-                            self.mediaListPlayer.play_item_at_index(idx)
-
-                            # wait until media is played
-                            while True:
-                                if self.mediaListPlayer.get_state() in [vlc.State.Playing, vlc.State.Ended]:
-                                    break
-
-                            if flagPaused:
-                                self.mediaListPlayer.pause()
-
-                            self.mediaplayer.set_time( newTime -  sum(self.duration[0 : self.media_list.index_of_item(self.mediaplayer.get_media()) ]))
-
-                            break
-                        tot += d
+                    self.play_global_time(newTime)
 
                 else:
                     self.no_media()
@@ -7004,8 +6497,8 @@ item []:
 
             if self.playMode == FFMPEG:
 
-                currentTime = self.FFmpegGlobalFrame / list(self.fps.values())[0]
-                self.FFmpegGlobalFrame =  int((currentTime + self.fast )  * list(self.fps.values())[0])
+                currentTime = self.frame_time(self.FFmpegGlobalFrame) / 1000
+                self.FFmpegGlobalFrame = self.time_frame((currentTime + self.fast) * 1000)
                 self.FFmpegTimerOut()
 
             else:
@@ -7023,33 +6516,10 @@ item []:
 
                     logging.debug('self.fast: {0}'.format(self.fast))
 
-                    newTime = (sum(self.duration[0 : self.media_list.index_of_item(self.mediaplayer.get_media()) ]) + self.mediaplayer.get_time()) + self.fast * 1000
-
-                    if newTime < sum(self.duration):
-
-                        # remember if player paused (go previous will start playing)
-                        flagPaused = self.mediaListPlayer.get_state() == vlc.State.Paused
-
-                        logging.debug('flagPaused {0}'.format( flagPaused))
-
-                        tot = 0
-                        for idx, d in enumerate(self.duration):
-                            if newTime >= tot and newTime < tot+d:
-                                self.mediaListPlayer.play_item_at_index(idx)
-                                app.processEvents()
-
-                                # wait until media is played
-                                while True:
-                                    if self.mediaListPlayer.get_state() in [vlc.State.Playing, vlc.State.Ended]:
-                                        break
-
-                                if flagPaused:
-                                    self.mediaListPlayer.pause()
-
-                                self.mediaplayer.set_time( newTime -  sum(self.duration[0 : self.media_list.index_of_item(self.mediaplayer.get_media()) ]))
+                    newTime = (self.mediaTimeline.offset(self.media_list.index_of_item(self.mediaplayer.get_media())) + self.mediaplayer.get_time()) + self.fast * 1000
 
-                                break
-                            tot += d
+                    if newTime < self.mediaTimeline.total():
+                        self.play_global_time(newTime)
 
                 else:
                     self.no_media()
@@ -7094,6 +6564,8 @@ item []:
 
 if __name__=="__main__":
 
+    # processes of analysis scheduler in frozen application
+    multiprocessing.freeze_support()
 
     app = QApplication(sys.argv)
 
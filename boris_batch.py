@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+
+"""
+BORIS
+Behavioral Observation Research Interactive Software
+Copyright 2012-2016 Olivier Friard
+
+This file is part of BORIS.
+
+  BORIS is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 3 of the License, or
+  any later version.
+
+  BORIS is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not see <http://www.gnu.org/licenses/>.
+
+
+Command line analysis of BORIS projects (Qt is not required)
+
+usage: boris_batch.py timebudget|export|aggregate|subtitles|convert [options] project.boris [project2.boris ...]
+       boris_batch.py benchmark [--events N] [--observations N] [--status]
+
+  --obs, --subjects, --behaviors: selection (default: all observations and the subjects and behaviors observed)
+  -j, --jobs: number of projects analyzed in parallel
+
+The results are written in the output directory (default: directory of project file)
+with the project file name as prefix.
+convert saves the projects in JSON, compact or SQLite format or in a project directory
+(in place without output directory),
+benchmark compares the JSON, compact, SQLite and directory formats on a synthetic project
+(with --status: times the START/STOP status of state events on synthetic events)
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import logging
+import tempfile
+import argparse
+import multiprocessing
+
+from config import *
+from utilities import safeFileName
+import project_functions
+import export_functions
+import analysis_store
+import time_budget_analysis
+import event_index
+
+
+def selection(pj, args):
+    """
+    returns selected observations, subjects and behaviors
+    """
+
+    selectedObservations = args.obs if args.obs else sorted(pj[OBSERVATIONS].keys())
+    for obsId in selectedObservations:
+        if obsId not in pj[OBSERVATIONS]:
+            raise Exception("Observation not found: {}".format(obsId))
+
+    selectedSubjects, selectedBehaviors = project_functions.default_selection(pj, selectedObservations)
+    if args.subjects:
+        selectedSubjects = args.subjects
+    if args.behaviors:
+        selectedBehaviors = args.behaviors
+
+    return selectedObservations, selectedSubjects, selectedBehaviors
+
+
+def include_media_info(pj, selectedObservations, flagMediaInfo):
+    """
+    YES or NO if a media observation is selected else None (as asked by the GUI)
+    """
+    if [obsId for obsId in selectedObservations if pj[OBSERVATIONS][obsId][TYPE] in [MEDIA]]:
+        return YES if flagMediaInfo else NO
+    return None
+
+
+def time_budget(pj, args, prefix):
+    """
+    time budget of selected observations, subjects and behaviors
+    """
+
+    selectedObservations, selectedSubjects, selectedBehaviors = selection(pj, args)
+
+    # total length of observations (last event time if a media length is not available)
+    lengths = [project_functions.observation_length(pj, obsId) for obsId in selectedObservations]
+    if 0 in lengths:
+        lengths = [project_functions.last_event_time(pj, obsId) for obsId in selectedObservations]
+    selectedObsTotalMediaLength = sum(lengths)
+
+    startTime = args.start if args.start is not None else 0
+    endTime = args.end if args.end is not None else float(selectedObsTotalMediaLength)
+    if startTime > endTime:
+        raise Exception("The start time is after the end time")
+
+    out = time_budget_analysis.time_budget({obsId: project_functions.observation_events(pj, obsId, selectedBehaviors) for obsId in selectedObservations},
+                                           {pj[ETHOGRAM][x]["code"]: pj[ETHOGRAM][x][TYPE] for x in pj[ETHOGRAM]},
+                                           selectedSubjects,
+                                           selectedBehaviors,
+                                           args.include_modifiers,
+                                           args.exclude_behaviors,
+                                           startTime,
+                                           endTime)
+
+    rows = [["Subject", "Behavior", "Modifiers", "Total number", "Total duration (s)",
+             "Duration mean (s)", "Duration std dev", "inter-event intervals mean (s)",
+             "inter-event intervals std dev", "% of total media length"]]
+
+    fields = ["subject", "behavior", "modifiers", "number", "duration", "duration_mean", "duration_stdev", "inter_duration_mean", "inter_duration_stdev"]
+
+    for row in out:
+        values = [str(row[field]).replace(" ()", "") for field in fields]
+
+        # % of total time
+        if row["duration"] != "-" and row["duration"] != 0 and row["duration"] != UNPAIRED and selectedObsTotalMediaLength:
+            if len(selectedObservations) > 1:
+                values.append(str(round(row["duration"] / float(selectedObsTotalMediaLength) * 100, 1)))
+            else:
+                values.append(str(round(row["duration"] / float(endTime - startTime) * 100, 1)))
+        else:
+            values.append("-")
+
+        rows.append(values)
+
+    fileName = "{}.time_budget.{}".format(prefix, args.format)
+    export_functions.write_events_rows(rows, "Time budget", fileName, args.format)
+
+    return [fileName]
+
+
+def export_events(pj, args, prefix):
+    """
+    export events of selected observations (one file by observation)
+    """
+
+    selectedObservations, selectedSubjects, selectedBehaviors = selection(pj, args)
+    includeMediaInfo = include_media_info(pj, selectedObservations, args.media_info)
+
+    fileNames = []
+    for obsId in selectedObservations:
+        rows = export_functions.observation_events_rows(pj, obsId, selectedSubjects, selectedBehaviors, includeMediaInfo)
+        fileName = "{}.{}.{}".format(prefix, safeFileName(obsId), args.format)
+        export_functions.write_events_rows(rows, obsId[0:31] if args.format == "xls" else obsId, fileName, args.format)
+        fileNames.append(fileName)
+
+    return fileNames
+
+
+def export_aggregated_events(pj, args, prefix):
+    """
+    export aggregated events of selected observations in one file
+    """
+
+    selectedObservations, selectedSubjects, selectedBehaviors = selection(pj, args)
+
+    cursor = analysis_store.AnalysisStore().select(pj, selectedSubjects, selectedObservations, selectedBehaviors)
+    out, flagUnpairedEventFound = export_functions.aggregated_events(pj, cursor, selectedObservations, selectedSubjects, selectedBehaviors,
+                                                                     args.format, include_media_info(pj, selectedObservations, args.media_info))
+    if flagUnpairedEventFound:
+        logging.warning("Some state events are not paired. They were excluded from export")
+
+    fileName = "{}.aggregated_events.{}".format(prefix, "sql" if args.format == "sql" else "tsv")
+    with open(fileName, "w") as f:
+        f.write(out)
+
+    return [fileName]
+
+
+def create_subtitles(pj, args, prefix):
+    """
+    create subtitles files for the media files of selected observations in output directory
+    """
+
+    selectedObservations, selectedSubjects, selectedBehaviors = selection(pj, args)
+
+    cursor = analysis_store.AnalysisStore().select(pj, selectedSubjects, selectedObservations, selectedBehaviors)
+    flagUnpairedEventFound, errors = export_functions.create_subtitles(pj, cursor, selectedObservations, selectedSubjects, selectedBehaviors,
+                                                                       args.include_modifiers, os.path.dirname(prefix))
+    if flagUnpairedEventFound:
+        logging.warning("Some state events are not paired. They were excluded from subtitles")
+    if errors:
+        raise Exception(", ".join(errors))
+
+    return [os.path.dirname(prefix)]
+
+
+def convert_project(pj, args, prefix):
+    """
+    save project in JSON, compact or SQLite format or in a project directory (named as the project without extension)
+    """
+
+    fileName = prefix if args.format == project_functions.DIRECTORY_FORMAT else prefix + ".boris"
+    project_functions.save_project(pj, fileName, args.format)
+
+    return [fileName]
+
+
+commands = {"timebudget": time_budget,
+            "export": export_events,
+            "aggregate": export_aggregated_events,
+            "subtitles": create_subtitles,
+            "convert": convert_project}
+
+
+def synthetic_project(nEvents, nObservations):
+    """
+    returns a project with nEvents events of 5 subjects and 20 behaviors in nObservations observations
+    """
+
+    behaviors = ["b{}".format(idx) for idx in range(20)]
+    pj = {"project_name": "benchmark", "project_date": "", "project_description": "", "time_format": HHMMSS,
+          "coding_map": {},
+          ETHOGRAM: dict([(str(idx), {"key": "", "code": code, TYPE: "Point event", "description": "", "modifiers": "", "excluded": ""})
+                          for idx, code in enumerate(behaviors)]),
+          SUBJECTS: dict([(str(idx), {"key": "", "name": "s{}".format(idx), "description": ""}) for idx in range(5)]),
+          OBSERVATIONS: {}}
+
+    for obs in range(nObservations):
+        events = sorted([[round(random.uniform(0, 3600), 3), random.choice(["", "s0", "s1", "s2", "s3", "s4"]),
+                          random.choice(behaviors), random.choice(["", "", "m1", "m2"]), ""]
+                         for _ in range(nEvents // nObservations)])
+        pj[OBSERVATIONS]["obs #{}".format(obs)] = {TYPE: LIVE, FILE: {PLAYER1: [], PLAYER2: []}, "date": "", "description": "",
+                                                   "time offset": 0, "time offset second player": 0, EVENTS: events}
+    return pj
+
+
+def benchmark(args):
+    """
+    compare size, save time, load time, time of access to the events of one observation
+    and time of save after adding an event in one observation
+    of JSON, compact, SQLite and directory formats on a synthetic project
+    """
+
+    tmpDir = tempfile.mkdtemp()
+    pj = synthetic_project(args.events, args.observations)
+
+    print("{} events in {} observations".format(args.events, args.observations))
+    print("format\tsize (MB)\tsave (s)\tload (s)\tobservation (s)\tresave (s)")
+    for format_ in [project_functions.JSON_FORMAT, project_functions.COMPACT_FORMAT,
+                    project_functions.SQLITE_FORMAT, project_functions.DIRECTORY_FORMAT]:
+        fileName = os.path.join(tmpDir, "benchmark_{}.boris".format(format_))
+
+        t = time.time()
+        project_functions.save_project(pj, fileName, format_)
+        saveTime = time.time() - t
+
+        t = time.time()
+        loadedPj, _ = project_functions.load_project(fileName)
+        loadTime = time.time() - t
+
+        t = time.time()
+        events = loadedPj[OBSERVATIONS][random.choice(list(loadedPj[OBSERVATIONS]))][EVENTS]
+        accessTime = time.time() - t
+
+        events.append([max(events)[EVENT_TIME_FIELD_IDX] + 1, "", "b0", "", ""])
+        t = time.time()
+        project_functions.save_project(loadedPj, fileName)
+        resaveTime = time.time() - t
+
+        if os.path.isdir(fileName):
+            size = sum([os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(fileName) for f in files])
+        else:
+            size = os.path.getsize(fileName)
+
+        print("{}\t{:.1f}\t{:.2f}\t{:.2f}\t{:.3f}\t{:.2f}".format(format_, size / 1024 / 1024, saveTime, loadTime, accessTime, resaveTime))
+
+    shutil.rmtree(tmpDir)
+
+    return 0
+
+
+def events_start_stop_quadratic(events, stateBehaviorsCodes):
+    """
+    status of events by counting the previous events with same subject and code for each state event
+    (previous implementation, reference for benchmark_status)
+    """
+    status = []
+    for time_, subject, code in [event[0:3] for event in events]:
+        if code in stateBehaviorsCodes:
+            n = len([x for x in events if x[EVENT_BEHAVIOR_FIELD_IDX] == code and x[EVENT_TIME_FIELD_IDX] < time_ and x[EVENT_SUBJECT_FIELD_IDX] == subject])
+            status.append(STOP if n % 2 else START)
+        else:
+            status.append(POINT)
+    return status
+
+
+def benchmark_status(args):
+    """
+    time the START/STOP status of state events (event_index.events_start_stop) on random sorted events
+    of 4 subjects, 3 state behaviors and 2 point behaviors, from 1000 events to 1000000 events (at most --events).
+    The result is compared with the previous implementation up to 4000 events
+    """
+
+    stateBehaviorsCodes = ["s1", "s2", "s3"]
+    print("events\tprevious (s)\tsingle pass (s)")
+
+    for nEvents in [n for n in [1000, 2000, 4000, 100000, 1000000] if n <= args.events]:
+        events = sorted([[round(random.uniform(0, 3600), 3), random.choice(["a", "b", "c", "d"]),
+                          random.choice(stateBehaviorsCodes + ["p1", "p2"]), "", ""] for _ in range(nEvents)])
+
+        t = time.time()
+        status = event_index.events_start_stop(events, stateBehaviorsCodes)
+        singlePassTime = time.time() - t
+
+        previousTime = ""
+        if nEvents <= 4000:
+            t = time.time()
+            if events_start_stop_quadratic(events, stateBehaviorsCodes) != status:
+                raise Exception("different status for {} events".format(nEvents))
+            previousTime = "{:.3f}".format(time.time() - t)
+
+        print("{}\t{}\t{:.3f}".format(nEvents, previousTime, singlePassTime))
+
+    return 0
+
+
+def analyze_project(job):
+    """
+    run command on project
+    returns project file name, list of created files and error message (empty if no error)
+    """
+
+    projectFileName, args = job
+
+    try:
+        pj, _ = project_functions.load_project(projectFileName)
+        outputDir = args.output if args.output else os.path.dirname(os.path.abspath(projectFileName))
+        prefix = os.path.join(outputDir, os.path.splitext(os.path.basename(projectFileName))[0])
+        return projectFileName, commands[args.command](pj, args, prefix), ""
+    except:
+        return projectFileName, [], "{}: {}".format(sys.exc_info()[0].__name__, sys.exc_info()[1])
+
+
+def parse_arguments(argv):
+
+    parser = argparse.ArgumentParser(prog="boris_batch.py", description="Analysis of BORIS projects from command line")
+    parser.add_argument("-d", "--debug", action="store_true", default=False, help="Verbose mode for debugging")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    for command, help_, formats in [("timebudget", "time budget analysis", ["tsv", "ods", "xls"]),
+                                    ("export", "export events (one file by observation)", ["tsv", "ods", "xls"]),
+                                    ("aggregate", "export aggregated events", ["tab", "sql"]),
+                                    ("subtitles", "create subtitles files for media files", []),
+                                    ("convert", "convert project files", ["compact", "json", "sqlite", "directory"])]:
+
+        p = subparsers.add_parser(command, help=help_)
+        p.add_argument("projects", nargs="+", metavar="project", help="BORIS project file(s)")
+        p.add_argument("--obs", nargs="+", default=[], help="observations id (default: all observations)")
+        p.add_argument("--subjects", nargs="+", default=[], help="subjects (default: observed subjects)")
+        p.add_argument("--behaviors", nargs="+", default=[], help="behaviors codes (default: observed behaviors)")
+        p.add_argument("-o", "--output", default="", help="output directory (default: directory of project file)")
+        p.add_argument("-j", "--jobs", type=int, default=1, help="number of projects analyzed in parallel (0 for number of CPU)")
+
+        if formats:
+            p.add_argument("-f", "--format", choices=formats, default=formats[0], help="output format (default: {})".format(formats[0]))
+        if command in ["timebudget", "subtitles"]:
+            p.add_argument("--include-modifiers", action="store_true", default=False, help="include modifiers")
+        if command == "timebudget":
+            p.add_argument("--exclude-behaviors", action="store_true", default=False, help="exclude behaviors without events")
+            p.add_argument("--start", type=float, default=None, help="start time in s (only for one observation)")
+            p.add_argument("--end", type=float, default=None, help="end time in s (only for one observation)")
+        if command in ["export", "aggregate"]:
+            p.add_argument("--media-info", action="store_true", default=False, help="include media info")
+
+    p = subparsers.add_parser("benchmark", help="compare JSON, compact, SQLite and directory formats on a synthetic project")
+    p.add_argument("--events", type=int, default=1000000, help="number of events (default: 1000000)")
+    p.add_argument("--observations", type=int, default=100, help="number of observations (default: 100)")
+    p.add_argument("--status", action="store_true", default=False, help="time the START/STOP status of state events")
+
+    return parser.parse_args(argv)
+
+
+def main(argv):
+
+    args = parse_arguments(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING,
+                        format="%(asctime)s,%(msecs)d  %(message)s", datefmt="%H:%M:%S")
+
+    if args.command == "benchmark":
+        return benchmark_status(args) if args.status else benchmark(args)
+
+    if args.output and not os.path.isdir(args.output):
+        logging.critical("Output directory not found: {}".format(args.output))
+        return 1
+
+    jobs = [(projectFileName, args) for projectFileName in args.projects]
+    nJobs = min(args.jobs if args.jobs > 0 else multiprocessing.cpu_count(), len(jobs))
+
+    if nJobs > 1:
+        pool = multiprocessing.Pool(nJobs)
+        results = pool.imap_unordered(analyze_project, jobs)
+    else:
+        results = map(analyze_project, jobs)
+
+    returnCode = 0
+    for projectFileName, fileNames, error in results:
+        if error:
+            print("{}: {}".format(projectFileName, error), file=sys.stderr)
+            returnCode = 1
+        else:
+            for fileName in fileNames:
+                print("{}: {}".format(projectFileName, fileName))
+
+    if nJobs > 1:
+        pool.close()
+        pool.join()
+
+    return returnCode
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -140,7 +140,7 @@ class Ui_MainWindow(object):
         self.verticalLayout_7.setObjectName(_fromUtf8("verticalLayout_7"))
         self.verticalLayout = QtGui.QVBoxLayout()
         self.verticalLayout.setObjectName(_fromUtf8("verticalLayout"))
-        self.twEvents = QtGui.QTableWidget(self.dockWidgetContents_2)
+        self.twEvents = QtGui.QTableView(self.dockWidgetContents_2)
         self.twEvents.setEnabled(True)
         self.twEvents.setFocusPolicy(QtCore.Qt.NoFocus)
         self.twEvents.setAutoScroll(False)
@@ -152,8 +152,6 @@ class Ui_MainWindow(object):
         self.twEvents.setSelectionMode(QtGui.QAbstractItemView.ExtendedSelection)
         self.twEvents.setSelectionBehavior(QtGui.QAbstractItemView.SelectRows)
         self.twEvents.setObjectName(_fromUtf8("twEvents"))
-        self.twEvents.setColumnCount(0)
-        self.twEvents.setRowCount(0)
         self.verticalLayout.addWidget(self.twEvents)
         self.verticalLayout_7.addLayout(self.verticalLayout)
         self.dwObservations.setWidget(self.dockWidgetContents_2)
@@ -321,6 +319,8 @@ class Ui_MainWindow(object):
         self.actionEdit_selected_events.setObjectName(_fromUtf8("actionEdit_selected_events"))
         self.actionShow_spectrogram = QtGui.QAction(MainWindow)
         self.actionShow_spectrogram.setObjectName(_fromUtf8("actionShow_spectrogram"))
+        self.actionSpectrogram_overview = QtGui.QAction(MainWindow)
+        self.actionSpectrogram_overview.setObjectName(_fromUtf8("actionSpectrogram_overview"))
         self.actionExport_events_as_Praat_TextGrid = QtGui.QAction(MainWindow)
         self.actionExport_events_as_Praat_TextGrid.setObjectName(_fromUtf8("actionExport_events_as_Praat_TextGrid"))
         self.actionExtract_events_from_media_files = QtGui.QAction(MainWindow)
@@ -395,6 +395,7 @@ class Ui_MainWindow(object):
         self.menuPlayback.addAction(self.actionNext)
         self.menuTools.addAction(self.actionMapCreator)
         self.menuTools.addAction(self.actionShow_spectrogram)
+        self.menuTools.addAction(self.actionSpectrogram_overview)
         self.menuTools.addAction(self.actionDistance)
         self.menubar.addAction(self.menuFile.menuAction())
         self.menubar.addAction(self.menuObservations.menuAction())
@@ -528,6 +529,7 @@ class Ui_MainWindow(object):
         self.actionCheckStateEvents.setText(_translate("MainWindow", "Check state events", None))
         self.actionEdit_selected_events.setText(_translate("MainWindow", "Edit selected event(s)", None))
         self.actionShow_spectrogram.setText(_translate("MainWindow", "Show spectrogram", None))
+        self.actionSpectrogram_overview.setText(_translate("MainWindow", "Spectrogram overview", None))
         self.actionExport_events_as_Praat_TextGrid.setText(_translate("MainWindow", "Export events as Praat TextGrid", None))
         self.actionExtract_events_from_media_files.setText(_translate("MainWindow", "Extract events from media files", None))
         self.actionDistance.setText(_translate("MainWindow", "Geometric measurement", None))
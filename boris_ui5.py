@@ -127,7 +127,7 @@ class Ui_MainWindow(object):
         self.verticalLayout_7.setObjectName("verticalLayout_7")
         self.verticalLayout = QtWidgets.QVBoxLayout()
         self.verticalLayout.setObjectName("verticalLayout")
-        self.twEvents = QtWidgets.QTableWidget(self.dockWidgetContents_2)
+        self.twEvents = QtWidgets.QTableView(self.dockWidgetContents_2)
         self.twEvents.setEnabled(True)
         self.twEvents.setFocusPolicy(QtCore.Qt.NoFocus)
         self.twEvents.setAutoScroll(False)
@@ -139,8 +139,6 @@ class Ui_MainWindow(object):
         self.twEvents.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
         self.twEvents.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
         self.twEvents.setObjectName("twEvents")
-        self.twEvents.setColumnCount(0)
-        self.twEvents.setRowCount(0)
         self.verticalLayout.addWidget(self.twEvents)
         self.verticalLayout_7.addLayout(self.verticalLayout)
         self.dwObservations.setWidget(self.dockWidgetContents_2)
@@ -309,6 +307,8 @@ class Ui_MainWindow(object):
         self.actionEdit_selected_events.setObjectName("actionEdit_selected_events")
         self.actionShow_spectrogram = QtWidgets.QAction(MainWindow)
         self.actionShow_spectrogram.setObjectName("actionShow_spectrogram")
+        self.actionSpectrogram_overview = QtWidgets.QAction(MainWindow)
+        self.actionSpectrogram_overview.setObjectName("actionSpectrogram_overview")
         self.actionExport_events_as_Praat_TextGrid = QtWidgets.QAction(MainWindow)
         self.actionExport_events_as_Praat_TextGrid.setObjectName("actionExport_events_as_Praat_TextGrid")
         self.actionExtract_events_from_media_files = QtWidgets.QAction(MainWindow)
@@ -383,6 +383,7 @@ class Ui_MainWindow(object):
         self.menuPlayback.addAction(self.actionNext)
         self.menuTools.addAction(self.actionMapCreator)
         self.menuTools.addAction(self.actionShow_spectrogram)
+        self.menuTools.addAction(self.actionSpectrogram_overview)
         self.menuTools.addAction(self.actionDistance)
         self.menubar.addAction(self.menuFile.menuAction())
         self.menubar.addAction(self.menuObservations.menuAction())
@@ -517,6 +518,7 @@ class Ui_MainWindow(object):
         self.actionCheckStateEvents.setText(_translate("MainWindow", "Check state events"))
         self.actionEdit_selected_events.setText(_translate("MainWindow", "Edit selected event(s)"))
         self.actionShow_spectrogram.setText(_translate("MainWindow", "Show spectrogram"))
+        self.actionSpectrogram_overview.setText(_translate("MainWindow", "Spectrogram overview"))
         self.actionExport_events_as_Praat_TextGrid.setText(_translate("MainWindow", "Export events as Praat TextGrid"))
         self.actionExtract_events_from_media_files.setText(_translate("MainWindow", "Extract events from media files"))
         self.actionDistance.setText(_translate("MainWindow", "Geometric measurement"))
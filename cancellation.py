@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+"""
+BORIS
+Behavioral Observation Research Interactive Software
+Copyright 2012-2016 Olivier Friard
+
+This file is part of BORIS.
+
+  BORIS is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 3 of the License, or
+  any later version.
+
+  BORIS is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not see <http://www.gnu.org/licenses/>.
+
+
+Cancellation of the analyses running in the processes of a pool (without Qt)
+"""
+
+# number of the last analysis cancelled (shared by the processes of the pool, see init)
+cancelledRun = None
+# number of the analysis of the task running in this process (see run)
+currentRun = None
+
+
+def init(value):
+    """
+    initializer of the processes of the pool: record the number of the last analysis cancelled
+    """
+    global cancelledRun
+    cancelledRun = value
+
+
+def run(number, function, *args):
+    """
+    run the task function(*args) of the analysis number in a process of the pool
+    """
+    global currentRun
+    currentRun = number
+    return function(*args)
+
+
+def cancelled():
+    """
+    True if the analysis of the running task was cancelled
+    the tasks check it before writing files
+    """
+    return cancelledRun is not None and currentRun is not None and cancelledRun.value >= currentRun
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+
+"""
+BORIS
+Behavioral Observation Research Interactive Software
+Copyright 2012-2016 Olivier Friard
+
+This file is part of BORIS.
+
+  BORIS is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 3 of the License, or
+  any later version.
+
+  BORIS is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not see <http://www.gnu.org/licenses/>.
+
+
+Extraction of the media sequences corresponding to coded events (without Qt)
+"""
+
+import os
+import re
+import bisect
+import threading
+import subprocess
+import logging
+from decimal import *
+
+from config import *
+from utilities import float2decimal
+import project_functions
+import media_timeline
+
+
+# max difference (in seconds) between the start of a sequence and a key frame for extracting without re-encoding
+KEYFRAME_TOLERANCE = 0.001
+
+
+def extraction_jobs(pj, cursor, selectedObservations, selectedSubjects, selectedBehaviors, timeOffset, exportDir):
+    """
+    returns the list of sequences to extract and True if some unpaired state events were excluded
+    a sequence is a dictionary with keys: input (media file), start, stop (in media file), output (file name)
+
+    in case of point event, from -timeOffset to +timeOffset seconds are extracted
+    cursor -- cursor of the analysis store with the events of selected observations, subjects and behaviors
+    """
+
+    eventTypes = dict([(behavior, str(project_functions.event_type(pj, behavior)).upper()) for behavior in selectedBehaviors])
+    flagUnpairedEventFound = False
+    jobs = []
+
+    for obsId in selectedObservations:
+
+        for nplayer in [PLAYER1, PLAYER2]:
+
+            if not pj[OBSERVATIONS][obsId][FILE][nplayer]:
+                continue
+
+            # in seconds
+            timeline = media_timeline.MediaTimeline([pj[OBSERVATIONS][obsId]["media_info"]["length"][mediaFile] for mediaFile in pj[OBSERVATIONS][obsId][FILE][nplayer]])
+
+            logging.debug("duration player {}: {}".format(nplayer, timeline.durations))
+
+            for subject in selectedSubjects:
+
+                for behavior in selectedBehaviors:
+
+                    cursor.execute("SELECT occurence FROM events WHERE observation = ? AND subject = ? AND code = ? ORDER BY occurence", (obsId, subject, behavior))
+                    rows = [float2decimal(r["occurence"]) for r in cursor.fetchall()]
+
+                    if STATE in eventTypes[behavior] and len(rows) % 2:  # unpaired events
+                        flagUnpairedEventFound = True
+                        continue
+
+                    for idx, occurence in enumerate(rows):
+
+                        if STATE in eventTypes[behavior] and idx % 2:
+                            continue
+
+                        mediaFileIdx = timeline.media_index(occurence)
+                        mediaOffset = float2decimal(timeline.offset(mediaFileIdx))
+
+                        globalStart = Decimal("0.000") if occurence < timeOffset else round(occurence - timeOffset, 3)
+                        start = max(Decimal("0.000"), round(occurence - timeOffset - mediaOffset, 3))
+
+                        if STATE in eventTypes[behavior]:
+                            globalStop = round(rows[idx + 1] + timeOffset, 3)
+                        else:
+                            globalStop = round(occurence + timeOffset, 3)
+                        stop = round(globalStop - mediaOffset, 3)
+
+                        mediaFile = pj[OBSERVATIONS][obsId][FILE][nplayer][mediaFileIdx]
+                        jobs.append({"input": mediaFile,
+                                     "start": start,
+                                     "stop": stop,
+                                     "copy": not pj[OBSERVATIONS][obsId].get("media_info", {}).get("hasVideo", {}).get(mediaFile, True),
+                                     "output": "{dir}{sep}{obsId}_{player}_{subject}_{behavior}_{globalStart}-{globalStop}{extension}".format(
+                                                dir=exportDir,
+                                                sep=os.sep,
+                                                obsId=obsId,
+                                                player="PLAYER{}".format(nplayer),
+                                                subject=subject,
+                                                behavior=behavior,
+                                                globalStart=globalStart,
+                                                globalStop=globalStop,
+                                                extension=os.path.splitext(mediaFile)[-1])})
+
+    return jobs, flagUnpairedEventFound
+
+
+def keyframes(ffmpeg_bin, mediaFile):
+    """
+    returns the sorted list of times (in seconds) of the key frames of the video stream of media file
+    only the key frames are decoded
+    """
+
+    p = subprocess.Popen([ffmpeg_bin, "-nostats", "-skip_frame", "nokey", "-i", mediaFile, "-an", "-vf", "showinfo", "-f", "null", "-"],
+                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    error = p.communicate()[1].decode("utf-8", "replace")
+
+    return sorted([float(x) for x in re.findall(r"pts_time:\s*([0-9.]+)", error)])
+
+
+def on_keyframe(keyframesTimes, time):
+    """
+    True if a key frame is at time
+    """
+
+    idx = bisect.bisect_left(keyframesTimes, time - KEYFRAME_TOLERANCE)
+    return idx < len(keyframesTimes) and abs(keyframesTimes[idx] - time) <= KEYFRAME_TOLERANCE
+
+
+def partial_file_name(fileName):
+    """
+    name of file during extraction (same extension for the choice of format by ffmpeg)
+    """
+    root, ext = os.path.splitext(fileName)
+    return root + ".part" + ext
+
+
+class ClipExtractor():
+    """
+    extraction of sequences with ffmpeg (one ffmpeg process by sequence)
+
+    the extract method is called concurrently from the threads of a pool:
+    the start of the sequence is searched on the input side (fast seek),
+    the streams are copied without re-encoding when the sequence starts on a key frame.
+    The sequence is written in a partial file renamed at the end of extraction,
+    so that existing files are complete sequences and an interrupted extraction can be resumed
+    """
+
+    def __init__(self, ffmpeg_bin):
+        self.ffmpeg_bin = ffmpeg_bin
+        self.lock = threading.Lock()
+        self.processes = {}   # output file -> running ffmpeg process
+        self.progress = {}   # output file -> fraction of sequence extracted
+        self.cancelled = False
+        self.keyframes = {}   # media file -> times of key frames
+        self.keyframesLocks = {}   # media file -> lock of search of key frames
+        self.keyframesLock = threading.Lock()   # lock of keyframesLocks
+
+
+    def media_keyframes(self, mediaFile):
+        """
+        times of key frames of media file (searched once by media file)
+        the key frames of different media files are searched concurrently
+        """
+        with self.keyframesLock:
+            lock = self.keyframesLocks.setdefault(mediaFile, threading.Lock())
+        with lock:
+            if mediaFile not in self.keyframes:
+                self.keyframes[mediaFile] = keyframes(self.ffmpeg_bin, mediaFile)
+            return self.keyframes[mediaFile]
+
+
+    def command(self, job, streamCopy, output):
+        return ([self.ffmpeg_bin, "-nostdin", "-y", "-loglevel", "error", "-progress", "pipe:1",
+                 "-ss", str(job["start"]),
+                 "-i", job["input"],
+                 "-t", str(job["stop"] - job["start"])]
+                + (["-c", "copy"] if streamCopy else [])
+                + [output])
+
+
+    def extract(self, job):
+        """
+        extract sequence of job
+        returns error message or "" if no error
+        """
+
+        if self.cancelled:
+            return ""
+
+        streamCopy = job["copy"] or on_keyframe(self.media_keyframes(job["input"]), float(job["start"]))
+
+        partialFileName = partial_file_name(job["output"])
+        command = self.command(job, streamCopy, partialFileName)
+        logging.debug("ffmpeg command: {}".format(command))
+
+        duration = float(job["stop"] - job["start"])
+
+        with self.lock:
+            if self.cancelled:
+                return ""
+            p = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            self.processes[job["output"]] = p
+            self.progress[job["output"]] = 0
+
+        # progress of ffmpeg (out_time_ms is in microseconds)
+        for line in p.stdout:
+            if line.startswith(b"out_time_ms=") and duration > 0:
+                try:
+                    self.progress[job["output"]] = min(1, int(line.split(b"=")[1]) / 1000000 / duration)
+                except ValueError:
+                    pass
+
+        error = p.stderr.read().decode("utf-8", "replace")
+        p.wait()
+
+        with self.lock:
+            del self.processes[job["output"]]
+            del self.progress[job["output"]]
+
+        if p.returncode or self.cancelled:
+            if os.path.isfile(partialFileName):
+                os.remove(partialFileName)
+            return "" if self.cancelled else "{}: {}".format(os.path.basename(job["output"]), error.strip())
+
+        os.replace(partialFileName, job["output"])
+        return ""
+
+
+    def running_progress(self):
+        """
+        returns the progress of the running extractions
+        """
+        with self.lock:
+            return dict(self.progress)
+
+
+    def cancel(self):
+        """
+        stop the running extractions
+        """
+        with self.lock:
+            self.cancelled = True
+            for p in self.processes.values():
+                try:
+                    p.kill()
+                except:
+                    pass
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+"""
+BORIS
+Behavioral Observation Research Interactive Software
+Copyright 2012-2016 Olivier Friard
+
+This file is part of BORIS.
+
+  BORIS is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 3 of the License, or
+  any later version.
+
+  BORIS is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not see <http://www.gnu.org/licenses/>.
+
+"""
+
+import bisect
+
+from config import *
+
+
+class EventsIndex():
+    """
+    index of the events of an observation by subject and behavior
+
+    for each (subject, code) the events are kept sorted by time,
+    so that the number of occurences before a given time (and then the status of a state event)
+    and the current modifiers are obtained by binary search.
+    The sorted times of all events give the row of events list corresponding to a given time.
+    The index is updated incrementally when events are added or removed.
+    """
+
+    def __init__(self, events, observationId=""):
+        self.observationId = observationId
+        self.rebuild(events)
+
+
+    def __len__(self):
+        return self.length
+
+
+    def rebuild(self, events):
+        """
+        build index from the list of events
+        """
+
+        self.events = events
+        self.length = 0
+        self.eventsTimes = []   # sorted times of all events
+        self.times = {}   # (subject, code) -> sorted list of times
+        self.keys = {}    # (subject, code) -> sorted list of (time, modifier, comment)
+        for event in events:
+            self.add(event)
+
+
+    def add(self, event):
+        """
+        add event to index
+        """
+
+        k = (event[EVENT_SUBJECT_FIELD_IDX], event[EVENT_BEHAVIOR_FIELD_IDX])
+        if k not in self.keys:
+            self.times[k], self.keys[k] = [], []
+
+        key = (event[EVENT_TIME_FIELD_IDX], event[EVENT_MODIFIER_FIELD_IDX], event[COMMENT_EVENT_FIELD_IDX])
+        idx = bisect.bisect_right(self.keys[k], key)
+        self.keys[k].insert(idx, key)
+        self.times[k].insert(idx, event[EVENT_TIME_FIELD_IDX])
+        bisect.insort_right(self.eventsTimes, event[EVENT_TIME_FIELD_IDX])
+        self.length += 1
+
+
+    def remove(self, event):
+        """
+        remove event from index
+        """
+
+        k = (event[EVENT_SUBJECT_FIELD_IDX], event[EVENT_BEHAVIOR_FIELD_IDX])
+        if k not in self.keys:
+            return
+
+        key = (event[EVENT_TIME_FIELD_IDX], event[EVENT_MODIFIER_FIELD_IDX], event[COMMENT_EVENT_FIELD_IDX])
+        idx = bisect.bisect_left(self.keys[k], key)
+        if idx < len(self.keys[k]) and self.keys[k][idx] == key:
+            del self.keys[k][idx]
+            del self.times[k][idx]
+            del self.eventsTimes[bisect.bisect_left(self.eventsTimes, event[EVENT_TIME_FIELD_IDX])]
+            self.length -= 1
+
+
+    def events_before(self, time):
+        """
+        number of events with time <= time
+        """
+        return bisect.bisect_right(self.eventsTimes, time)
+
+
+    def count(self, subject, code, time):
+        """
+        number of events of code for subject with time <= time
+        """
+
+        if (subject, code) not in self.times:
+            return 0
+        return bisect.bisect_right(self.times[(subject, code)], time)
+
+
+    def count_before(self, subject, code, time):
+        """
+        number of events of code for subject with time < time
+        """
+
+        if (subject, code) not in self.times:
+            return 0
+        return bisect.bisect_left(self.times[(subject, code)], time)
+
+
+    def current_states(self, stateBehaviorsCodes, subjects, time):
+        """
+        return current states at time by subject index
+
+        subjects -- dictionary of subjects (index: {"name": subject name})
+        """
+
+        currentStates = {}
+        for idx in subjects:
+            currentStates[idx] = [sbc for sbc in stateBehaviorsCodes if self.count(subjects[idx]["name"], sbc, time) % 2]  # test if odd
+
+        return currentStates
+
+
+    def current_modifier(self, subject, code, time):
+        """
+        return modifier of the last event of code for subject with time <= time
+        """
+
+        n = self.count(subject, code, time)
+        if not n:
+            return ""
+        return self.keys[(subject, code)][n - 1][1]
+
+
+def events_start_stop(events, stateBehaviorsCodes):
+    """
+    return the list of status of events (START or STOP for state events, POINT for the others)
+    take consideration of subject
+
+    a state event is a STOP if the number of previous events with same subject and code is odd.
+    Events are scanned once in chronological order with a counter by (subject, code)
+    (events with the same time do not count for each other)
+    """
+
+    stateBehaviorsCodes = set(stateBehaviorsCodes)
+    status = [POINT] * len(events)
+    counters = {}   # (subject, code) -> [number of events, time of last event, number of events before last time]
+
+    # the sort is linear for the (already sorted) events of an observation
+    for idx in sorted(range(len(events)), key=lambda i: events[i][EVENT_TIME_FIELD_IDX]):
+
+        time, subject, code = events[idx][0:3]
+        if code not in stateBehaviorsCodes:
+            continue
+
+        counter = counters.setdefault((subject, code), [0, None, 0])
+        if time != counter[1]:
+            counter[1], counter[2] = time, counter[0]
+        status[idx] = STOP if counter[2] % 2 else START   # test if odd
+        counter[0] += 1
+
+    return status
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+
+"""
+BORIS
+Behavioral Observation Research Interactive Software
+Copyright 2012-2016 Olivier Friard
+
+This file is part of BORIS.
+
+  BORIS is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 3 of the License, or
+  any later version.
+
+  BORIS is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not see <http://www.gnu.org/licenses/>.
+
+
+Compact storage of the events of an observation (without Qt)
+"""
+
+import array
+import hashlib
+from decimal import *
+
+import numpy as np
+
+from config import *
+
+# fields of event stored as strings
+STRING_FIELDS = (EVENT_SUBJECT_FIELD_IDX, EVENT_BEHAVIOR_FIELD_IDX, EVENT_MODIFIER_FIELD_IDX, COMMENT_EVENT_FIELD_IDX)
+
+
+class EventStore():
+    """
+    events of an observation stored column-wise:
+    the times in ms in an array of 64 bit integers,
+    the subjects, behaviors, modifiers and comments as indexes in a table of strings (each distinct string is stored once)
+
+    an event uses 24 bytes instead of several hundred bytes for a list with a decimal time.
+    The events are returned as lists [decimal time, subject, behavior, modifiers, comment] (see event and to_events)
+    """
+
+    def __init__(self):
+        self.times = array.array("q")
+        self.codes = dict([(field, array.array("i")) for field in STRING_FIELDS])
+        self.strings = []
+        self.stringIdx = {}
+
+
+    @classmethod
+    def from_events(cls, events):
+        """
+        returns the store of events (lists)
+        returns None if the events can not be stored without loss (time with more than 3 decimals or event without 5 fields)
+        """
+
+        if [event for event in events if len(event) != len(STRING_FIELDS) + 1]:
+            return None
+
+        times = [float(event[EVENT_TIME_FIELD_IDX]) for event in events]
+        ms = [round(time_ * 1000) for time_ in times]
+        if [time_ for time_, ms_ in zip(times, ms) if ms_ / 1000 != time_]:
+            return None
+
+        store = cls()
+        store.times = array.array("q", ms)
+        for field in STRING_FIELDS:
+            store.codes[field] = array.array("i", [store.stringIdx.setdefault(event[field], len(store.stringIdx)) for event in events])
+        store.strings = list(store.stringIdx)
+
+        return store
+
+
+    @classmethod
+    def from_columns(cls, columns):
+        """
+        returns the store of events saved column-wise (see to_columns)
+        """
+
+        store = cls()
+        store.times = array.array("q", columns["times"])
+        for field in STRING_FIELDS:
+            store.codes[field] = array.array("i", columns[pj_events_fields[field]])
+        store.strings = list(columns["strings"])
+        store.stringIdx = dict([(string, idx) for idx, string in enumerate(store.strings)])
+
+        return store
+
+
+    def code(self, string):
+        """
+        returns the index of string in the table of strings (string is added if not present)
+        """
+        try:
+            return self.stringIdx[string]
+        except KeyError:
+            self.stringIdx[string] = len(self.strings)
+            self.strings.append(string)
+            return self.stringIdx[string]
+
+
+    def string_codes(self, strings):
+        """
+        returns the list of indexes of strings present in the table of strings
+        """
+        return [self.stringIdx[string] for string in strings if string in self.stringIdx]
+
+
+    def __len__(self):
+        return len(self.times)
+
+
+    def __getitem__(self, idx):
+        return self.event(idx)
+
+
+    def __iter__(self):
+        for idx in range(len(self.times)):
+            yield self.event(idx)
+
+
+    def __getstate__(self):
+        # the index of strings is rebuilt from the table of strings
+        return {"times": self.times, "codes": self.codes, "strings": self.strings}
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.stringIdx = dict([(string, idx) for idx, string in enumerate(self.strings)])
+
+
+    def event(self, idx):
+        """
+        returns the event idx as a list [decimal time, subject, behavior, modifiers, comment]
+        """
+        event = [Decimal(str(self.times[idx] / 1000)), "", "", "", ""]
+        for field in STRING_FIELDS:
+            event[field] = self.strings[self.codes[field][idx]]
+        return event
+
+
+    def append(self, event):
+        """
+        add event (list)
+        """
+        self.times.append(round(float(event[EVENT_TIME_FIELD_IDX]) * 1000))
+        for field in STRING_FIELDS:
+            self.codes[field].append(self.code(event[field]))
+
+
+    def column(self, field):
+        """
+        returns the values of field for all events (times in s as floats)
+        """
+        if field == EVENT_TIME_FIELD_IDX:
+            return [ms / 1000 for ms in self.times]
+        return [self.strings[code] for code in self.codes[field]]
+
+
+    def to_events(self):
+        """
+        returns the events as a list of lists with decimal times
+        """
+        columns = [[Decimal(str(ms / 1000)) for ms in self.times]] + [self.column(field) for field in STRING_FIELDS]
+        return [list(event) for event in zip(*columns)]
+
+
+    def to_json(self):
+        """
+        returns the events as a list of lists with float times (for JSON serialization)
+        """
+        return [list(event) for event in zip(*[self.column(field) for field in (EVENT_TIME_FIELD_IDX, ) + STRING_FIELDS])]
+
+
+    def to_columns(self):
+        """
+        returns the events column-wise (for JSON serialization of compact project files):
+        times in ms, table of strings and indexes of strings of subjects, behaviors, modifiers and comments
+        """
+        columns = {"times": self.times.tolist(), "strings": self.strings}
+        for field in STRING_FIELDS:
+            columns[pj_events_fields[field]] = self.codes[field].tolist()
+        return columns
+
+
+    def digest(self):
+        """
+        returns a hash of the events (little-endian integers, independent of the platform)
+        """
+        h = hashlib.sha1()
+        h.update(np.frombuffer(self.times, dtype=np.int64).astype("<i8").tobytes())
+        for field in STRING_FIELDS:
+            h.update(np.frombuffer(self.codes[field], dtype=np.int32).astype("<i4").tobytes())
+        h.update("\x00".join(self.strings).encode("utf-8"))
+        return h.hexdigest()
+
+
+    def times_array(self):
+        """
+        returns the times in s as a numpy array
+        """
+        return np.frombuffer(self.times, dtype=np.int64) / 1000 if len(self.times) else np.zeros(0)
+
+
+    def codes_array(self, field):
+        """
+        returns the indexes of strings of field as a numpy array
+        """
+        return np.frombuffer(self.codes[field], dtype=np.int32) if len(self.times) else np.zeros(0, dtype=np.int32)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+"""
+BORIS
+Behavioral Observation Research Interactive Software
+Copyright 2012-2016 Olivier Friard
+
+This file is part of BORIS.
+
+  BORIS is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 3 of the License, or
+  any later version.
+
+  BORIS is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not see <http://www.gnu.org/licenses/>.
+
+"""
+
+try:
+    from PyQt5.QtCore import *
+except:
+    from PyQt4.QtCore import *
+
+import bisect
+
+from config import *
+import event_index
+
+
+class EventsModel(QAbstractTableModel):
+    """
+    table model of the events of the current observation
+
+    the model works directly on the events list of the observation (kept sorted)
+    cells are formatted when displayed and the START/STOP status of state events
+    is obtained from the events index.
+    The changes of events are recorded in the project journal (if any)
+    """
+
+    def __init__(self, parent=None):
+        super(EventsModel, self).__init__(parent)
+
+        self.observationId = ""
+        self.events = []
+        self.eventsIndex = event_index.EventsIndex([])
+        self.stateBehaviorsCodes = []
+        self.convertTime = str
+        self.journal = None
+
+
+    def set_events(self, observationId, events, stateBehaviorsCodes, convertTime):
+        """
+        load events list of observation in model
+
+        convertTime -- function for formatting time
+        """
+
+        self.beginResetModel()
+        self.observationId = observationId
+        self.events = events
+        self.eventsIndex = event_index.EventsIndex(events, observationId)
+        self.stateBehaviorsCodes = stateBehaviorsCodes
+        self.convertTime = convertTime
+        self.endResetModel()
+
+
+    def clear(self):
+        """
+        remove all events from model (the events of observation are not modified)
+        """
+        self.set_events("", [], [], self.convertTime)
+
+
+    def is_current(self, observationId, events):
+        """
+        True if model contains the events list of observation and was not modified outside of the model
+        """
+        return (self.observationId == observationId
+                and self.events is events
+                and len(self.eventsIndex) == len(events))
+
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.events)
+
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(tw_events_fields)
+
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return tw_events_fields[section]
+        return str(section + 1)
+
+
+    def status(self, row):
+        """
+        return START or STOP for state event, "" for point event
+        """
+        event = self.events[row]
+        if event[EVENT_BEHAVIOR_FIELD_IDX] not in self.stateBehaviorsCodes:
+            return ""
+        # how many code before with same subject?
+        if self.eventsIndex.count_before(event[EVENT_SUBJECT_FIELD_IDX], event[EVENT_BEHAVIOR_FIELD_IDX], event[EVENT_TIME_FIELD_IDX]) % 2:  # test if odd
+            return STOP
+        return START
+
+
+    def data(self, index, role=Qt.DisplayRole):
+
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+
+        row, field_type = index.row(), tw_events_fields[index.column()]
+
+        if field_type == TYPE:
+            return self.status(row)
+
+        if field_type in pj_events_fields:
+            field = self.events[row][pj_obs_fields[field_type]]
+            if field_type == "time":
+                return str(self.convertTime(field))
+            return field
+
+        return ""
+
+
+    def status_changed(self, row):
+        """
+        notify that status of events from row to end may have changed
+        """
+        if row < len(self.events):
+            self.dataChanged.emit(self.index(row, tw_obs_fields[TYPE]), self.index(len(self.events) - 1, tw_obs_fields[TYPE]))
+
+
+    def insert_event(self, event):
+        """
+        insert event at its sorted position
+        return row of inserted event
+        """
+
+        row = bisect.bisect_right(self.events, event)
+
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.events.insert(row, event)
+        self.eventsIndex.add(event)
+        self.endInsertRows()
+
+        if self.journal:
+            self.journal.insert(self.observationId, event)
+
+        if event[EVENT_BEHAVIOR_FIELD_IDX] in self.stateBehaviorsCodes:
+            self.status_changed(row + 1)
+
+        return row
+
+
+    def remove_rows(self, rows):
+        """
+        remove events at rows
+        """
+
+        for row in sorted(rows, reverse=True):
+            self.beginRemoveRows(QModelIndex(), row, row)
+            self.eventsIndex.remove(self.events[row])
+            if self.journal:
+                self.journal.delete(self.observationId, self.events[row])
+            del self.events[row]
+            self.endRemoveRows()
+
+        if rows:
+            self.status_changed(min(rows))
+
+
+    def row(self, event):
+        """
+        return row of event (the event itself, not an equal event)
+        """
+        row = bisect.bisect_left(self.events, event)
+        while self.events[row] is not event:
+            row += 1
+        return row
+
+
+    def replace_event(self, row, event):
+        """
+        replace event at row
+        the event is moved to its sorted position if its order changed (e.g. new subject or behavior)
+        return row of event
+        """
+
+        self.eventsIndex.remove(self.events[row])
+        if self.journal:
+            self.journal.replace(self.observationId, self.events[row], event)
+
+        if (row and event < self.events[row - 1]) or (row < len(self.events) - 1 and self.events[row + 1] < event):
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.events[row]
+            self.endRemoveRows()
+
+            newRow = bisect.bisect_right(self.events, event)
+            self.beginInsertRows(QModelIndex(), newRow, newRow)
+            self.events.insert(newRow, event)
+            self.eventsIndex.add(event)
+            self.endInsertRows()
+
+            self.status_changed(min(row, newRow))
+            return newRow
+
+        self.events[row] = event
+        self.eventsIndex.add(event)
+
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(tw_events_fields) - 1))
+        self.status_changed(row)
+        return row
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+
+"""
+BORIS
+Behavioral Observation Research Interactive Software
+Copyright 2012-2016 Olivier Friard
+
+This file is part of BORIS.
+
+  BORIS is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 3 of the License, or
+  any later version.
+
+  BORIS is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not see <http://www.gnu.org/licenses/>.
+
+
+Export of events (without Qt)
+"""
+
+import os
+import sys
+import logging
+
+import tablib
+
+from config import *
+from utilities import seconds2time, eol2space
+import event_index
+import project_functions
+import analysis_store
+import media_timeline
+import cancellation
+
+
+def events_with_status(pj, events):
+    """
+    returns events with status (START/STOP or POINT)
+    take consideration of subject
+    """
+
+    return [event + [flag] for event, flag in zip(events, event_index.events_start_stop(events, project_functions.state_behaviors_codes(pj)))]
+
+
+def media_durations(pj, obsId):
+    """
+    returns the list of durations (in seconds) of media files of player #1
+    """
+
+    duration1 = []
+    if pj[OBSERVATIONS][obsId][TYPE] in [MEDIA]:
+        try:
+            for mediaFile in pj[OBSERVATIONS][obsId][FILE][PLAYER1]:
+                duration1.append(pj[OBSERVATIONS][obsId]["media_info"]["length"][mediaFile])
+        except:
+            pass
+    return duration1
+
+
+def observation_events_rows(pj, obsId, selectedSubjects, selectedBehaviors, includeMediaInfo):
+    """
+    returns the rows (observation informations and events of selected subjects and behaviors) for the tabular export of observation
+    all rows have the same length
+    """
+
+    eventsWithStatus = events_with_status(pj, pj[OBSERVATIONS][obsId][EVENTS])
+
+    # check max number of modifiers
+    max_modifiers = 0
+    for event in eventsWithStatus:
+        if event[EVENT_MODIFIER_FIELD_IDX]:
+            max_modifiers = max(max_modifiers, len(event[EVENT_MODIFIER_FIELD_IDX].split("|")))
+
+    rows = []
+
+    # observation id
+    rows.append(["Observation id", obsId])
+    rows.append([""])
+
+    # media file name
+    if pj[OBSERVATIONS][obsId][TYPE] in [MEDIA]:
+        rows.append(["Media file(s)"])
+    else:
+        rows.append(["Live observation"])
+    rows.append([""])
+
+    if pj[OBSERVATIONS][obsId][TYPE] in [MEDIA]:
+        for idx in pj[OBSERVATIONS][obsId][FILE]:
+            for media in pj[OBSERVATIONS][obsId][FILE][idx]:
+                rows.append(["Player #{0}".format(idx), media])
+    rows.append([""])
+
+    # date
+    if "date" in pj[OBSERVATIONS][obsId]:
+        rows.append(["Observation date", pj[OBSERVATIONS][obsId]["date"].replace("T", " ")])
+    rows.append([""])
+
+    # description
+    if "description" in pj[OBSERVATIONS][obsId]:
+        rows.append(["Description", eol2space(pj[OBSERVATIONS][obsId]["description"])])
+    rows.append([""])
+
+    # time offset
+    if "time offset" in pj[OBSERVATIONS][obsId]:
+        rows.append(["Time offset (s)", pj[OBSERVATIONS][obsId]["time offset"]])
+    rows.append([""])
+
+    # independant variables
+    if "independent_variables" in pj[OBSERVATIONS][obsId]:
+        rows.append(["independent variables"])
+        rows.append(["variable", "value"])
+        for variable in pj[OBSERVATIONS][obsId]["independent_variables"]:
+            rows.append([variable, pj[OBSERVATIONS][obsId]["independent_variables"][variable]])
+
+    rows.append([""])
+
+    # table header
+    header = ["Time"]
+    if includeMediaInfo == YES:
+        header.extend(["Media file path", "Media total length", "FPS"])
+
+    header.extend(["Subject", "Behavior"])
+    for x in range(1, max_modifiers + 1):
+        header.append("Modifier {}".format(x))
+    header.extend(["Comment", "Status"])
+
+    rows.append(header)
+
+    timeline = media_timeline.MediaTimeline(media_durations(pj, obsId))   # in seconds
+
+    for event in eventsWithStatus:
+
+        if (((event[SUBJECT_EVENT_FIELD] in selectedSubjects)
+           or (event[SUBJECT_EVENT_FIELD] == "" and NO_FOCAL_SUBJECT in selectedSubjects))
+           and (event[BEHAVIOR_EVENT_FIELD] in selectedBehaviors)):
+
+            fields = [float(event[EVENT_TIME_FIELD_IDX])]
+
+            if includeMediaInfo == YES:
+                mediaFileIdx = timeline.media_index(event[EVENT_TIME_FIELD_IDX])
+                fields.append(pj[OBSERVATIONS][obsId][FILE][PLAYER1][mediaFileIdx])
+                # media total length
+                fields.append(str(timeline.total()))
+                # fps
+                fields.append(pj[OBSERVATIONS][obsId]["media_info"]["fps"][pj[OBSERVATIONS][obsId][FILE][PLAYER1][mediaFileIdx]])
+
+            fields.append(event[EVENT_SUBJECT_FIELD_IDX])
+            fields.append(event[EVENT_BEHAVIOR_FIELD_IDX])
+
+            modifiers = event[EVENT_MODIFIER_FIELD_IDX].split("|")
+            while len(modifiers) < max_modifiers:
+                modifiers.append("")
+            fields.extend(modifiers)
+
+            fields.append(event[COMMENT_EVENT_FIELD_IDX].replace(os.linesep, " "))
+            # status
+            fields.append(event[-1])
+
+            rows.append(fields)
+
+    # complete rows with empty strings
+    maxLen = max([len(r) for r in rows])
+    for row in rows:
+        row.extend([""] * (maxLen - len(row)))
+
+    return rows
+
+
+def write_events_rows(rows, title, fileName, outputFormat):
+    """
+    write rows in fileName in TSV, ODS or XLS format
+    raise an exception if file can not be written
+    """
+
+    data = tablib.Dataset()
+    if title:
+        data.title = title
+
+    for row in rows:
+        data.append(row)
+
+    if outputFormat == "tsv":
+        with open(fileName, "w") as f:
+            f.write(data.tsv)
+    if outputFormat == "ods":
+        with open(fileName, "wb") as f:
+            f.write(data.ods)
+    if outputFormat == "xls":
+        with open(fileName, "wb") as f:
+            f.write(data.xls)
+
+
+def export_observation_events(pj, obsId, selectedSubjects, selectedBehaviors, includeMediaInfo, title, fileName, outputFormat):
+    """
+    export events of observation in fileName (TSV, ODS or XLS format)
+    returns error message or "" if no error
+    the file is not written if the export was cancelled
+    """
+
+    try:
+        rows = observation_events_rows(pj, obsId, selectedSubjects, selectedBehaviors, includeMediaInfo)
+        if cancellation.cancelled():
+            return ""
+        write_events_rows(rows, title, fileName, outputFormat)
+    except:
+        errorMsg = sys.exc_info()[1]
+        logging.critical(errorMsg)
+        return str(errorMsg)
+    return ""
+
+
+def aggregated_events_template(format_, includeMediaInfo):
+    """
+    returns header and template of rows of aggregated events in SQL (sql) or Tabular format (tab)
+    """
+
+    if format_ == "sql":
+        if includeMediaInfo == NO:
+            header = "CREATE TABLE events (id INTEGER PRIMARY KEY ASC, observation TEXT, date DATE, subject TEXT, behavior TEXT, modifiers TEXT, event_type TEXT, start FLOAT, stop FLOAT, comment_start TEXT, comment_stop TEXT);" + os.linesep
+        else:
+            header = ""
+        header += "BEGIN TRANSACTION;" + os.linesep
+        template = """INSERT INTO events (observation, date, subject, behavior, modifiers, event_type, start, stop, comment_start, comment_stop) VALUES ("{observation}","{date}","{subject}","{behavior}","{modifiers}","{event_type}",{start},{stop},"{comment_start}","{comment_stop}");""" + os.linesep
+
+    if format_ == "tab":
+        if includeMediaInfo == YES:
+            header = "Observation id{0}Observation date{0}Media file{0}Total media length{0}FPS{0}Subject{0}Behavior{0}Modifiers{0}Behavior type{0}Start{0}Stop{0}Comment start{0}Comment stop{1}".format("\t", os.linesep)
+            template = "{observation}\t{date}\t{media_file}\t{total_length}\t{fps}\t{subject}\t{behavior}\t{modifiers}\t{event_type}\t{start}\t{stop}\t{comment_start}\t{comment_stop}" + os.linesep
+        else:
+            header = "Observation id{0}Observation date{0}Subject{0}Behavior{0}Modifiers{0}Behavior type{0}Start{0}Stop{0}Comment start{0}Comment stop{1}".format("\t", os.linesep)
+            template = "{observation}\t{date}\t{subject}\t{behavior}\t{modifiers}\t{event_type}\t{start}\t{stop}\t{comment_start}\t{comment_stop}" + os.linesep
+
+    return header, template
+
+
+def aggregated_events_footer(format_):
+    return "END TRANSACTION;" + os.linesep if format_ == "sql" else ""
+
+
+def observation_aggregated_events(pj, cursor, obsId, selectedSubjects, selectedBehaviors, template):
+    """
+    returns the aggregated events of observation formatted with template
+    and True if some unpaired state events were excluded
+
+    cursor -- cursor of the analysis store with the events of observation, selected subjects and behaviors
+    """
+
+    eventTypes = dict([(behavior, str(project_functions.event_type(pj, behavior)).upper()) for behavior in selectedBehaviors])
+    flagUnpairedEventFound = False
+    out = ""
+
+    timeline = media_timeline.MediaTimeline(media_durations(pj, obsId))   # in seconds
+
+    for subject in selectedSubjects:
+
+        for behavior in selectedBehaviors:
+
+            cursor.execute("SELECT occurence, modifiers, comment FROM events WHERE observation = ? AND subject = ? AND code = ? ORDER BY occurence", (obsId, subject, behavior))
+            rows = list(cursor.fetchall())
+
+            if STATE in eventTypes[behavior] and len(rows) % 2:  # unpaired events
+                flagUnpairedEventFound = True
+                continue
+
+            for idx, row in enumerate(rows):
+
+                if pj[OBSERVATIONS][obsId][TYPE] in [MEDIA]:
+                    mediaFileIdx = timeline.media_index(row["occurence"])
+                    mediaFileString = pj[OBSERVATIONS][obsId][FILE][PLAYER1][mediaFileIdx]
+                    fpsString = pj[OBSERVATIONS][obsId]["media_info"]["fps"][pj[OBSERVATIONS][obsId][FILE][PLAYER1][mediaFileIdx]]
+                else:
+                    mediaFileString = "LIVE"
+                    fpsString = "NA"
+
+                if POINT in eventTypes[behavior]:
+
+                    out += template.format(observation=obsId,
+                                           date=pj[OBSERVATIONS][obsId]["date"].replace("T", " "),
+                                           media_file=mediaFileString,
+                                           total_length=timeline.total(),
+                                           fps=fpsString,
+                                           subject=subject,
+                                           behavior=behavior,
+                                           modifiers=row["modifiers"].strip(),
+                                           event_type=POINT,
+                                           start=row["occurence"],
+                                           stop=0,
+                                           comment_start=row["comment"],
+                                           comment_stop="")
+
+                if STATE in eventTypes[behavior] and idx % 2 == 0:
+
+                    out += template.format(observation=obsId,
+                                           date=pj[OBSERVATIONS][obsId]["date"].replace("T", " "),
+                                           media_file=mediaFileString,
+                                           total_length=timeline.total(),
+                                           fps=fpsString,
+                                           subject=subject,
+                                           behavior=behavior,
+                                           modifiers=row["modifiers"].strip(),
+                                           event_type=STATE,
+                                           start=row["occurence"],
+                                           stop=rows[idx + 1]["occurence"],
+                                           comment_start=row["comment"],
+                                           comment_stop=rows[idx + 1]["comment"])
+
+    return out, flagUnpairedEventFound
+
+
+def observation_aggregated_events_process(pj, obsId, selectedSubjects, selectedBehaviors, template):
+    """
+    aggregated events of observation using its own analysis store (for analysis in a separate process)
+    """
+
+    cursor = analysis_store.AnalysisStore().select(pj, selectedSubjects, [obsId], selectedBehaviors)
+    return observation_aggregated_events(pj, cursor, obsId, selectedSubjects, selectedBehaviors, template)
+
+
+def aggregated_events(pj, cursor, selectedObservations, selectedSubjects, selectedBehaviors, format_, includeMediaInfo):
+    """
+    returns the aggregated events of selected observations, subjects and behaviors in SQL (sql) or Tabular format (tab)
+    and True if some unpaired state events were excluded
+
+    cursor -- cursor of the analysis store with the events of selected observations, subjects and behaviors
+    """
+
+    out, template = aggregated_events_template(format_, includeMediaInfo)
+    flagUnpairedEventFound = False
+
+    for obsId in selectedObservations:
+        obsOut, flagUnpaired = observation_aggregated_events(pj, cursor, obsId, selectedSubjects, selectedBehaviors, template)
+        out += obsOut
+        flagUnpairedEventFound = flagUnpairedEventFound or flagUnpaired
+
+    return out + aggregated_events_footer(format_), flagUnpairedEventFound
+
+
+def observation_strings(pj, obsId, selectedSubjects, separator):
+    """
+    returns the events of observation as behavioral strings by subject
+    behaviors are separated by separator, current states are joined with +
+    """
+
+    def replace_spaces(l):
+        return [x.replace(" ", "_") for x in l]
+
+    eventsWithStatus = events_with_status(pj, pj[OBSERVATIONS][obsId][EVENTS])
+
+    strings = {}
+    for subj in selectedSubjects:
+
+        s = ""
+        currentStates = []
+
+        for event in eventsWithStatus:
+
+            if event[EVENT_SUBJECT_FIELD_IDX] == subj or (subj == NO_FOCAL_SUBJECT and event[EVENT_SUBJECT_FIELD_IDX] == ""):
+
+                if event[-1] == POINT:
+                    if currentStates:
+                        s += "+".join(replace_spaces(currentStates)) + "+" + event[EVENT_BEHAVIOR_FIELD_IDX].replace(" ", "_")
+                    else:
+                        s += event[EVENT_BEHAVIOR_FIELD_IDX].replace(" ", "_")
+                    s += separator
+
+                if event[-1] == START:
+                    currentStates.append(event[EVENT_BEHAVIOR_FIELD_IDX])
+                    s += "+".join(replace_spaces(currentStates)) + separator
+
+                if event[-1] == STOP:
+                    if event[EVENT_BEHAVIOR_FIELD_IDX] in currentStates:
+                        currentStates.remove(event[EVENT_BEHAVIOR_FIELD_IDX])
+                    if currentStates:
+                        s += "+".join(replace_spaces(currentStates)) + separator
+
+        # remove last separator (if separator not empty)
+        if separator:
+            s = s[0: -len(separator)]
+
+        strings[subj] = s
+
+    return strings
+
+
+def create_subtitles(pj, cursor, selectedObservations, selectedSubjects, selectedBehaviors, includeModifiers, exportDir):
+    """
+    create subtitles files (SRT) for the media files of selected observations in exportDir
+
+    cursor -- cursor of the analysis store with the events of selected observations, subjects and behaviors
+    returns True if some unpaired state events were excluded and the list of errors
+    """
+
+    eventTypes = dict([(behavior, str(project_functions.event_type(pj, behavior)).upper()) for behavior in selectedBehaviors])
+    flagUnpairedEventFound = False
+    errors = []
+
+    for obsId in selectedObservations:
+
+        for nplayer in [PLAYER1, PLAYER2]:
+
+            if not pj[OBSERVATIONS][obsId][FILE][nplayer]:
+                continue
+
+            # in seconds
+            timeline = media_timeline.MediaTimeline([pj[OBSERVATIONS][obsId]["media_info"]["length"][mediaFile] for mediaFile in pj[OBSERVATIONS][obsId][FILE][nplayer]])
+
+            subtitles = {}
+            for subject in selectedSubjects:
+
+                for behavior in selectedBehaviors:
+
+                    cursor.execute("SELECT occurence, modifiers FROM events where observation = ? AND subject = ? AND  code = ? ORDER BY code, occurence", (obsId, subject, behavior))
+                    rows = list(cursor.fetchall())
+                    if STATE in eventTypes[behavior] and len(rows) % 2:
+                        flagUnpairedEventFound = True
+                        continue
+
+                    for idx, row in enumerate(rows):
+
+                        mediaFileIdx = timeline.media_index(row["occurence"])
+                        if mediaFileIdx not in subtitles:
+                            subtitles[mediaFileIdx] = []
+
+                        # subtitle color
+                        if subject == NO_FOCAL_SUBJECT:
+                            col = "white"
+                        else:
+                            col = subtitlesColors[selectedSubjects.index(subject) % len(subtitlesColors)]
+
+                        behaviorStr = behavior
+                        if includeModifiers and row[1]:
+                            behaviorStr += " ({0})".format(row[1].replace("|", ", "))
+
+                        if POINT in eventTypes[behavior]:
+                            laps = "{0} --> {1}".format(seconds2time(row["occurence"]).replace(".", ","), seconds2time(row["occurence"] + 0.5).replace(".", ","))
+                            subtitles[mediaFileIdx].append([laps, """<font color="{0}">{1}: {2}</font>""".format(col, subject, behaviorStr)])
+
+                        if STATE in eventTypes[behavior] and idx % 2 == 0:
+
+                            start = seconds2time(round(row["occurence"] - timeline.offset(mediaFileIdx), 3)).replace(".", ",")
+                            stop = seconds2time(round(rows[idx + 1]["occurence"] - timeline.offset(mediaFileIdx), 3)).replace(".", ",")
+
+                            laps = "{start} --> {stop}".format(start=start, stop=stop)
+                            subtitles[mediaFileIdx].append([laps, """<font color="{0}">{1}: {2}</font>""".format(col, subject, behaviorStr)])
+
+            try:
+                for mediaIdx in subtitles:
+                    subtitles[mediaIdx].sort()
+                    with open("{exportDir}{sep}{fileName}.srt".format(exportDir=exportDir, sep=os.sep, fileName=os.path.basename(pj[OBSERVATIONS][obsId][FILE][nplayer][mediaIdx])), "w") as f:
+                        for idx, sub in enumerate(subtitles[mediaIdx]):
+                            f.write("{0}{3}{1}{3}{2}{3}{3}".format(idx + 1, sub[0], sub[1], os.linesep))
+            except:
+                errorMsg = sys.exc_info()[1]
+                logging.critical(errorMsg)
+                errors.append(str(errorMsg))
+
+    return flagUnpairedEventFound, errors
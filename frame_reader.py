@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+
+"""
+BORIS
+Behavioral Observation Research Interactive Software
+Copyright 2012-2016 Olivier Friard
+
+This file is part of BORIS.
+
+  BORIS is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 3 of the License, or
+  any later version.
+
+  BORIS is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not see <http://www.gnu.org/licenses/>.
+
+"""
+
+try:
+    from PyQt5.QtCore import *
+except:
+    from PyQt4.QtCore import *
+
+import re
+import subprocess
+import collections
+import threading
+import logging
+
+
+# default size of the memory cache of decoded frames (in Mb)
+FRAME_CACHE_DEFAULT_SIZE = 256
+
+# a required frame further than this number of seconds after the current decoder position
+# is reached by restarting the decoder with a seek instead of decoding all frames in between
+MAX_FORWARD_DECODING = 2
+
+# default number of frames decoded in advance after and before the current frame (see FramePrefetcher.prefetch)
+PREFETCH_FORWARD = 50
+PREFETCH_BACKWARD = 25
+
+
+def video_frame_size(ffmpeg_bin, fileName):
+    """
+    return width and height (in pixels) of the first video stream of media file
+    return (0, 0) if not found
+    """
+
+    p = subprocess.Popen([ffmpeg_bin, "-i", fileName], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        error = p.communicate()[1].decode("utf-8", "replace")
+    except:
+        return 0, 0
+
+    for row in error.split("\n"):
+        if "Stream #" in row and "Video:" in row:
+            re_results = re.search(", ([0-9]{2,5})x([0-9]{2,5})[ ,]", row)
+            if re_results:
+                return int(re_results.group(1)), int(re_results.group(2))
+
+    return 0, 0
+
+
+class FrameCache():
+    """
+    memory-bounded LRU cache of decoded frames keyed by (media file, frame index)
+    shared by all frame readers
+    """
+
+    def __init__(self, maxSizeMb=FRAME_CACHE_DEFAULT_SIZE):
+        self.frames = collections.OrderedDict()
+        self.size = 0
+        self.maxSize = maxSizeMb * 1024 * 1024
+        self.lock = threading.Lock()
+
+
+    def set_max_size(self, maxSizeMb):
+        """
+        set the max size of cache (in Mb) and remove the least recently used frames if needed
+        """
+        with self.lock:
+            self.maxSize = maxSizeMb * 1024 * 1024
+            self.evict()
+
+
+    def evict(self):
+        while self.size > self.maxSize and self.frames:
+            _, data = self.frames.popitem(last=False)
+            self.size -= len(data)
+
+
+    def get(self, key):
+        """
+        return frame or None if not in cache
+        """
+        with self.lock:
+            if key in self.frames:
+                self.frames.move_to_end(key)
+                return self.frames[key]
+            return None
+
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.frames
+
+
+    def put(self, key, data):
+        with self.lock:
+            if key in self.frames:
+                self.size -= len(self.frames[key])
+            self.frames[key] = data
+            self.frames.move_to_end(key)
+            self.size += len(data)
+            self.evict()
+
+
+    def clear(self):
+        with self.lock:
+            self.frames.clear()
+            self.size = 0
+
+
+class FFmpegFrameReader():
+    """
+    frame reader for frame-by-frame mode
+
+    a single ffmpeg process decodes the media file and pipes raw RGB frames on its standard output.
+    Decoded frames are kept in the frame cache so that stepping backward or forward
+    around the current position does not require a new ffmpeg process.
+    The process is restarted with a seek only when the required frame is not reachable by decoding ahead.
+    """
+
+    def __init__(self, ffmpeg_bin, fileName, fps, cache, frameIndex=None):
+
+        self.ffmpeg_bin = ffmpeg_bin
+        self.fileName = fileName
+        self.fps = float(fps)
+        self.cache = cache
+        # timestamps of frames (see media_analysis.FrameIndex), frame index * 1 / fps if None
+        self.frameIndex = frameIndex
+
+        self.width, self.height = video_frame_size(ffmpeg_bin, fileName)
+        self.frameSize = self.width * self.height * 3   # RGB24
+
+        # the reader is shared by the GUI and the prefetcher thread
+        self.lock = threading.RLock()
+
+        self.process = None
+        self.nextFrame = 0   # index of the next frame that will be read from the ffmpeg process
+
+
+    def isValid(self):
+        """
+        True if the size of frames is known
+        """
+        return self.frameSize > 0
+
+
+    def start(self, frameIdx):
+        """
+        (re)start the ffmpeg process from frame frameIdx
+        """
+
+        self.stop()
+
+        logging.debug("start ffmpeg frame reader for {} at frame {}".format(self.fileName, frameIdx))
+
+        if self.frameIndex:
+            # frames are not duplicated or dropped: the n-th frame read is the n-th timestamp
+            # (the seek time is before the timestamp of frame for rounding)
+            seek = ["-ss", "{:.6f}".format(max(0, self.frameIndex.time(frameIdx) - 0.0005))]
+            output = ["-vsync", "0"]
+        else:
+            seek = ["-ss", "{:.3f}".format(frameIdx / self.fps)]
+            output = []
+
+        self.process = subprocess.Popen([self.ffmpeg_bin, "-loglevel", "quiet"]
+                                        + seek
+                                        + ["-i", self.fileName]
+                                        + output
+                                        + ["-f", "rawvideo", "-pix_fmt", "rgb24", "-"],
+                                        stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL,
+                                        bufsize=self.frameSize)
+        self.nextFrame = frameIdx
+
+
+    def stop(self):
+        """
+        terminate the ffmpeg process
+        """
+        if self.process:
+            try:
+                self.process.kill()
+                self.process.stdout.close()
+                self.process.wait()
+            except:
+                pass
+            self.process = None
+
+
+    def read_next_frame(self):
+        """
+        read the next frame from the ffmpeg process and store it in the frame cache
+        return False if no more frames are available
+        """
+
+        data = self.process.stdout.read(self.frameSize)
+
+        if len(data) < self.frameSize:   # end of media
+            self.stop()
+            return False
+
+        self.cache.put((self.fileName, self.nextFrame), data)
+
+        self.nextFrame += 1
+        return True
+
+
+    def frame(self, frameIdx):
+        """
+        return the raw RGB24 frame frameIdx (width * height * 3 bytes)
+        return None if frame is not available
+        """
+
+        if not self.isValid() or frameIdx < 0:
+            return None
+
+        data = self.cache.get((self.fileName, frameIdx))
+        if data is not None:
+            return data
+
+        with self.lock:
+            if (self.process is None
+               or frameIdx < self.nextFrame
+               or frameIdx > self.nextFrame + MAX_FORWARD_DECODING * self.fps):
+                self.start(frameIdx)
+
+            data = None
+            while self.nextFrame <= frameIdx:
+                if self.nextFrame == frameIdx:
+                    data = self.process.stdout.read(self.frameSize)
+                    if len(data) < self.frameSize:
+                        self.stop()
+                        return None
+                    self.cache.put((self.fileName, frameIdx), data)
+                    self.nextFrame += 1
+                elif not self.read_next_frame():
+                    return None
+
+        return data
+
+
+    def prefetch(self, firstFrame, lastFrame, abort):
+        """
+        decode frames from firstFrame to lastFrame that are not in cache
+        stop when abort() returns True
+        """
+
+        firstFrame = max(0, firstFrame)
+
+        # skip frames already cached
+        while firstFrame <= lastFrame and (self.fileName, firstFrame) in self.cache:
+            firstFrame += 1
+
+        for frameIdx in range(firstFrame, lastFrame + 1):
+            if abort():
+                return
+            if self.frame(frameIdx) is None:
+                return
+
+
+class FramePrefetcher(QThread):
+    """
+    thread decoding frames around the current frame in background
+    """
+
+    def __init__(self, parent=None):
+        QThread.__init__(self, parent)
+        self.exiting = False
+        self.request = None
+        self.newRequest = threading.Event()
+
+
+    def prefetch(self, reader, frameIdx, framesForward=PREFETCH_FORWARD, framesBackward=PREFETCH_BACKWARD):
+        """
+        ask for decoding the next framesForward frames and the previous framesBackward frames of frameIdx
+        a new request supersedes the previous one
+        """
+        self.request = (reader, frameIdx, framesForward, framesBackward)
+        self.newRequest.set()
+
+
+    def stop(self):
+        self.exiting = True
+        self.newRequest.set()
+        self.wait()
+
+
+    def run(self):
+        while not self.exiting:
+            self.newRequest.wait()
+            self.newRequest.clear()
+            if self.exiting or self.request is None:
+                continue
+
+            reader, frameIdx, framesForward, framesBackward = self.request
+            abort = lambda: self.exiting or self.newRequest.is_set()
+
+            # previous frames first: the reader decodes forward from there up to the current frame
+            if framesBackward:
+                reader.prefetch(frameIdx - framesBackward, frameIdx, abort)
+            reader.prefetch(frameIdx + 1, frameIdx + framesForward, abort)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+"""
+BORIS
+Behavioral Observation Research Interactive Software
+Copyright 2012-2016 Olivier Friard
+
+This file is part of BORIS.
+
+  BORIS is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 3 of the License, or
+  any later version.
+
+  BORIS is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not see <http://www.gnu.org/licenses/>.
+
+
+Analysis of media files with the JSON output of ffprobe (without Qt)
+and index of the timestamps of video frames
+"""
+
+import os
+import json
+import array
+import bisect
+import subprocess
+import logging
+from decimal import *
+
+from media_cache import media_hash
+
+
+def ffprobe_bin(ffmpeg_bin):
+    """
+    returns the path of ffprobe (in the directory of ffmpeg)
+    """
+    directory, name = os.path.split(ffmpeg_bin)
+    return os.path.join(directory, name.replace("ffmpeg", "ffprobe"))
+
+
+def run_ffprobe(ffmpeg_bin, arguments):
+    """
+    returns the decoded JSON output of ffprobe
+    returns None if ffprobe is not available and {} if the file can not be analysed
+    """
+
+    try:
+        p = subprocess.Popen([ffprobe_bin(ffmpeg_bin), "-v", "error", "-print_format", "json"] + arguments,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError:
+        return None
+
+    out, _ = p.communicate()
+    if p.returncode:
+        return {}
+    try:
+        return json.loads(out.decode("utf-8", "replace"))
+    except ValueError:
+        return {}
+
+
+def number(value, type_=float):
+    """
+    returns the value of a numeric field of ffprobe output (0 if not available: missing or "N/A")
+    """
+    try:
+        return type_(value)
+    except (TypeError, ValueError):
+        return type_(0)
+
+
+def frame_rate(rate):
+    """
+    returns the frame rate from the ffprobe rational ("30000/1001") rounded to 0.001
+    returns 0 if not available
+    """
+    try:
+        num, den = rate.split("/")
+        return (Decimal(num) / Decimal(den)).quantize(Decimal("0.001")) if int(den) else Decimal("0")
+    except (AttributeError, ValueError, InvalidOperation):
+        return Decimal("0")
+
+
+def probe(ffmpeg_bin, fileName):
+    """
+    returns the informations of media file:
+    duration (s), fps (of first video stream), nframes, hasVideo, hasAudio and streams
+    (index, type, codec, start time, duration, fps, number of frames, width, height)
+
+    returns None if ffprobe is not available
+    the duration is 0 if the file is not a media file
+    """
+
+    data = run_ffprobe(ffmpeg_bin, ["-show_format", "-show_streams", fileName])
+    if data is None:
+        return None
+
+    streams = []
+    for stream in data.get("streams", []):
+        # cover art of audio files is not a video
+        if stream.get("disposition", {}).get("attached_pic"):
+            continue
+        streams.append({"index": stream.get("index", 0),
+                        "type": stream.get("codec_type", ""),
+                        "codec": stream.get("codec_name", ""),
+                        "start_time": number(stream.get("start_time")),
+                        "duration": number(stream.get("duration")),
+                        "fps": str(frame_rate(stream.get("avg_frame_rate")) or frame_rate(stream.get("r_frame_rate"))),
+                        "nb_frames": number(stream.get("nb_frames"), int),
+                        "width": stream.get("width", 0),
+                        "height": stream.get("height", 0)})
+
+    videoStreams = [stream for stream in streams if stream["type"] == "video"]
+    duration = number(data.get("format", {}).get("duration"))
+    fps = Decimal(videoStreams[0]["fps"]) if videoStreams else Decimal("0")
+
+    if videoStreams and videoStreams[0]["nb_frames"]:
+        nframes = videoStreams[0]["nb_frames"]
+    else:
+        nframes = int(fps * Decimal(str(duration)))
+
+    return {"duration": round(duration, 3),
+            "fps": fps,
+            "nframes": nframes,
+            "hasVideo": bool(videoStreams),
+            "hasAudio": bool([stream for stream in streams if stream["type"] == "audio"]),
+            "streams": streams}
+
+
+def frame_timestamps(ffmpeg_bin, fileName):
+    """
+    returns the sorted timestamps (in s from the start of media file) of the frames of the first video stream
+    the packets are read without decoding
+    returns None if not available
+    """
+
+    data = run_ffprobe(ffmpeg_bin, ["-select_streams", "v:0", "-show_entries", "packet=pts_time:format=start_time", fileName])
+    if not data or not data.get("packets"):
+        return None
+
+    start = number(data.get("format", {}).get("start_time"))
+    return array.array("d", sorted([number(packet["pts_time"]) - start for packet in data["packets"]
+                                    if packet.get("pts_time", "N/A") != "N/A"]))
+
+
+class FrameIndex():
+    """
+    timestamps of the frames of a media file
+    """
+
+    def __init__(self, timestamps):
+        self.timestamps = timestamps
+
+
+    def __len__(self):
+        return len(self.timestamps)
+
+
+    def time(self, frameIdx):
+        """
+        returns the time (in s) of frame frameIdx
+        """
+        return self.timestamps[max(0, min(frameIdx, len(self.timestamps) - 1))]
+
+
+    def frame(self, time_):
+        """
+        returns the index of the frame displayed at time (in s)
+        """
+        return max(0, bisect.bisect_right(self.timestamps, time_ + 0.000001) - 1)
+
+
+def frame_index_file_name(fileName, cacheDir):
+    """
+    returns the path of the frame index file of media file
+    """
+    return "{}{}{}.pts".format(cacheDir, os.sep, media_hash(fileName))
+
+
+def load_frame_index(ffmpeg_bin, fileName, cacheDir):
+    """
+    returns the frame index of media file (stored in a binary file of cache directory after the first analysis)
+    returns None if not available
+    """
+
+    indexFileName = frame_index_file_name(fileName, cacheDir)
+
+    if os.path.isfile(indexFileName):
+        timestamps = array.array("d")
+        with open(indexFileName, "rb") as f:
+            timestamps.fromfile(f, os.path.getsize(indexFileName) // timestamps.itemsize)
+        return FrameIndex(timestamps)
+
+    timestamps = frame_timestamps(ffmpeg_bin, fileName)
+    if timestamps is None:
+        logging.warning("frame index not available for {}".format(fileName))
+        return None
+
+    with open(indexFileName + ".part", "wb") as f:
+        timestamps.tofile(f)
+    os.replace(indexFileName + ".part", indexFileName)
+
+    return FrameIndex(timestamps)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+"""
+BORIS
+Behavioral Observation Research Interactive Software
+Copyright 2012-2016 Olivier Friard
+
+This file is part of BORIS.
+
+  BORIS is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 3 of the License, or
+  any later version.
+
+  BORIS is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not see <http://www.gnu.org/licenses/>.
+
+
+Persistent cache of the media files informations (shared by all projects, without Qt)
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+
+# cache file in the directory of the BORIS configuration file
+MEDIA_CACHE_FILE = os.path.expanduser("~") + os.sep + ".boris_media_cache.json"
+
+# size of the parts of media file read for computing its hash
+HASH_BLOCK = 1024 * 1024
+
+
+def media_hash(mediaFile):
+    """
+    returns a hash of media file computed from its size and from its first and last blocks
+    (a copied or renamed media file has the same hash)
+    """
+
+    size = os.path.getsize(mediaFile)
+    h = hashlib.sha1(str(size).encode("utf-8"))
+    with open(mediaFile, "rb") as f:
+        h.update(f.read(HASH_BLOCK))
+        f.seek(max(0, size - HASH_BLOCK))
+        h.update(f.read(HASH_BLOCK))
+
+    return h.hexdigest()
+
+
+class MediaCache():
+    """
+    informations of media files indexed by path (valid while size and modification time are unchanged)
+    and by hash of content (for media files moved, renamed or copied)
+
+    The cache is saved in a JSON file after each change or once at the end of a batch of analyses (see begin_batch).
+    The methods can be called from several threads.
+    """
+
+    def __init__(self, fileName=MEDIA_CACHE_FILE):
+        self.fileName = fileName
+        self.lock = threading.Lock()
+        self.paths = None   # path -> {"size", "mtime", "hash"}
+        self.hashes = None   # hash -> informations
+        self.batches = 0   # number of batches running
+        self.changed = False   # cache changed and not saved during batch
+
+
+    def load(self):
+        """
+        load cache file (once)
+        """
+        if self.paths is not None:
+            return
+        try:
+            with open(self.fileName) as f:
+                cache = json.loads(f.read())
+            self.paths, self.hashes = cache["paths"], cache["hashes"]
+        except FileNotFoundError:
+            self.paths, self.hashes = {}, {}
+        except:
+            logging.warning("media cache {} not valid".format(self.fileName))
+            self.paths, self.hashes = {}, {}
+
+
+    def save(self):
+        """
+        save cache in a temporary file renamed when complete
+        """
+        tmpFileName = self.fileName + ".tmp"
+        try:
+            data = json.dumps({"paths": self.paths, "hashes": self.hashes})
+            with open(tmpFileName, "w") as f:
+                f.write(data)
+            os.replace(tmpFileName, self.fileName)
+        except (OSError, TypeError, ValueError) as e:
+            logging.warning("media cache {} can not be saved: {}".format(self.fileName, e))
+            if os.path.isfile(tmpFileName):
+                os.remove(tmpFileName)
+
+
+    def changed_cache(self):
+        """
+        save the changed cache (at the end of batch if a batch is running)
+        must be called with the lock
+        """
+        if self.batches:
+            self.changed = True
+        else:
+            self.save()
+
+
+    def begin_batch(self):
+        """
+        start a batch of analyses: the cache is saved once at the end of batch
+        """
+        with self.lock:
+            self.batches += 1
+
+
+    def end_batch(self):
+        """
+        end a batch of analyses and save the cache if changed
+        """
+        with self.lock:
+            self.batches = max(0, self.batches - 1)
+            if not self.batches and self.changed:
+                self.changed = False
+                self.save()
+
+
+    def get(self, mediaFile):
+        """
+        returns the informations of media file or None if not in cache
+        """
+
+        try:
+            stat = os.stat(mediaFile)
+        except OSError:
+            return None
+
+        path = os.path.abspath(mediaFile)
+
+        with self.lock:
+            self.load()
+            entry = self.paths.get(path)
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime and entry["hash"] in self.hashes:
+                return self.hashes[entry["hash"]]
+
+        # path unknown or file modified: search by content
+        try:
+            hash_ = media_hash(mediaFile)
+        except OSError:
+            return None
+
+        with self.lock:
+            if hash_ not in self.hashes:
+                return None
+            self.paths[path] = {"size": stat.st_size, "mtime": stat.st_mtime, "hash": hash_}
+            self.changed_cache()
+            return self.hashes[hash_]
+
+
+    def put(self, mediaFile, info):
+        """
+        add informations (JSON serializable) of media file in cache
+        """
+
+        try:
+            stat = os.stat(mediaFile)
+            hash_ = media_hash(mediaFile)
+        except OSError:
+            return
+
+        with self.lock:
+            self.load()
+            self.paths[os.path.abspath(mediaFile)] = {"size": stat.st_size, "mtime": stat.st_mtime, "hash": hash_}
+            self.hashes[hash_] = info
+            self.changed_cache()
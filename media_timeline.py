@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+"""
+BORIS
+Behavioral Observation Research Interactive Software
+Copyright 2012-2016 Olivier Friard
+
+This file is part of BORIS.
+
+  BORIS is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 3 of the License, or
+  any later version.
+
+  BORIS is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not see <http://www.gnu.org/licenses/>.
+
+
+Timeline of the media files played one after the other (without Qt)
+"""
+
+import bisect
+
+
+class MediaTimeline():
+    """
+    cumulative offsets of media files: the global time of the start of each media file
+    is computed once, the media file at a global time is found by binary search.
+
+    The durations can be in any unit (ms, s or frames), the times must be in the same unit
+    """
+
+    def __init__(self, durations):
+        self.durations = list(durations)
+        self.offsets = [0]
+        for duration in self.durations:
+            self.offsets.append(self.offsets[-1] + duration)
+
+
+    def __len__(self):
+        return len(self.durations)
+
+
+    def total(self):
+        """
+        returns the total duration of media files
+        """
+        return self.offsets[-1]
+
+
+    def offset(self, idx):
+        """
+        returns the global time of the start of media idx
+        """
+        return self.offsets[idx]
+
+
+    def media_at(self, globalTime):
+        """
+        returns the index of media played at global time
+        returns None if global time is before the start of the first media or after the end of the last media
+        """
+        if globalTime < 0 or globalTime >= self.offsets[-1]:
+            return None
+        return bisect.bisect_right(self.offsets, globalTime) - 1
+
+
+    def media_index(self, globalTime):
+        """
+        returns the index of the last media starting at or before global time
+        (first media before the start, last media after the end)
+        """
+        return max(0, bisect.bisect_right(self.offsets, globalTime, 0, len(self.durations)) - 1)
+
+
+    def locate(self, globalTime):
+        """
+        returns the index of media played at global time and the time in this media
+        returns None, 0 if global time is out of media
+        """
+        idx = self.media_at(globalTime)
+        if idx is None:
+            return None, 0
+        return idx, globalTime - self.offsets[idx]
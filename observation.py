@@ -35,13 +35,13 @@ except:
 import os
 import time
 import hashlib
-import tempfile
 from config import *
 from utilities import *
 import dialog
-import plot_spectrogram
 import glob
 import logging
+import multiprocessing
+import concurrent.futures
 
 if QT_VERSION_STR[0] == "4":
     from observation_ui import Ui_Form
@@ -51,6 +51,9 @@ else:
 out = ""
 fps = 0
 
+# number of media files analysed at the same time when a directory is added
+MEDIA_ANALYSIS_WORKERS = max(4, multiprocessing.cpu_count())
+
 class Observation(QDialog, Ui_Form):
 
     def __init__(self, log_level, parent=None):
@@ -76,6 +79,15 @@ class Observation(QDialog, Ui_Form):
 
         self.mediaDurations, self.mediaFPS, self.mediaHasVideo, self.mediaHasAudio = {}, {}, {}, {}
 
+        # analysis of media files of a directory
+        self.mediaAnalysisExecutor = None
+        self.mediaAnalysisQueue = []   # (file name, player, future) in order of files
+        self.mediaAnalysisErrors = []
+        self.mediaAnalysisTotal = 0
+        self.mediaAnalysisTimer = QTimer(self)
+        self.mediaAnalysisTimer.setInterval(50)
+        self.mediaAnalysisTimer.timeout.connect(self.add_analysed_media)
+
         self.cbVisualizeSpectrogram.setEnabled(False)
         self.cbCloseCurrentBehaviorsBetweenVideo.setEnabled(False)
 
@@ -99,35 +111,27 @@ class Observation(QDialog, Ui_Form):
 
 
     def generate_spectrogram(self):
+        """
+        the spectrogram is generated in background when the observation starts
+        """
 
         if self.cbVisualizeSpectrogram.isChecked():
-
-            if dialog.MessageDialog(programName, ("You chose to visualize the spectrogram for the media in player #1.<br>"
-                                                  "Choose YES to generate the spectrogram.\n\n"
-                                                  "Spectrogram generation can take some time for long media, be patient"), [YES, NO]) == YES:
-
-                # check temp dir for images from ffmpeg
-                if not self.ffmpeg_cache_dir:
-                    tmp_dir = tempfile.gettempdir()
-                else:
-                    tmp_dir = self.ffmpeg_cache_dir
-
-                self.lbMediaAnalysis.setText("<b>Spectrogram generation...</b>")
-                QApplication.processEvents()
-
-                for row in range(self.twVideo1.rowCount()):
-                    _ = plot_spectrogram.graph_spectrogram(mediaFile=self.twVideo1.item(row, 0).text(), tmp_dir=tmp_dir, chunk_size=self.chunk_length, ffmpeg_bin=self.ffmpeg_bin)  # return first chunk PNG file (not used)
-
-                self.lbMediaAnalysis.setText("<b>Spectrogram was generated successfully</b>")
-                QApplication.processEvents()
-
-            else:
-                self.cbVisualizeSpectrogram.setChecked(False)
+            self.lbMediaAnalysis.setText("<b>The spectrogram will be generated in background during the observation</b>")
+        else:
+            self.lbMediaAnalysis.setText("")
 
 
     def pbCancel_clicked(self):
         self.reject()
 
+
+    def done(self, r):
+        """
+        stop the analysis of media files when the dialog is closed (buttons, Escape key or close button of window)
+        """
+        self.stop_media_analysis()
+        super(Observation, self).done(r)
+
     def check_parameters(self):
         """
         check observation parameters
@@ -139,6 +143,10 @@ class Observation(QDialog, Ui_Form):
             except ValueError:
                 return False
 
+        if self.mediaAnalysisQueue:
+            QMessageBox.warning(self, programName, "Wait for the end of the analysis of media files")
+            return False
+
         # check time offset
         if not is_numeric(self.leTimeOffset.text()):
             QMessageBox.warning(self, programName , "<b>{}</b> is not recognized as a valid time offset format".format(self.leTimeOffset.text()))
@@ -193,18 +201,29 @@ class Observation(QDialog, Ui_Form):
         nPlayer -- player #
         """
 
-        nframe, videoTime, videoDuration, fps, hasVideo, hasAudio = accurate_media_analysis(self.ffmpeg_bin, fileName)
-
-        if videoDuration:
-            self.mediaDurations[fileName] = videoDuration
-            self.mediaFPS[fileName] = fps
-            self.mediaHasVideo[fileName] = hasVideo
-            self.mediaHasAudio[fileName] = hasAudio
-            self.add_media_to_listview(nPlayer, fileName, '')
-        else:
+        if not self.add_media_info(fileName, nPlayer, cached_media_analysis(self.ffmpeg_bin, fileName)):
             QMessageBox.critical(self, programName, "This file does not seem to be a media file..." )
 
 
+    def add_media_info(self, fileName, nPlayer, mediaInfo):
+        """
+        add media file with results of media analysis
+        returns False if file is not a media file
+        """
+
+        nframe, videoTime, videoDuration, fps, hasVideo, hasAudio = mediaInfo
+
+        if not videoDuration:
+            return False
+
+        self.mediaDurations[fileName] = videoDuration
+        self.mediaFPS[fileName] = fps
+        self.mediaHasVideo[fileName] = hasVideo
+        self.mediaHasAudio[fileName] = hasAudio
+        self.add_media_to_listview(nPlayer, fileName, '')
+        return True
+
+
     def add_media(self, nPlayer):
         """
         add media in player
@@ -230,14 +249,74 @@ class Observation(QDialog, Ui_Form):
     def add_media_from_dir(self, nPlayer):
         """
         add all media from a selected directory
+        the media files are analysed concurrently and added in alphabetical order while the analysis is running
         """
         dirName = QFileDialog().getExistingDirectory(self, "Select directory")
-        if dirName:
-            for fileName in glob.glob(dirName + os.sep + "*" ):
-                self.check_media(fileName, nPlayer)
+        if not dirName:
+            return
+
+        fileNames = [fileName for fileName in sorted(glob.glob(dirName + os.sep + "*")) if is_media_candidate(fileName)]
+        if not fileNames:
+            QMessageBox.warning(self, programName, "No media file found in {}".format(dirName))
+            return
+
+        if self.mediaAnalysisExecutor is None:
+            self.mediaAnalysisExecutor = concurrent.futures.ThreadPoolExecutor(MEDIA_ANALYSIS_WORKERS)
+
+        if not self.mediaAnalysisQueue:
+            self.mediaAnalysisTotal, self.mediaAnalysisErrors = 0, []
+            # the media cache is saved once at the end of analysis
+            mediaCache.begin_batch()
+        self.mediaAnalysisTotal += len(fileNames)
+        for fileName in fileNames:
+            self.mediaAnalysisQueue.append((fileName, nPlayer, self.mediaAnalysisExecutor.submit(cached_media_analysis, self.ffmpeg_bin, fileName)))
+
+        self.pbAddMediaFromDir.setEnabled(False)
+        self.mediaAnalysisTimer.start()
+
+
+    def add_analysed_media(self):
+        """
+        add the media files analysed (in order of files)
+        """
+
+        while self.mediaAnalysisQueue and self.mediaAnalysisQueue[0][2].done():
+            fileName, nPlayer, future = self.mediaAnalysisQueue.pop(0)
+            if future.exception() is not None or not self.add_media_info(fileName, nPlayer, future.result()):
+                self.mediaAnalysisErrors.append(os.path.basename(fileName))
+
+        self.lbMediaAnalysis.setText("<b>Media analysis: {} / {}</b>".format(self.mediaAnalysisTotal - len(self.mediaAnalysisQueue),
+                                                                             self.mediaAnalysisTotal))
         self.cbVisualizeSpectrogram.setEnabled(self.twVideo1.rowCount() > 0)
         self.cbCloseCurrentBehaviorsBetweenVideo.setEnabled(self.twVideo1.rowCount() > 0)
 
+        if self.mediaAnalysisQueue:
+            return
+
+        self.mediaAnalysisTimer.stop()
+        mediaCache.end_batch()
+        self.pbAddMediaFromDir.setEnabled(True)
+        self.lbMediaAnalysis.setText("")
+        if self.mediaAnalysisErrors:
+            QMessageBox.warning(self, programName, "These files do not seem to be media files:<br>{}{}".format(
+                                "<br>".join(self.mediaAnalysisErrors[:20]),
+                                "<br>and {} other files".format(len(self.mediaAnalysisErrors) - 20) if len(self.mediaAnalysisErrors) > 20 else ""))
+
+
+    def stop_media_analysis(self):
+        """
+        cancel the analysis of media files not yet started
+        """
+        self.mediaAnalysisTimer.stop()
+        for _, _, future in self.mediaAnalysisQueue:
+            future.cancel()
+        if self.mediaAnalysisQueue:
+            mediaCache.end_batch()
+        self.mediaAnalysisQueue = []
+        if self.mediaAnalysisExecutor:
+            self.mediaAnalysisExecutor.shutdown(wait=False)
+            self.mediaAnalysisExecutor = None
+
 
     def add_media_to_listview(self, nPlayer, fileName, fileContentMD5):
         """
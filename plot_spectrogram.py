@@ -42,10 +42,38 @@ except:
 import sys
 import os
 import wave
+import zlib
+import struct
+import math
+import json
+import logging
+import multiprocessing
+import concurrent.futures
 import numpy as np
-import matplotlib
 import subprocess
 
+from media_cache import media_hash
+
+
+# parameters of the short-time Fourier transform (number of samples of each segment and overlap)
+NFFT = 256
+NOVERLAP = 128
+
+# size of the spectrogram images
+PIXELS_BY_SECOND = 100
+SPECTROGRAM_HEIGHT = 100
+
+# power range (in dB) mapped on the colors
+DB_MIN, DB_MAX = -100, 20
+
+# number of segments transformed at once (limits the memory used)
+SEGMENTS_BLOCK = 4096
+
+# tiles of the spectrogram pyramid: width (in pixels) and duration (in seconds) of a tile for each zoom level
+# (the first level has the resolution of the spectrogram chunks)
+TILE_WIDTH = 1000
+TILE_LEVELS = (10, 60, 600, 3600)
+
 
 class Spectrogram(QWidget):
 
@@ -54,13 +82,16 @@ class Spectrogram(QWidget):
 
     memChunk = ''
 
-    def __init__(self, fileName1stChunk, parent = None):
+    def __init__(self, fileName1stChunk, parent = None, chunkSize=60):
 
         super(Spectrogram, self).__init__(parent)
 
+        self.chunkSize = chunkSize
         self.pixmap = QPixmap()
 
-        self.pixmap.load(fileName1stChunk)
+        # the first chunk can be not yet rendered
+        if not self.pixmap.load(fileName1stChunk):
+            self.pixmap = self.placeholder()
         self.w, self.h = self.pixmap.width(), self.pixmap.height()
 
         #self.setGeometry(300, 300, 1000, self.h + 50)
@@ -95,6 +126,20 @@ class Spectrogram(QWidget):
         self.installEventFilter(self)
 
 
+    def placeholder(self):
+        """
+        returns the image displayed while the chunk is rendered
+        """
+        pixmap = QPixmap(self.chunkSize * PIXELS_BY_SECOND, SPECTROGRAM_HEIGHT)
+        pixmap.fill(QColor(60, 60, 60))
+        painter = QPainter(pixmap)
+        painter.setPen(QColor(200, 200, 200))
+        for x in range(0, pixmap.width(), 500):
+            painter.drawText(x + 10, SPECTROGRAM_HEIGHT // 2, "Spectrogram generation...")
+        painter.end()
+        return pixmap
+
+
     def eventFilter(self, receiver, event):
         '''
         send event (if keypress) to main window
@@ -106,84 +151,174 @@ class Spectrogram(QWidget):
             return False
 
 
-def graph_spectrogram(mediaFile, tmp_dir, chunk_size, ffmpeg_bin):
-
-    def extract_wav(mediaFile, tmp_dir):
-        """
-        extract wav from media file
-        """
+def jet_colormap():
+    """
+    returns the lookup table (256 x RGB) of the jet color map
+    """
+    x = np.linspace(0, 1, 256)
+    lut = np.empty((256, 3))
+    for channel, center in enumerate([0.75, 0.5, 0.25]):   # red, green, blue
+        lut[:, channel] = np.clip(1.5 - np.abs(4 * x - 4 * center), 0, 1)
+    return (lut * 255).astype(np.uint8)
+
 
-        wavTmpPath = "{tmp_dir}{sep}{mediaBaseName}.wav".format(tmp_dir=tmp_dir,
-                                                                  sep=os.sep,
-                                                                  mediaBaseName=os.path.basename(mediaFile))
-
-        if os.path.isfile(wavTmpPath):
-            return wavTmpPath
-        else:
-            p = subprocess.Popen('{ffmpeg_bin} -i "{mediaFile}" -y -ac 1 -vn "{wavTmpPath}"'.format(ffmpeg_bin=ffmpeg_bin,
-                                                                                                      mediaFile=mediaFile,
-                                                                                                      wavTmpPath=wavTmpPath),
-                                                                                                      stdout=subprocess.PIPE,
-                                                                                                      stderr=subprocess.PIPE,
-                                                                                                      shell=True)
-            out, error = p.communicate()
-            out, error = out.decode("utf-8"), error.decode("utf-8")
-
-            if not out:
-                return wavTmpPath
-            else:
-                return None
-
-
-    def get_wav_info(wav_file):
-
-        wav = wave.open(wav_file, "r")
-        frames = wav.readframes(-1)
-        sound_info = pylab.fromstring(frames, "Int16")
-        frame_rate = wav.getframerate()
+def write_png(fileName, rgb):
+    """
+    write a RGB image (array of height x width x 3 bytes) in PNG format
+    """
+
+    def chunk(chunkType, data):
+        return struct.pack(">I", len(data)) + chunkType + data + struct.pack(">I", zlib.crc32(chunkType + data) & 0xffffffff)
+
+    height, width, _ = rgb.shape
+    # each row starts with the filter type (0: none)
+    raw = np.hstack((np.zeros((height, 1), dtype=np.uint8), rgb.reshape(height, width * 3))).tobytes()
+
+    with open(fileName, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw, 6)))
+        f.write(chunk(b"IEND", b""))
+
+
+def stft_power(samples):
+    """
+    returns the power (in dB) of the segments of samples (segments x frequencies)
+    samples are normalized in [-1, 1]
+    """
+
+    window = np.hanning(NFFT)
+    step = NFFT - NOVERLAP
+    nSegments = max(0, (len(samples) - NFFT) // step + 1)
+
+    power = np.empty((nSegments, NFFT // 2 + 1), dtype=np.float32)
+    for first in range(0, nSegments, SEGMENTS_BLOCK):
+        last = min(nSegments, first + SEGMENTS_BLOCK)
+        # view of overlapping segments (no copy)
+        segments = np.lib.stride_tricks.as_strided(samples[first * step:],
+                                                   shape=(last - first, NFFT),
+                                                   strides=(samples.strides[0] * step, samples.strides[0]))
+        spectrum = np.abs(np.fft.rfft(segments * window, axis=1)) ** 2 / (window ** 2).sum()
+        power[first:last] = 10 * np.log10(spectrum + 1e-20)
+
+    return power
+
+
+def spectrogram_levels(samples, width, height):
+    """
+    returns the color levels (0-255) of the spectrogram of samples (height x width array, low frequencies at bottom)
+    the max power of the segments and frequencies corresponding to each pixel is displayed
+    """
+
+    power = stft_power(samples)
+    if not len(power):
+        return np.zeros((height, width), dtype=np.uint8)
+
+    # reduce segments to columns and frequencies to rows
+    # (a pixel corresponding to less than one segment or frequency takes the value of the first one)
+    power = np.maximum.reduceat(power, np.arange(width) * len(power) // width, axis=0)
+    image = np.maximum.reduceat(power, np.arange(height) * power.shape[1] // height, axis=1)
+
+    return np.clip((image - DB_MIN) / (DB_MAX - DB_MIN) * 255, 0, 255).astype(np.uint8).T[::-1]
+
+
+def spectrogram_image(samples, width, height, lut):
+    """
+    returns the RGB image of the spectrogram of samples (low frequencies at bottom)
+    """
+    return lut[spectrogram_levels(samples, width, height)]
+
+
+def wav_file_name(mediaFile, tmp_dir):
+    """
+    returns the path of the WAV file extracted from media file
+    """
+    return "{tmp_dir}{sep}{mediaBaseName}.wav".format(tmp_dir=tmp_dir, sep=os.sep, mediaBaseName=os.path.basename(mediaFile))
+
+
+def chunk_file_name(wav_file, i, chunk_size):
+    """
+    returns the path of the image of the chunk starting at i seconds
+    """
+    return "{}.{}-{}.spectrogram.png".format(wav_file, i, i + chunk_size)
+
+
+def extract_wav(mediaFile, tmp_dir, ffmpeg_bin):
+    """
+    extract wav from media file (16 bit, mono)
+    returns the path of wav file and its duration (in seconds) or None, 0 if audio can not be extracted
+    """
+
+    wavTmpPath = wav_file_name(mediaFile, tmp_dir)
+
+    if not os.path.isfile(wavTmpPath):
+        # the wav file is renamed when complete
+        partialPath = wavTmpPath[:-len(".wav")] + ".part.wav"
+        p = subprocess.Popen([ffmpeg_bin, "-i", mediaFile, "-y", "-ac", "1", "-vn", "-acodec", "pcm_s16le", partialPath],
+                             stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE)
+        out, error = p.communicate()
+        if out or not os.path.isfile(partialPath):
+            return None, 0
+        os.replace(partialPath, wavTmpPath)
+
+    try:
+        wav = wave.open(wavTmpPath, "r")
+        duration = round(wav.getnframes() / wav.getframerate(), 3)
         wav.close()
-        return sound_info, frame_rate
+    except:
+        return None, 0
 
+    return wavTmpPath, duration
 
-    matplotlib.use("Agg")
-    import pylab
 
-    fileName1stChunk = ''
+def render_chunk(wav_file, i, chunk_size, lut=None):
+    """
+    render the spectrogram image of the chunk of wav file starting at i seconds
+    only the samples of the chunk are read
+    returns the file name of image
+    """
 
-    mediaBaseName = os.path.basename( mediaFile )
+    chunkFileName = chunk_file_name(wav_file, i, chunk_size)
+    if os.path.isfile(chunkFileName):
+        return chunkFileName
 
-    wav_file = extract_wav(mediaFile, tmp_dir)
-    if not wav_file:
-        return None
+    wav = wave.open(wav_file, "r")
+    frame_rate = wav.getframerate()
+    wav.setpos(min(i * frame_rate, wav.getnframes()))
+    samples = np.frombuffer(wav.readframes(chunk_size * frame_rate), dtype="<i2").astype(np.float32) / 32768
+    wav.close()
 
-    sound_info, frame_rate = get_wav_info(wav_file)
+    # complete chunk with silence if shorter than chunk length
+    if len(samples) < chunk_size * frame_rate:
+        samples = np.concatenate((samples, np.zeros(chunk_size * frame_rate - len(samples), dtype=np.float32)))
 
-    wav_length = round(len(sound_info) / frame_rate, 3)
+    # the image is written in a temporary file renamed when complete
+    partialFileName = chunkFileName + ".part"
+    write_png(partialFileName, spectrogram_image(samples, chunk_size * PIXELS_BY_SECOND, SPECTROGRAM_HEIGHT, jet_colormap() if lut is None else lut))
+    os.replace(partialFileName, chunkFileName)
 
-    i = 0
-    while True:
+    return chunkFileName
 
-        chunkFileName = "{}.{}-{}.spectrogram.png".format(wav_file, i, i + chunk_size)
-        if not os.path.isfile(chunkFileName):
 
-            sound_info_slice = sound_info[i * frame_rate: (i + chunk_size) * frame_rate]
+def graph_spectrogram(mediaFile, tmp_dir, chunk_size, ffmpeg_bin):
+    """
+    generate the spectrogram images (one PNG file by chunk of chunk_size seconds) of media file
+    the audio track is extracted in WAV format and read chunk by chunk (memory used does not depend on the media length)
 
-            # complete bitmat spectrogram chunk if shorter than chunk length
-            if len(sound_info_slice) / frame_rate < chunk_size:
-                concat = np.zeros((chunk_size - len(sound_info_slice) / frame_rate )* frame_rate)
-                sound_info_slice = np.concatenate((sound_info_slice, concat))
+    returns the file name of the first chunk image or None if audio can not be extracted
+    """
 
-            pylab.figure(num=None, dpi=100, figsize=(int( len(sound_info_slice)/frame_rate), 1))
-            pylab.gca().set_axis_off()
-            pylab.margins(0, 0)
-            pylab.gca().xaxis.set_major_locator(pylab.NullLocator())
-            pylab.gca().yaxis.set_major_locator(pylab.NullLocator())
-            #pylab.specgram(sound_info_slice, Fs=frame_rate, cmap=matplotlib.pyplot.get_cmap('Greys'),scale_by_freq=False)
-            pylab.specgram(sound_info_slice, Fs=frame_rate, scale_by_freq=False)
-            pylab.savefig(chunkFileName, bbox_inches='tight', pad_inches=0)
-            pylab.clf()
-            pylab.close()
+    wav_file, wav_length = extract_wav(mediaFile, tmp_dir, ffmpeg_bin)
+    if not wav_file:
+        return None
 
+    lut = jet_colormap()
+    fileName1stChunk = ""
+
+    i = 0
+    while True:
+        chunkFileName = render_chunk(wav_file, i, chunk_size, lut)
         if not fileName1stChunk:
             fileName1stChunk = chunkFileName
 
@@ -193,3 +328,391 @@ def graph_spectrogram(mediaFile, tmp_dir, chunk_size, ffmpeg_bin):
 
     return fileName1stChunk
 
+
+def pyramid_dir(mediaFile, tmp_dir):
+    """
+    returns the directory of the spectrogram tiles of media file
+    """
+    return "{tmp_dir}{sep}{hash}.spectrogram".format(tmp_dir=tmp_dir, sep=os.sep, hash=media_hash(mediaFile))
+
+
+def tile_file_name(pyramidDir, level, idx):
+    """
+    returns the path of the tile idx of zoom level (level is the duration of tile in seconds)
+    """
+    return "{}{}{}s.{}.png".format(pyramidDir, os.sep, level, idx)
+
+
+def pyramid_info(pyramidDir):
+    """
+    returns the informations of a complete pyramid (duration and levels) or None if the pyramid is not complete
+    """
+    try:
+        with open(pyramidDir + os.sep + "pyramid.json") as f:
+            return json.loads(f.read())
+    except:
+        return None
+
+
+def build_pyramid(mediaFile, tmp_dir, ffmpeg_bin):
+    """
+    generate the tiles of all zoom levels of the spectrogram of media file (once by media file content)
+
+    the audio is read by blocks of one tile of the first level, the columns of the other levels
+    are the max of the columns of the first level, so the short-time Fourier transform is done once.
+    The last tile of each level is cropped at the end of the audio.
+
+    returns the directory of tiles or None if audio can not be extracted
+    """
+
+    pyramidDir = pyramid_dir(mediaFile, tmp_dir)
+    if pyramid_info(pyramidDir):
+        return pyramidDir
+
+    wav_file, duration = extract_wav(mediaFile, tmp_dir, ffmpeg_bin)
+    if not wav_file:
+        return None
+
+    if not os.path.isdir(pyramidDir):
+        os.makedirs(pyramidDir)
+
+    lut = jet_colormap()
+
+    def write_tile(level, idx, levels):
+        # crop the last tile at the end of audio
+        width = min(TILE_WIDTH, max(1, int(math.ceil((duration - idx * level) * TILE_WIDTH / level))))
+        fileName = tile_file_name(pyramidDir, level, idx)
+        write_png(fileName + ".part", lut[levels[:, :width]])
+        os.replace(fileName + ".part", fileName)
+
+    # current tile of the levels built from the first one
+    tiles = dict([(level, [0, np.zeros((SPECTROGRAM_HEIGHT, TILE_WIDTH), dtype=np.uint8)]) for level in TILE_LEVELS[1:]])
+
+    wav = wave.open(wav_file, "r")
+    frame_rate = wav.getframerate()
+    blockLength = TILE_LEVELS[0] * frame_rate
+
+    idx = 0
+    while idx * TILE_LEVELS[0] < duration or idx == 0:
+        samples = np.frombuffer(wav.readframes(blockLength), dtype="<i2").astype(np.float32) / 32768
+        if len(samples) < blockLength:
+            samples = np.concatenate((samples, np.zeros(blockLength - len(samples), dtype=np.float32)))
+
+        levels = spectrogram_levels(samples, TILE_WIDTH, SPECTROGRAM_HEIGHT)
+        write_tile(TILE_LEVELS[0], idx, levels)
+
+        # global index of columns of the block in each level
+        columns = idx * TILE_WIDTH + np.arange(TILE_WIDTH)
+        for level in TILE_LEVELS[1:]:
+            levelColumns = columns * TILE_LEVELS[0] // level
+            for tileIdx in np.unique(levelColumns // TILE_WIDTH):
+                if tileIdx != tiles[level][0]:
+                    write_tile(level, tiles[level][0], tiles[level][1])
+                    tiles[level] = [tileIdx, np.zeros((SPECTROGRAM_HEIGHT, TILE_WIDTH), dtype=np.uint8)]
+                selected = levelColumns // TILE_WIDTH == tileIdx
+                np.maximum.at(tiles[level][1].T, levelColumns[selected] % TILE_WIDTH, levels.T[selected])
+
+        idx += 1
+
+    wav.close()
+
+    for level in TILE_LEVELS[1:]:
+        write_tile(level, tiles[level][0], tiles[level][1])
+
+    # the pyramid is complete when the informations file exists
+    with open(pyramidDir + os.sep + "pyramid.json.part", "w") as f:
+        f.write(json.dumps({"media": mediaFile, "duration": duration, "levels": TILE_LEVELS, "tile_width": TILE_WIDTH}))
+    os.replace(pyramidDir + os.sep + "pyramid.json.part", pyramidDir + os.sep + "pyramid.json")
+
+    return pyramidDir
+
+
+class SpectrogramOverview(QWidget):
+    """
+    zoomable view of the spectrogram of a whole media file
+
+    the view displays the tiles of the pyramid: zooming swaps the zoom level (no rendering),
+    only the tiles of the visible part are loaded.
+    A double-click on the spectrogram sends the corresponding time (in seconds)
+    """
+
+    # send keypress event to mainwindow
+    sendEvent = pyqtSignal(QEvent)
+    # time selected by double-click
+    timeSelected = pyqtSignal(float)
+
+    def __init__(self, mediaFile, parent=None):
+
+        super(SpectrogramOverview, self).__init__(parent)
+
+        self.mediaFile = mediaFile
+        self.pyramidDir, self.info = "", None
+        self.level = len(TILE_LEVELS) - 1
+        self.tiles = {}   # tile index -> graphic item of current level
+
+        self.scene = QGraphicsScene(self)
+        self.scene.setBackgroundBrush(QColor(0, 0, 0, 255))
+
+        self.view = QGraphicsView(self.scene)
+        self.view.setAlignment(Qt.AlignLeft | Qt.AlignTop)
+        self.view.setMinimumHeight(SPECTROGRAM_HEIGHT + 30)
+        self.view.horizontalScrollBar().valueChanged.connect(self.load_visible_tiles)
+        self.view.viewport().installEventFilter(self)
+
+        self.cursorLine = QGraphicsLineItem(0, 0, 0, SPECTROGRAM_HEIGHT)
+        self.cursorLine.setPen(QPen(QColor(0, 0, 255, 255), 2))
+        self.cursorLine.setZValue(100.0)
+        self.scene.addItem(self.cursorLine)
+
+        self.pbZoomIn = QPushButton("Zoom in")
+        self.pbZoomIn.clicked.connect(lambda: self.zoom(-1))
+        self.pbZoomOut = QPushButton("Zoom out")
+        self.pbZoomOut.clicked.connect(lambda: self.zoom(1))
+        self.lbInfo = QLabel("Spectrogram generation...")
+
+        hbox = QHBoxLayout()
+        hbox.addWidget(self.pbZoomIn)
+        hbox.addWidget(self.pbZoomOut)
+        hbox.addWidget(self.lbInfo)
+        hbox.addStretch()
+
+        vbox = QVBoxLayout(self)
+        vbox.addWidget(self.view)
+        vbox.addLayout(hbox)
+
+        self.setWindowTitle("Spectrogram overview - {}".format(os.path.basename(mediaFile)))
+        self.resize(1000, SPECTROGRAM_HEIGHT + 90)
+
+        self.installEventFilter(self)
+
+
+    def set_pyramid(self, pyramidDir):
+        """
+        display the tiles of pyramid directory
+        """
+        self.pyramidDir, self.info = pyramidDir, pyramid_info(pyramidDir)
+        self.show_level(self.level, 0)
+
+
+    def pixels_by_second(self):
+        return TILE_WIDTH / TILE_LEVELS[self.level]
+
+
+    def show_level(self, level, time_):
+        """
+        display zoom level with time (in seconds) at center of view
+        """
+
+        if not self.info:
+            return
+
+        for item in self.tiles.values():
+            self.scene.removeItem(item)
+        self.tiles = {}
+
+        self.level = level
+        width = max(1, int(math.ceil(self.info["duration"] * self.pixels_by_second())))
+        self.scene.setSceneRect(0, 0, width, SPECTROGRAM_HEIGHT)
+        self.view.centerOn(time_ * self.pixels_by_second(), SPECTROGRAM_HEIGHT / 2)
+
+        self.pbZoomIn.setEnabled(level > 0)
+        self.pbZoomOut.setEnabled(level < len(TILE_LEVELS) - 1)
+        self.lbInfo.setText("Duration: {:.1f} s - {} s by tile".format(self.info["duration"], TILE_LEVELS[level]))
+
+        self.load_visible_tiles()
+
+
+    def load_visible_tiles(self):
+        """
+        load the tiles of the visible part of the spectrogram
+        """
+
+        if not self.info:
+            return
+
+        left = self.view.mapToScene(0, 0).x()
+        right = self.view.mapToScene(self.view.viewport().width(), 0).x()
+
+        for idx in range(max(0, int(left // TILE_WIDTH)), int(right // TILE_WIDTH) + 1):
+            if idx in self.tiles:
+                continue
+            fileName = tile_file_name(self.pyramidDir, TILE_LEVELS[self.level], idx)
+            if not os.path.isfile(fileName):
+                continue
+            item = QGraphicsPixmapItem(QPixmap(fileName))
+            item.setPos(idx * TILE_WIDTH, 0)
+            self.scene.addItem(item)
+            self.tiles[idx] = item
+
+
+    def center_time(self):
+        """
+        returns the time (in seconds) at the center of view
+        """
+        return self.view.mapToScene(self.view.viewport().rect().center()).x() / self.pixels_by_second()
+
+
+    def zoom(self, step):
+        """
+        swap to the next (step=1) or previous (step=-1) zoom level
+        """
+        if 0 <= self.level + step < len(TILE_LEVELS):
+            self.show_level(self.level + step, self.center_time())
+
+
+    def set_cursor(self, time_):
+        """
+        display the current time of media (in seconds)
+        """
+        if self.info:
+            self.cursorLine.setPos(time_ * self.pixels_by_second(), 0)
+
+
+    def eventFilter(self, receiver, event):
+        """
+        zoom with mouse wheel, send time by double-click and keypress event to main window
+        """
+        if receiver == self.view.viewport():
+            if event.type() == QEvent.Wheel:
+                self.zoom(-1 if (event.angleDelta().y() if QT_VERSION_STR[0] == "5" else event.delta()) > 0 else 1)
+                return True
+            if event.type() == QEvent.MouseButtonDblClick and self.info:
+                self.timeSelected.emit(self.view.mapToScene(event.pos()).x() / self.pixels_by_second())
+                return True
+            if event.type() == QEvent.Resize:
+                self.load_visible_tiles()
+            return False
+
+        if event.type() == QEvent.KeyPress:
+            self.sendEvent.emit(event)
+            return True
+        return False
+
+
+class SpectrogramService(QObject):
+    """
+    render the spectrogram chunks of media files in background in a pool of processes
+
+    the audio of media files is extracted first, then all chunks are rendered in order.
+    The chunk under the playhead and the next one (see prioritize) are rendered before the others.
+    Only a few tasks are submitted to the pool at the same time, so that a prioritized chunk does not wait
+    for the rendering of the whole media.
+    """
+
+    # emitted when the tiles of a media file are generated (media file, directory of tiles)
+    pyramidReady = pyqtSignal(str, str)
+
+    def __init__(self, tmp_dir, chunk_size, ffmpeg_bin, parent=None):
+        super(SpectrogramService, self).__init__(parent)
+
+        self.tmp_dir, self.chunk_size, self.ffmpeg_bin = tmp_dir, chunk_size, ffmpeg_bin
+        self.maxWorkers = max(1, multiprocessing.cpu_count() - 1)
+        self.executor = None
+
+        self.mediaFiles = []
+        self.wavFiles = {}   # media file -> wav file
+        self.todo = []   # chunks (media file, start in seconds) waiting to be rendered in order
+        self.urgent = []   # chunks to render first
+        self.running = {}   # future -> (media file, start) (start is None for the wav extraction)
+        self.pyramids = {}   # future -> media file
+        self.waitingPyramids = []   # media files waiting for the extraction of audio
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(100)
+        self.timer.timeout.connect(self.schedule)
+
+
+    def start(self, mediaFiles):
+        """
+        start the rendering of spectrogram chunks of media files
+        """
+
+        if self.executor is None:
+            self.executor = concurrent.futures.ProcessPoolExecutor(self.maxWorkers)
+
+        for mediaFile in mediaFiles:
+            if mediaFile not in self.mediaFiles and os.path.isfile(mediaFile):
+                self.mediaFiles.append(mediaFile)
+                self.running[self.executor.submit(extract_wav, mediaFile, self.tmp_dir, self.ffmpeg_bin)] = (mediaFile, None)
+
+        self.timer.start()
+
+
+    def build_pyramid(self, mediaFile):
+        """
+        generate the tiles of all zoom levels of media file (pyramidReady is emitted when done)
+        the tiles are generated after the extraction of audio
+        """
+
+        self.start([mediaFile])
+        if mediaFile not in self.pyramids.values() and mediaFile not in self.waitingPyramids:
+            self.waitingPyramids.append(mediaFile)
+        self.schedule()
+
+
+    def stop(self):
+        """
+        stop rendering (running tasks are not waited)
+        """
+        self.timer.stop()
+        for future in list(self.running) + list(self.pyramids):
+            future.cancel()
+        self.running, self.todo, self.urgent, self.pyramids, self.waitingPyramids = {}, [], [], {}, []
+        if self.executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+
+    def prioritize(self, mediaFile, chunk):
+        """
+        render the chunk chunk (index) of media file and the next one before the others
+        """
+        self.urgent = [(mediaFile, chunk * self.chunk_size), (mediaFile, (chunk + 1) * self.chunk_size)]
+        self.schedule()
+
+
+    def schedule(self):
+        """
+        process the finished tasks and submit the next chunks to the pool
+        """
+
+        for future in [f for f in self.running if f.done()]:
+            mediaFile, start = self.running.pop(future)
+            if future.cancelled() or future.exception() is not None:
+                logging.warning("spectrogram of {} not rendered: {}".format(mediaFile, None if future.cancelled() else future.exception()))
+                continue
+            if start is None:   # wav extracted
+                wav_file, duration = future.result()
+                if wav_file:
+                    self.wavFiles[mediaFile] = wav_file
+                    self.todo.extend([(mediaFile, i) for i in range(0, int(math.ceil(duration)) or 1, self.chunk_size)
+                                      if not os.path.isfile(chunk_file_name(wav_file, i, self.chunk_size))])
+
+        for mediaFile in list(self.waitingPyramids):
+            if mediaFile in self.wavFiles:
+                self.waitingPyramids.remove(mediaFile)
+                self.pyramids[self.executor.submit(build_pyramid, mediaFile, self.tmp_dir, self.ffmpeg_bin)] = mediaFile
+            elif mediaFile not in [x[0] for x in self.running.values()]:
+                # audio not extracted
+                self.waitingPyramids.remove(mediaFile)
+
+        for future in [f for f in self.pyramids if f.done()]:
+            mediaFile = self.pyramids.pop(future)
+            if future.cancelled() or future.exception() is not None or not future.result():
+                logging.warning("spectrogram tiles of {} not generated: {}".format(mediaFile, None if future.cancelled() else future.exception()))
+                continue
+            self.pyramidReady.emit(mediaFile, future.result())
+
+        while len(self.running) < self.maxWorkers + 1:
+
+            # urgent chunks first (if the audio of media is extracted)
+            candidates = [x for x in self.urgent if x in self.todo] + self.todo
+            if not candidates:
+                break
+
+            mediaFile, start = candidates[0]
+            self.todo.remove((mediaFile, start))
+            self.running[self.executor.submit(render_chunk, self.wavFiles[mediaFile], start, self.chunk_size)] = (mediaFile, start)
+
+        if not self.running and not self.todo and not self.pyramids and not self.waitingPyramids:
+            self.timer.stop()
@@ -146,6 +146,38 @@ class Ui_prefDialog(object):
         self.sbFFmpegCacheDirMaxSize.setObjectName(_fromUtf8("sbFFmpegCacheDirMaxSize"))
         self.horizontalLayout_4.addWidget(self.sbFFmpegCacheDirMaxSize)
         self.verticalLayout_3.addLayout(self.horizontalLayout_4)
+        self.horizontalLayout_5 = QtGui.QHBoxLayout()
+        self.horizontalLayout_5.setObjectName(_fromUtf8("horizontalLayout_5"))
+        self.lbFrameCacheSize = QtGui.QLabel(self.tab_2)
+        self.lbFrameCacheSize.setObjectName(_fromUtf8("lbFrameCacheSize"))
+        self.horizontalLayout_5.addWidget(self.lbFrameCacheSize)
+        self.sbFrameCacheSize = QtGui.QSpinBox(self.tab_2)
+        self.sbFrameCacheSize.setMinimum(16)
+        self.sbFrameCacheSize.setMaximum(100000)
+        self.sbFrameCacheSize.setSingleStep(64)
+        self.sbFrameCacheSize.setProperty("value", 256)
+        self.sbFrameCacheSize.setObjectName(_fromUtf8("sbFrameCacheSize"))
+        self.horizontalLayout_5.addWidget(self.sbFrameCacheSize)
+        self.verticalLayout_3.addLayout(self.horizontalLayout_5)
+        self.horizontalLayout_6 = QtGui.QHBoxLayout()
+        self.horizontalLayout_6.setObjectName(_fromUtf8("horizontalLayout_6"))
+        self.lbPrefetch = QtGui.QLabel(self.tab_2)
+        self.lbPrefetch.setObjectName(_fromUtf8("lbPrefetch"))
+        self.horizontalLayout_6.addWidget(self.lbPrefetch)
+        self.sbPrefetchForward = QtGui.QSpinBox(self.tab_2)
+        self.sbPrefetchForward.setMaximum(1000)
+        self.sbPrefetchForward.setProperty("value", 50)
+        self.sbPrefetchForward.setObjectName(_fromUtf8("sbPrefetchForward"))
+        self.horizontalLayout_6.addWidget(self.sbPrefetchForward)
+        self.sbPrefetchBackward = QtGui.QSpinBox(self.tab_2)
+        self.sbPrefetchBackward.setMaximum(1000)
+        self.sbPrefetchBackward.setProperty("value", 25)
+        self.sbPrefetchBackward.setObjectName(_fromUtf8("sbPrefetchBackward"))
+        self.horizontalLayout_6.addWidget(self.sbPrefetchBackward)
+        self.verticalLayout_3.addLayout(self.horizontalLayout_6)
+        self.cbFrameIndex = QtGui.QCheckBox(self.tab_2)
+        self.cbFrameIndex.setObjectName(_fromUtf8("cbFrameIndex"))
+        self.verticalLayout_3.addWidget(self.cbFrameIndex)
         spacerItem = QtGui.QSpacerItem(20, 40, QtGui.QSizePolicy.Minimum, QtGui.QSizePolicy.Expanding)
         self.verticalLayout_3.addItem(spacerItem)
         self.verticalLayout_4.addLayout(self.verticalLayout_3)
@@ -189,6 +221,9 @@ class Ui_prefDialog(object):
         self.lbFFmpegCacheDir.setText(_translate("prefDialog", "FFmpeg cache directory", None))
         self.pbBrowseFFmpegCacheDir.setText(_translate("prefDialog", "...", None))
         self.lbFFmpegCacheDirMaxSize.setText(_translate("prefDialog", "FFmpeg cache directory max size (Mb)", None))
+        self.lbFrameCacheSize.setText(_translate("prefDialog", "Frame-by-frame memory cache size (Mb)", None))
+        self.lbPrefetch.setText(_translate("prefDialog", "Frames decoded in advance in frame-by-frame mode (next / previous)", None))
+        self.cbFrameIndex.setText(_translate("prefDialog", "Use the exact timestamps of frames in frame-by-frame mode (index built once by media file)", None))
         self.tabWidget.setTabText(self.tabWidget.indexOf(self.tab_2), _translate("prefDialog", "FFmpeg framework", None))
         self.pbCancel.setText(_translate("prefDialog", "Cancel", None))
         self.pbOK.setText(_translate("prefDialog", "OK", None))
@@ -133,6 +133,38 @@ class Ui_prefDialog(object):
         self.sbFFmpegCacheDirMaxSize.setObjectName("sbFFmpegCacheDirMaxSize")
         self.horizontalLayout_4.addWidget(self.sbFFmpegCacheDirMaxSize)
         self.verticalLayout_3.addLayout(self.horizontalLayout_4)
+        self.horizontalLayout_5 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_5.setObjectName("horizontalLayout_5")
+        self.lbFrameCacheSize = QtWidgets.QLabel(self.tab_2)
+        self.lbFrameCacheSize.setObjectName("lbFrameCacheSize")
+        self.horizontalLayout_5.addWidget(self.lbFrameCacheSize)
+        self.sbFrameCacheSize = QtWidgets.QSpinBox(self.tab_2)
+        self.sbFrameCacheSize.setMinimum(16)
+        self.sbFrameCacheSize.setMaximum(100000)
+        self.sbFrameCacheSize.setSingleStep(64)
+        self.sbFrameCacheSize.setProperty("value", 256)
+        self.sbFrameCacheSize.setObjectName("sbFrameCacheSize")
+        self.horizontalLayout_5.addWidget(self.sbFrameCacheSize)
+        self.verticalLayout_3.addLayout(self.horizontalLayout_5)
+        self.horizontalLayout_6 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_6.setObjectName("horizontalLayout_6")
+        self.lbPrefetch = QtWidgets.QLabel(self.tab_2)
+        self.lbPrefetch.setObjectName("lbPrefetch")
+        self.horizontalLayout_6.addWidget(self.lbPrefetch)
+        self.sbPrefetchForward = QtWidgets.QSpinBox(self.tab_2)
+        self.sbPrefetchForward.setMaximum(1000)
+        self.sbPrefetchForward.setProperty("value", 50)
+        self.sbPrefetchForward.setObjectName("sbPrefetchForward")
+        self.horizontalLayout_6.addWidget(self.sbPrefetchForward)
+        self.sbPrefetchBackward = QtWidgets.QSpinBox(self.tab_2)
+        self.sbPrefetchBackward.setMaximum(1000)
+        self.sbPrefetchBackward.setProperty("value", 25)
+        self.sbPrefetchBackward.setObjectName("sbPrefetchBackward")
+        self.horizontalLayout_6.addWidget(self.sbPrefetchBackward)
+        self.verticalLayout_3.addLayout(self.horizontalLayout_6)
+        self.cbFrameIndex = QtWidgets.QCheckBox(self.tab_2)
+        self.cbFrameIndex.setObjectName("cbFrameIndex")
+        self.verticalLayout_3.addWidget(self.cbFrameIndex)
         spacerItem = QtWidgets.QSpacerItem(20, 40, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
         self.verticalLayout_3.addItem(spacerItem)
         self.verticalLayout_4.addLayout(self.verticalLayout_3)
@@ -177,6 +209,9 @@ class Ui_prefDialog(object):
         self.lbFFmpegCacheDir.setText(_translate("prefDialog", "FFmpeg cache directory"))
         self.pbBrowseFFmpegCacheDir.setText(_translate("prefDialog", "..."))
         self.lbFFmpegCacheDirMaxSize.setText(_translate("prefDialog", "FFmpeg cache directory max size (Mb)"))
+        self.lbFrameCacheSize.setText(_translate("prefDialog", "Frame-by-frame memory cache size (Mb)"))
+        self.lbPrefetch.setText(_translate("prefDialog", "Frames decoded in advance in frame-by-frame mode (next / previous)"))
+        self.cbFrameIndex.setText(_translate("prefDialog", "Use the exact timestamps of frames in frame-by-frame mode (index built once by media file)"))
         self.tabWidget.setTabText(self.tabWidget.indexOf(self.tab_2), _translate("prefDialog", "FFmpeg framework"))
         self.pbCancel.setText(_translate("prefDialog", "Cancel"))
         self.pbOK.setText(_translate("prefDialog", "OK"))
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+"""
+BORIS
+Behavioral Observation Research Interactive Software
+Copyright 2012-2016 Olivier Friard
+
+This file is part of BORIS.
+
+  BORIS is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 3 of the License, or
+  any later version.
+
+  BORIS is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not see <http://www.gnu.org/licenses/>.
+
+
+Projects stored in a directory with one file by observation (without Qt)
+
+project directory:
+  project.json: manifest with the project without observations and,
+                for each observation, the name of its file and the hash of its content
+  observations/: one JSON file by observation (with its events)
+
+The project is opened with the directory or with its manifest.
+Only the observations changed since they were loaded or saved are written:
+several coders can work on different observations of the same project directory
+(the saves are serialized by a lock file; the last save of a changed ethogram or subjects list wins)
+"""
+
+import os
+import time
+import json
+import hashlib
+import logging
+import contextlib
+
+from config import *
+
+MANIFEST = "project.json"
+OBSERVATIONS_DIR = "observations"
+LOCK_FILE = "project.lock"
+
+# time (in s) waiting for the lock of project directory
+LOCK_TIMEOUT = 30
+# age (in s) of the lock file of an interrupted save
+LOCK_STALE = 600
+
+
+def is_project_directory(path):
+    """
+    True if path is a project directory or the manifest of a project directory
+    """
+    directory = path if os.path.isdir(path) else os.path.dirname(path)
+    if not os.path.isdir(path) and os.path.basename(path) != MANIFEST:
+        return False
+    return os.path.isfile(os.path.join(directory, MANIFEST)) and os.path.isdir(os.path.join(directory, OBSERVATIONS_DIR))
+
+
+def project_directory(path):
+    """
+    returns the absolute path of project directory (path is the directory or its manifest)
+    """
+    path = os.path.abspath(path)
+    return os.path.dirname(path) if os.path.basename(path) == MANIFEST and not os.path.isdir(path) else path
+
+
+def observation_file_name(obsId):
+    """
+    returns the name of the file of observation (the observation id can contain any character)
+    """
+    return hashlib.sha1(obsId.encode("utf-8")).hexdigest() + ".json"
+
+
+def write_json(fileName, data, default):
+    """
+    write data in JSON file (in a temporary file that replaces the file when complete)
+    """
+    tmpFileName = fileName + ".tmp"
+    try:
+        with open(tmpFileName, "w") as f:
+            json.dump(data, f, indent=1, default=default)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmpFileName, fileName)
+    except:
+        if os.path.isfile(tmpFileName):
+            os.remove(tmpFileName)
+        raise
+
+
+def read_manifest(directory):
+    """
+    returns the manifest of project directory (None if not found)
+    """
+    fileName = os.path.join(directory, MANIFEST)
+    if not os.path.isfile(fileName):
+        return None
+    with open(fileName, "r") as f:
+        return json.load(f)
+
+
+def load(path):
+    """
+    returns the project stored in directory
+    """
+
+    directory = project_directory(path)
+    logging.debug("load project directory: {}".format(directory))
+
+    pj = read_manifest(directory)
+    files = pj[OBSERVATIONS]
+    pj[OBSERVATIONS] = {}
+    for obsId in files:
+        with open(os.path.join(directory, OBSERVATIONS_DIR, files[obsId]["file"]), "r") as f:
+            pj[OBSERVATIONS][obsId] = json.load(f)
+
+    return pj
+
+
+@contextlib.contextmanager
+def lock(directory):
+    """
+    lock the project directory during a save (lock file created exclusively)
+    a lock older than LOCK_STALE is removed (interrupted save)
+    """
+
+    fileName = os.path.join(directory, LOCK_FILE)
+    start = time.time()
+    while True:
+        try:
+            os.close(os.open(fileName, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(fileName) > LOCK_STALE:
+                    logging.warning("remove lock of project directory {}".format(directory))
+                    os.remove(fileName)
+                    continue
+            except OSError:
+                continue
+            if time.time() - start > LOCK_TIMEOUT:
+                raise Exception("The project directory {} is locked by another save".format(directory))
+            time.sleep(0.1)
+    try:
+        yield
+    finally:
+        if os.path.isfile(fileName):
+            os.remove(fileName)
+
+
+def save(pj, path, default, observation_hash, project_hash, savedHashes):
+    """
+    save project in directory
+
+    only the observations changed since they were loaded or saved (see project_functions.Observations) are written,
+    the others keep the version of the directory (possibly written or deleted by another coder).
+    The observations added in the directory by other coders are kept
+    and the files of observations deleted from the project are removed.
+    The project without observations is written only if changed (else the version of the directory is kept).
+    The manifest is written last, the directory is locked during the save.
+
+    observation_hash -- function returning the hash of an observation (and its saved hash, see project_functions.observation_hash)
+    project_hash -- function returning the hash of the project without observations
+    savedHashes -- dictionary directory -> dictionary observation id -> hash (updated)
+    """
+
+    directory = project_directory(path)
+    logging.debug("save project directory: {}".format(directory))
+
+    if os.path.isfile(directory):
+        raise Exception("{} is a file".format(directory))
+    os.makedirs(os.path.join(directory, OBSERVATIONS_DIR), exist_ok=True)
+
+    with lock(directory):
+
+        # project of directory (not merged if directory was not loaded or saved before)
+        merge = directory in savedHashes
+        known = savedHashes.setdefault(directory, {})
+        manifest = read_manifest(directory) if merge else None
+        existing = manifest[OBSERVATIONS] if manifest is not None else {}
+
+        files, written = {}, {}
+        for obsId in pj[OBSERVATIONS]:
+            # not changed: version of directory (not restored if deleted by another coder)
+            hash_ = observation_hash(pj[OBSERVATIONS][obsId], known.get(obsId))
+            if known.get(obsId) == hash_:
+                if obsId in existing:
+                    files[obsId] = existing[obsId]
+                continue
+            files[obsId] = {"file": observation_file_name(obsId), "hash": hash_}
+            write_json(os.path.join(directory, OBSERVATIONS_DIR, files[obsId]["file"]), pj[OBSERVATIONS][obsId], default)
+            written[obsId] = hash_
+
+        # observations added by other coders
+        for obsId in existing:
+            if obsId not in files and obsId not in known:
+                files[obsId] = existing[obsId]
+
+        projectHash = project_hash(pj)
+        if manifest is not None and known.get(None) == projectHash:
+            project = dict([(key, manifest[key]) for key in manifest if key != OBSERVATIONS])
+        else:
+            project = dict([(key, pj[key]) for key in pj if key != OBSERVATIONS])
+        write_json(os.path.join(directory, MANIFEST), dict(project, **{OBSERVATIONS: files}), default)
+
+        # files of deleted observations
+        for obsId in [obsId for obsId in known if obsId is not None and obsId not in pj[OBSERVATIONS]]:
+            if obsId not in files and obsId in existing:
+                fileName = os.path.join(directory, OBSERVATIONS_DIR, existing[obsId]["file"])
+                if os.path.isfile(fileName):
+                    os.remove(fileName)
+            del known[obsId]
+
+    # the hashes of observations not written stay those of the versions loaded (updated in place:
+    # the hashes of observations accessed during the save are recorded by the loaded project)
+    known.update(written)
+    known[None] = projectHash
+
+    logging.debug("observations written: {} of {}".format(len(written), len(pj[OBSERVATIONS])))
@@ -0,0 +1,649 @@
+#!/usr/bin/env python3
+
+"""
+BORIS
+Behavioral Observation Research Interactive Software
+Copyright 2012-2016 Olivier Friard
+
+This file is part of BORIS.
+
+  BORIS is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 3 of the License, or
+  any later version.
+
+  BORIS is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not see <http://www.gnu.org/licenses/>.
+
+
+Functions on project (without Qt)
+"""
+
+import os
+import copy
+import gzip
+import json
+import hashlib
+import logging
+from decimal import *
+
+from config import *
+from event_store import EventStore
+import project_sqlite
+import project_directory
+from project_sqlite import SqliteEvents
+
+# formats of project files
+JSON_FORMAT = "json"
+COMPACT_FORMAT = "compact"
+SQLITE_FORMAT = "sqlite"
+DIRECTORY_FORMAT = "directory"
+
+# first bytes of gzip files (compact project files)
+GZIP_MAGIC = b"\x1f\x8b"
+
+# compression level of compact project files
+COMPRESSION_LEVEL = 6
+
+
+# saved hash of an observation with events not accessed since it was loaded: followed by the hash of its metadata
+LOADED = "loaded "
+
+
+class Observation(dict):
+    """
+    observation of a loaded project (see Observations)
+
+    the events are converted at the first access to the EVENTS key:
+    the other keys (date, description, media files...) are read without converting the events
+    """
+
+    def __init__(self, observation, observations, obsId):
+        super().__init__(observation)
+        self.observations = observations
+        self.obsId = obsId
+
+
+    def __getitem__(self, key):
+        if key == EVENTS:
+            self.observations.decode(self.obsId)
+        return dict.__getitem__(self, key)
+
+
+    def __setitem__(self, key, value):
+        # the events replaced are converted before (hash of observation as loaded)
+        if key == EVENTS:
+            self.observations.decode(self.obsId)
+        dict.__setitem__(self, key, value)
+
+
+    def __reduce__(self):
+        # copied or pickled as a plain dictionary with converted events
+        return dict, (dict(self.items()),)
+
+
+    def copy(self):
+        return dict(self.items())
+
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+
+    def values(self):
+        return [self[key] for key in self]
+
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+
+class Observations(dict):
+    """
+    observations of a loaded project
+
+    the events of an observation are kept as loaded until the first access to its events (see Observation),
+    they are then converted to lists with decimal times:
+    the project is usable without converting all the events.
+    The events of an observation not yet accessed are stored in a compact EventStore when an analysis needs them
+    (see store) and are saved without conversion (see raw)
+
+    the events of SQLite project files are read from the database at the first access to the events (SqliteEvents)
+
+    savedHashes records the observations as loaded from or saved in project directories and SQLite project files
+    (only the observations changed are written, see save_project):
+    path of project -> observation id -> hash of observation (see observation_hash),
+                       LOADED and the hash of its metadata for an observation with events not accessed since it was loaded
+                       (the hash of the events is computed at their first access)
+    the key None is the hash of the project without observations (project directories)
+    """
+
+    def __init__(self, observations):
+        super().__init__()
+        self.undecoded = set(observations)   # observations with events not converted
+        self.savedHashes = {}
+
+        for obsId in observations:
+            observation = observations[obsId]
+            # events saved column-wise in compact project files
+            if isinstance(observation[EVENTS], dict):
+                observation[EVENTS] = EventStore.from_columns(observation[EVENTS])
+            dict.__setitem__(self, obsId, Observation(observation, self, obsId))
+
+
+    def store(self, obsId):
+        """
+        returns the events of observation not accessed without converting them to lists with decimal times:
+        EventStore (kept instead of the loaded events) if possible else the list of loaded events
+        """
+        observation = dict.__getitem__(self, obsId)
+        events = dict.__getitem__(observation, EVENTS)
+        if isinstance(events, list):
+            store = EventStore.from_events(events)
+            if store is not None:
+                dict.__setitem__(observation, EVENTS, store)
+        return dict.__getitem__(observation, EVENTS)
+
+
+    def loaded(self, obsId):
+        """
+        returns the events of observation not accessed as loaded (lists with float times, EventStore or SqliteEvents)
+        """
+        return dict.__getitem__(dict.__getitem__(self, obsId), EVENTS)
+
+
+    def decode(self, obsId):
+        """
+        convert the events of observation to lists with decimal times
+        """
+        if obsId not in self.undecoded:
+            return
+
+        observation = dict.__getitem__(self, obsId)
+        if isinstance(dict.__getitem__(observation, EVENTS), SqliteEvents):
+            dict.__setitem__(observation, EVENTS, dict.__getitem__(observation, EVENTS).load())
+        self.undecoded.discard(obsId)
+
+        # hash of observation as loaded (before the changes of its events), "" if its metadata were changed
+        for hashes in self.savedHashes.values():
+            if str(hashes.get(obsId)).startswith(LOADED):
+                hashes[obsId] = observation_hash(observation) if hashes[obsId] == loaded_hash(observation) else ""
+
+        events = dict.__getitem__(observation, EVENTS)
+        if isinstance(events, EventStore):
+            dict.__setitem__(observation, EVENTS, events.to_events())
+        else:
+            for event in events:
+                event[EVENT_TIME_FIELD_IDX] = Decimal(str(event[EVENT_TIME_FIELD_IDX]))
+
+
+    def raw(self):
+        """
+        returns the observations without converting their events (copies of the observations dictionaries)
+        (the events of observations not accessed are lists with float times, EventStore or SqliteEvents)
+        """
+        return dict([(obsId, dict(dict.items(observation))) for obsId, observation in dict.items(self)])
+
+
+    def __setitem__(self, obsId, observation):
+        # observation of the project (renamed)
+        if isinstance(observation, Observation):
+            observation.observations.decode(observation.obsId)
+        self.undecoded.discard(obsId)
+        # the observation replaced is saved
+        for hashes in self.savedHashes.values():
+            if obsId in hashes:
+                hashes[obsId] = ""
+        dict.__setitem__(self, obsId, observation)
+
+
+    def __delitem__(self, obsId):
+        self.undecoded.discard(obsId)
+        dict.__delitem__(self, obsId)
+
+
+    def __reduce__(self):
+        # copied or pickled as a plain dictionary of observations with converted events
+        return dict, (dict(self.items()),)
+
+
+    def pop(self, obsId, *default):
+        if obsId in self:
+            self.decode(obsId)
+            observation = self[obsId]
+            del self[obsId]
+            return observation
+        return dict.pop(self, obsId, *default)
+
+
+def project_file_format(projectFileName):
+    """
+    returns the format of project file: JSON_FORMAT, COMPACT_FORMAT (compressed JSON), SQLITE_FORMAT
+    or DIRECTORY_FORMAT (project directory or its manifest)
+    returns None if project file does not exist
+    """
+    if project_directory.is_project_directory(projectFileName):
+        return DIRECTORY_FORMAT
+    try:
+        with open(projectFileName, "rb") as f:
+            header = f.read(len(project_sqlite.SQLITE_MAGIC))
+    except OSError:
+        return None
+
+    if header.startswith(GZIP_MAGIC):
+        return COMPACT_FORMAT
+    if header == project_sqlite.SQLITE_MAGIC:
+        return SQLITE_FORMAT
+    return JSON_FORMAT
+
+
+def load_project(projectFileName):
+    """
+    load project from JSON file, compact project file, SQLite project file or project directory (detected automatically)
+    missing keys of old project files are added
+
+    the times of events are converted to decimal when the observation is accessed (see Observations)
+
+    return project and True if project was changed
+    raise an exception if file is not a valid JSON file
+    """
+
+    logging.debug("load project: {0}".format(projectFileName))
+
+    fileFormat = project_file_format(projectFileName)
+    if fileFormat == SQLITE_FORMAT:
+        pj = project_sqlite.load(projectFileName)
+    elif fileFormat == DIRECTORY_FORMAT:
+        pj = project_directory.load(projectFileName)
+    elif fileFormat == COMPACT_FORMAT:
+        with gzip.open(projectFileName, "rt", encoding="utf-8") as f:
+            pj = json.load(f)
+    else:
+        with open(projectFileName, "r") as f:
+            pj = json.load(f)
+
+    projectChanged = False
+
+    # transform time offset to decimal
+    for obs in pj[OBSERVATIONS]:
+        pj[OBSERVATIONS][obs]["time offset"] = Decimal(str(pj[OBSERVATIONS][obs]["time offset"]))
+
+    # add coding_map key to old project files
+    if not "coding_map" in pj:
+        pj["coding_map"] = {}
+        projectChanged = True
+
+    # add subject description
+    if "project_format_version" in pj:
+        for idx in pj[SUBJECTS]:
+            if not "description" in pj[SUBJECTS][idx]:
+                pj[SUBJECTS][idx]["description"] = ""
+                projectChanged = True
+
+    for obs in pj[OBSERVATIONS]:
+        if not "time offset second player" in pj[OBSERVATIONS][obs]:
+            pj[OBSERVATIONS][obs]["time offset second player"] = Decimal("0.0")
+            projectChanged = True
+
+    pj[OBSERVATIONS] = Observations(pj[OBSERVATIONS])
+
+    # observations as loaded (only the observations changed are saved, see Observations)
+    if fileFormat in [DIRECTORY_FORMAT, SQLITE_FORMAT]:
+        hashes = dict([(obsId, loaded_hash(pj[OBSERVATIONS][obsId])) for obsId in pj[OBSERVATIONS]])
+        if fileFormat == DIRECTORY_FORMAT:
+            hashes[None] = project_hash(pj)
+            pj[OBSERVATIONS].savedHashes[project_directory.project_directory(projectFileName)] = hashes
+        else:
+            pj[OBSERVATIONS].savedHashes[os.path.abspath(projectFileName)] = hashes
+
+    return pj, projectChanged
+
+
+def decimal_default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, SqliteEvents):
+        # list of events with float times if they can not be stored in EventStore
+        obj = obj.load()
+        if isinstance(obj, list):
+            return obj
+    if isinstance(obj, EventStore):
+        return obj.to_json()
+    raise TypeError
+
+
+def observation_events(pj, obsId, behaviors=None):
+    """
+    returns the events of observation for analysis without converting them to lists:
+    EventStore if possible else the list of events
+
+    behaviors -- the events of observations not loaded from a SQLite project file are restricted to these behaviors
+                 (the other events are not filtered)
+    """
+
+    if isinstance(pj[OBSERVATIONS], Observations) and obsId in pj[OBSERVATIONS].undecoded:
+        events = pj[OBSERVATIONS].store(obsId)
+        if isinstance(events, SqliteEvents):
+            return events.load(behaviors=behaviors)
+        if isinstance(events, EventStore):
+            return events
+
+    events = pj[OBSERVATIONS][obsId][EVENTS]
+    store = EventStore.from_events(events)
+    return events if store is None else store
+
+
+def metadata_hash(observation):
+    """
+    returns a hash of the metadata of observation (without the events)
+    """
+    return hashlib.sha1(json.dumps(dict([(key, observation[key]) for key in observation if key != EVENTS]),
+                                   sort_keys=True, default=decimal_default).encode("utf-8")).hexdigest()
+
+
+def loaded_hash(observation):
+    """
+    returns the saved hash of observation with events not accessed since it was loaded (see Observations)
+    """
+    return LOADED + metadata_hash(observation)
+
+
+def last_event_time(pj, obsId):
+    """
+    returns the time of the last event of observation (0 if observation has no events)
+    the events of observations not accessed are not converted (nor read from database)
+    """
+
+    if isinstance(pj[OBSERVATIONS], Observations) and obsId in pj[OBSERVATIONS].undecoded:
+        events = pj[OBSERVATIONS].loaded(obsId)
+        if isinstance(events, SqliteEvents):
+            time_ = events.last_time()
+        elif isinstance(events, EventStore):
+            time_ = max(events.times) / 1000 if len(events) else None
+        else:
+            time_ = max([event[EVENT_TIME_FIELD_IDX] for event in events]) if events else None
+        return Decimal(str(time_)) if time_ is not None else Decimal("0.0")
+
+    if pj[OBSERVATIONS][obsId][EVENTS]:
+        return max(pj[OBSERVATIONS][obsId][EVENTS])[EVENT_TIME_FIELD_IDX]
+    return Decimal("0.0")
+
+
+def observation_hash(observation, savedHash=None):
+    """
+    returns a hash of the content of observation (metadata and events)
+    the observations with the same hash are not written again in project directories and SQLite project files
+
+    savedHash -- hash of observation saved: returned without reading the events
+                 if the events were not accessed since the observation was loaded and its metadata were not changed
+    """
+
+    if savedHash is not None and savedHash.startswith(LOADED) and savedHash == loaded_hash(observation):
+        return savedHash
+
+    h = hashlib.sha1(metadata_hash(observation).encode("utf-8"))
+
+    events = observation[EVENTS]
+    if isinstance(events, SqliteEvents):
+        events = events.load()
+    store = events if isinstance(events, EventStore) else EventStore.from_events(events)
+    h.update(store.digest().encode("utf-8") if store is not None else json.dumps(events, default=decimal_default).encode("utf-8"))
+
+    return h.hexdigest()
+
+
+def project_hash(pj):
+    """
+    returns a hash of the project without observations
+    """
+    return hashlib.sha1(json.dumps(dict([(key, pj[key]) for key in pj if key != OBSERVATIONS]),
+                                   sort_keys=True, default=decimal_default).encode("utf-8")).hexdigest()
+
+
+def project_metadata_hash(pj):
+    """
+    returns a hash of the project without the events of observations
+    (the changes of events are recorded in the project journal, not the other changes, see project_journal)
+    """
+    h = hashlib.sha1(project_hash(pj).encode("utf-8"))
+    for obsId in sorted(pj[OBSERVATIONS]):
+        h.update(json.dumps([obsId, metadata_hash(pj[OBSERVATIONS][obsId])]).encode("utf-8"))
+    return h.hexdigest()
+
+
+def saved_hashes(pj):
+    """
+    returns the hashes of observations saved of project (see Observations)
+    None if project was not loaded
+    """
+    return pj[OBSERVATIONS].savedHashes if isinstance(pj[OBSERVATIONS], Observations) else None
+
+
+def project_snapshot(pj):
+    """
+    returns a copy of project that can be saved while the project is modified
+
+    the events lists are copied but not the events (an edited event is replaced by a new list, see EventsModel),
+    the other data are deeply copied. The events of observations not accessed are not converted (nor read from database)
+    """
+
+    snapshot = copy.deepcopy(dict([(key, pj[key]) for key in pj if key != OBSERVATIONS]))
+
+    observations = pj[OBSERVATIONS].raw() if isinstance(pj[OBSERVATIONS], Observations) else pj[OBSERVATIONS]
+    snapshot[OBSERVATIONS] = {}
+    for obsId in observations:
+        snapshot[OBSERVATIONS][obsId] = copy.deepcopy(dict([(key, observations[obsId][key]) for key in observations[obsId] if key != EVENTS]))
+        events = observations[obsId][EVENTS]
+        snapshot[OBSERVATIONS][obsId][EVENTS] = events if isinstance(events, (EventStore, SqliteEvents)) else list(events)
+
+    return snapshot
+
+
+def columns_default(obj):
+    """
+    events saved column-wise in compact project files
+    """
+    if isinstance(obj, SqliteEvents):
+        obj = obj.load()
+        if isinstance(obj, list):
+            return obj
+    if isinstance(obj, EventStore):
+        return obj.to_columns()
+    return decimal_default(obj)
+
+
+def compact_observations(observations):
+    """
+    returns the observations with events in EventStore when possible (saved column-wise)
+    """
+    compact = {}
+    for obsId in observations:
+        events = observations[obsId][EVENTS]
+        if isinstance(events, SqliteEvents):
+            events = events.load()
+        store = events if isinstance(events, EventStore) else EventStore.from_events(events)
+        compact[obsId] = observations[obsId] if store is None else dict(observations[obsId], **{EVENTS: store})
+    return compact
+
+
+def save_project(pj, projectFileName, fileFormat=None, savedHashes=None):
+    """
+    save project to JSON file, compact project file, SQLite project file or project directory
+
+    compact project file: JSON without indentation with events saved column-wise, compressed with gzip
+    SQLite project file: see project_sqlite
+    project directory: see project_directory
+    fileFormat -- JSON_FORMAT, COMPACT_FORMAT, SQLITE_FORMAT, DIRECTORY_FORMAT
+                  or None: format of existing project file (JSON for new file)
+    savedHashes -- hashes of observations saved (see Observations), updated
+                   None: hashes of the loaded project (all observations are written if project was not loaded)
+
+    the project is written in a temporary file that replaces the project file when complete:
+    the project file is never left partially written.
+    An existing SQLite project file is updated in one transaction and only the observations changed since they were
+    loaded or saved are written in a project directory or in the events of a SQLite project file (see observation_hash)
+
+    raise an exception if project can not be saved
+    """
+
+    logging.debug("save project json {0}:".format(projectFileName))
+
+    existingFormat = project_file_format(projectFileName)
+    if fileFormat is None:
+        fileFormat = existingFormat or JSON_FORMAT
+
+    pj["project_format_version"] = project_format_version
+
+    if savedHashes is None:
+        savedHashes = saved_hashes(pj)
+    if savedHashes is None:
+        savedHashes = {}
+
+    # the events of observations not accessed are not converted
+    if isinstance(pj[OBSERVATIONS], Observations):
+        pj = dict(pj, **{OBSERVATIONS: pj[OBSERVATIONS].raw()})
+
+    if fileFormat == DIRECTORY_FORMAT:
+        project_directory.save(pj, projectFileName, decimal_default, observation_hash, project_hash, savedHashes)
+        return
+
+    if fileFormat == SQLITE_FORMAT:
+        update = existingFormat == SQLITE_FORMAT
+        path = os.path.abspath(projectFileName)
+        if not update:
+            savedHashes[path] = {}
+        known = savedHashes.setdefault(path, {})
+
+        hashes, unchanged = {}, set()
+        for obsId in pj[OBSERVATIONS]:
+            # events not loaded (the metadata are compared in database)
+            if isinstance(pj[OBSERVATIONS][obsId][EVENTS], SqliteEvents):
+                continue
+            hashes[obsId] = observation_hash(pj[OBSERVATIONS][obsId], known.get(obsId))
+            if known.get(obsId) == hashes[obsId]:
+                unchanged.add(obsId)
+
+        project_sqlite.save(pj, projectFileName, decimal_default, update=update, unchanged=unchanged)
+        known.update(hashes)
+        for obsId in [obsId for obsId in known if obsId not in pj[OBSERVATIONS]]:
+            del known[obsId]
+        return
+
+    tmpFileName = projectFileName + ".tmp"
+    try:
+        if fileFormat == COMPACT_FORMAT:
+            pj = dict(pj, **{OBSERVATIONS: compact_observations(pj[OBSERVATIONS])})
+            with open(tmpFileName, "wb") as f:
+                with gzip.GzipFile(fileobj=f, mode="wb", compresslevel=COMPRESSION_LEVEL) as gz:
+                    gz.write(json.dumps(pj, separators=(",", ":"), default=columns_default).encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+        else:
+            with open(tmpFileName, "w") as f:
+                json.dump(pj, f, indent=1, default=decimal_default)
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmpFileName, projectFileName)
+    except:
+        if os.path.isfile(tmpFileName):
+            os.remove(tmpFileName)
+        raise
+
+
+def event_type(pj, code):
+    """
+    returns type of event for code
+    """
+
+    for idx in pj[ETHOGRAM]:
+        if pj[ETHOGRAM][idx]["code"] == code:
+            return pj[ETHOGRAM][idx][TYPE]
+    return None
+
+
+def state_behaviors_codes(pj):
+    """
+    returns the list of codes of state behaviors
+    """
+    return [pj[ETHOGRAM][x]["code"] for x in pj[ETHOGRAM] if STATE in pj[ETHOGRAM][x][TYPE].upper()]
+
+
+def observed_subjects_behaviors(pj, obsId):
+    """
+    returns the set of (subject, behavior) observed in observation
+    the events of observations not accessed are not converted (they are kept in EventStore, see Observations.store)
+    """
+
+    if isinstance(pj[OBSERVATIONS], Observations) and obsId in pj[OBSERVATIONS].undecoded:
+        if isinstance(pj[OBSERVATIONS].loaded(obsId), SqliteEvents):
+            return pj[OBSERVATIONS].loaded(obsId).subjects_behaviors()
+        events = pj[OBSERVATIONS].store(obsId)
+        if isinstance(events, EventStore):
+            return set([(events.strings[subject], events.strings[behavior])
+                        for subject, behavior in set(zip(events.codes[EVENT_SUBJECT_FIELD_IDX], events.codes[EVENT_BEHAVIOR_FIELD_IDX]))])
+    else:
+        events = pj[OBSERVATIONS][obsId][EVENTS]
+
+    return set([(event[EVENT_SUBJECT_FIELD_IDX], event[EVENT_BEHAVIOR_FIELD_IDX]) for event in events])
+
+
+def extract_observed_subjects(pj, selectedObservations):
+    """
+    extract unique subjects from selected observations
+    """
+    return list(set([subject for obsId in selectedObservations for subject, _ in observed_subjects_behaviors(pj, obsId)]))
+
+
+def extract_observed_behaviors(pj, selectedObservations, selectedSubjects):
+    """
+    extract unique behaviors of selected subjects from selected observations
+    """
+    return list(set([behavior for obsId in selectedObservations for subject, behavior in observed_subjects_behaviors(pj, obsId)
+                     if subject in selectedSubjects
+                     or (not subject and NO_FOCAL_SUBJECT in selectedSubjects)]))
+
+
+def default_selection(pj, selectedObservations):
+    """
+    returns the subjects and the behaviors observed in the selected observations
+    in the order used by the parameters panel
+    """
+
+    observedSubjects = extract_observed_subjects(pj, selectedObservations)
+    selectedSubjects = [NO_FOCAL_SUBJECT] if "" in observedSubjects else []
+    selectedSubjects.extend([x for x in sorted([pj[SUBJECTS][idx]["name"] for idx in pj[SUBJECTS]]) if x in observedSubjects])
+
+    observedBehaviors = extract_observed_behaviors(pj, selectedObservations, selectedSubjects)
+    selectedBehaviors = [x for x in sorted([pj[ETHOGRAM][idx]["code"] for idx in pj[ETHOGRAM]]) if x in observedBehaviors]
+
+    return selectedSubjects, selectedBehaviors
+
+
+def observation_length(pj, obsId):
+    """
+    total media length of observation (from media informations) or time of last event for live observation
+    return 0 if not available
+
+    return length in s
+    """
+
+    if pj[OBSERVATIONS][obsId][TYPE] == MEDIA:
+        try:
+            return sum([Decimal(str(pj[OBSERVATIONS][obsId]["media_info"]["length"][mediaFile])) for mediaFile in pj[OBSERVATIONS][obsId][FILE][PLAYER1]])
+        except:
+            return Decimal("0.0")
+
+    return last_event_time(pj, obsId)
+
+
+def observation_project(pj, obsId):
+    """
+    returns a project with only the ethogram, the subjects and the observation obsId
+    (sent to the analysis processes in place of the whole project)
+    """
+    return {ETHOGRAM: pj[ETHOGRAM], SUBJECTS: pj[SUBJECTS], OBSERVATIONS: {obsId: pj[OBSERVATIONS][obsId]}}
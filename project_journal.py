@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+
+"""
+BORIS
+Behavioral Observation Research Interactive Software
+Copyright 2012-2016 Olivier Friard
+
+This file is part of BORIS.
+
+  BORIS is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 3 of the License, or
+  any later version.
+
+  BORIS is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not see <http://www.gnu.org/licenses/>.
+
+
+Append-only journal of the changes of events since the last save of the project (without Qt)
+"""
+
+import os
+import json
+import bisect
+import logging
+from decimal import *
+
+from config import *
+from project_functions import decimal_default
+
+JOURNAL_EXTENSION = ".journal"
+
+
+def journal_file_name(projectFileName):
+    """
+    returns the path of the journal of project file
+    """
+    return projectFileName + JOURNAL_EXTENSION
+
+
+def decimal_event(event):
+    """
+    returns event read from journal with decimal time
+    """
+    return [Decimal(str(event[EVENT_TIME_FIELD_IDX]))] + event[EVENT_TIME_FIELD_IDX + 1:]
+
+
+def apply(pj, record):
+    """
+    apply a record of journal to project
+    returns False if the record can not be applied
+    """
+
+    obsId = record["obs"]
+
+    if record["op"] == "observation":
+        if obsId in pj[OBSERVATIONS]:
+            pj[OBSERVATIONS][obsId].update(record["observation"])
+        else:
+            pj[OBSERVATIONS][obsId] = dict(record["observation"], **{EVENTS: []})
+        for key in ["time offset", "time offset second player"]:
+            if key in record["observation"]:
+                pj[OBSERVATIONS][obsId][key] = Decimal(str(record["observation"][key]))
+        return True
+
+    if obsId not in pj[OBSERVATIONS]:
+        return False
+    events = pj[OBSERVATIONS][obsId][EVENTS]
+
+    if record["op"] == "insert":
+        bisect.insort_right(events, decimal_event(record["event"]))
+        return True
+
+    if record["op"] == "clear":
+        pj[OBSERVATIONS][obsId][EVENTS] = []
+        return True
+
+    # delete and replace: the event is searched by value
+    try:
+        row = events.index(decimal_event(record["event"]))
+    except ValueError:
+        return False
+
+    if record["op"] == "delete":
+        del events[row]
+    if record["op"] == "replace":
+        # at the sorted position of the new event (see EventsModel.replace_event)
+        del events[row]
+        bisect.insort_right(events, decimal_event(record["new"]))
+    return True
+
+
+def replay(pj, projectFileName):
+    """
+    apply the changes recorded in the journal of project file
+    an incomplete record (interrupted write) is ignored
+
+    returns the number of changes applied
+    """
+
+    fileName = journal_file_name(projectFileName)
+    if not os.path.isfile(fileName):
+        return 0
+
+    logging.info("replay journal {}".format(fileName))
+
+    count = 0
+    with open(fileName, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logging.warning("incomplete record in journal {}".format(fileName))
+                continue
+            if apply(pj, record):
+                count += 1
+            else:
+                logging.warning("journal record can not be applied: {}".format(line.strip()))
+
+    return count
+
+
+class ProjectJournal():
+    """
+    journal of the changes of events of the project (sidecar file of the project file)
+
+    each change is appended as a JSON line and written to disk immediately (fsync),
+    so that the changes are not lost if BORIS is interrupted before the project is saved.
+    The journal is replayed when the project is opened and removed when the project is saved.
+
+    The journal is inactive (the changes are not recorded) if the project has no file name
+    """
+
+    def __init__(self):
+        self.fileName = None
+        self.file = None
+        self.pj = None
+        self.observations = set()   # observations with metadata recorded
+        self.base = 0   # position of the start of journal file (see position)
+
+
+    def start(self, projectFileName, pj):
+        """
+        record the changes of project pj in the journal of project file (appended to existing journal)
+        """
+        self.stop()
+        if projectFileName:
+            self.fileName = journal_file_name(projectFileName)
+            self.pj = pj
+
+
+    def stop(self):
+        """
+        stop recording (the journal is kept)
+        """
+        if self.file:
+            self.file.close()
+        self.fileName, self.file, self.pj = None, None, None
+        self.observations = set()
+        self.base = 0
+
+
+    def discard(self):
+        """
+        remove the journal (the project was saved or the changes were discarded) and stop recording
+        """
+        fileName = self.fileName
+        self.stop()
+        if fileName and os.path.isfile(fileName):
+            os.remove(fileName)
+
+
+    def position(self):
+        """
+        returns the position of the end of journal
+        the positions are not changed by the removal of the records saved in the project file (see saved)
+        """
+        if self.file:
+            self.file.flush()
+        if self.fileName and os.path.isfile(self.fileName):
+            return self.base + os.path.getsize(self.fileName)
+        return self.base
+
+
+    def saved(self, projectFileName, pj, position=None):
+        """
+        the project pj was saved in project file with the changes recorded before position (all changes if None):
+        remove these records and record the next changes in the journal of project file
+        """
+
+        # records after the snapshot of the saved project
+        tail = b""
+        if position is not None and self.fileName and os.path.isfile(self.fileName):
+            if self.file:
+                self.file.flush()
+            with open(self.fileName, "rb") as f:
+                f.seek(max(0, position - self.base))
+                tail = f.read()
+
+        self.discard()
+        fileName = journal_file_name(projectFileName)
+        if tail:
+            with open(fileName + ".tmp", "wb") as f:
+                f.write(tail)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(fileName + ".tmp", fileName)
+        elif os.path.isfile(fileName):
+            os.remove(fileName)
+
+        self.start(projectFileName, pj)
+        self.base = position if position is not None else 0
+
+
+    def ends_with_newline(self):
+        with open(self.fileName, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+
+    def write(self, record):
+        """
+        append record to journal and flush it to disk
+        """
+        if not self.fileName:
+            return
+        try:
+            if not self.file:
+                self.file = open(self.fileName, "a")
+                # end the incomplete last record of an interrupted session
+                if self.file.tell() and not self.ends_with_newline():
+                    self.file.write("\n")
+            self.file.write(json.dumps(record, default=decimal_default) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        except OSError:
+            logging.critical("the journal {} can not be written".format(self.fileName))
+
+
+    def record(self, obsId, record):
+        """
+        append record of change of observation
+        the metadata of observation are recorded before its first change (needed if observation is new)
+        """
+        if not self.fileName:
+            return
+        if obsId not in self.observations:
+            self.observations.add(obsId)
+            self.write({"op": "observation", "obs": obsId,
+                        "observation": dict([(key, value) for key, value in self.pj[OBSERVATIONS][obsId].items() if key != EVENTS])})
+        record["obs"] = obsId
+        self.write(record)
+
+
+    def insert(self, obsId, event):
+        self.record(obsId, {"op": "insert", "event": event})
+
+
+    def delete(self, obsId, event):
+        self.record(obsId, {"op": "delete", "event": event})
+
+
+    def replace(self, obsId, event, newEvent):
+        self.record(obsId, {"op": "replace", "event": event, "new": newEvent})
+
+
+    def clear(self, obsId):
+        self.record(obsId, {"op": "clear"})
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+"""
+BORIS
+Behavioral Observation Research Interactive Software
+Copyright 2012-2016 Olivier Friard
+
+This file is part of BORIS.
+
+  BORIS is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 3 of the License, or
+  any later version.
+
+  BORIS is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not see <http://www.gnu.org/licenses/>.
+
+
+Saving of project in background
+"""
+
+try:
+    from PyQt5.QtCore import *
+except:
+    from PyQt4.QtCore import *
+
+import logging
+import concurrent.futures
+
+import project_functions
+
+
+def save(snapshot, projectFileName, savedHashes=None):
+    """
+    save snapshot of project
+    savedHashes -- hashes of observations saved of project (see project_functions.Observations)
+    returns error message or "" if saved
+    """
+    try:
+        project_functions.save_project(snapshot, projectFileName, savedHashes=savedHashes)
+        return ""
+    except Exception as e:
+        logging.critical("The project file can not be saved: {}".format(e))
+        return str(e) if str(e) else type(e).__name__
+
+
+class ProjectSaver(QObject):
+    """
+    save the project in a background thread
+
+    the project is copied when the save is requested (see project_functions.project_snapshot),
+    so that the coding can continue during the save.
+    A save requested while a save is running waits for its end and replaces the save waiting before
+    (only the last state of project is saved)
+    """
+
+    # emitted at the end of a save (project file name, error message or "" if saved, mark of save request)
+    saved = pyqtSignal(str, str, object)
+
+    def __init__(self, parent=None):
+        super(ProjectSaver, self).__init__(parent)
+
+        self.executor = concurrent.futures.ThreadPoolExecutor(1)
+        self.running = None   # (future, project file name, mark)
+        self.waiting = None   # (snapshot, project file name, mark, hashes of observations saved)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(100)
+        self.timer.timeout.connect(self.schedule)
+
+
+    def save(self, pj, projectFileName, mark=None):
+        """
+        request the save of project in project file
+        mark -- returned with the saved signal
+        """
+        self.waiting = (project_functions.project_snapshot(pj), projectFileName, mark, project_functions.saved_hashes(pj))
+        self.schedule()
+        self.timer.start()
+
+
+    def busy(self):
+        """
+        True if a save is running or waiting
+        """
+        return self.running is not None or self.waiting is not None
+
+
+    def schedule(self):
+        """
+        check the end of running save and start the waiting one
+        """
+
+        if self.running:
+            future, projectFileName, mark = self.running
+            if not future.done():
+                return
+            self.running = None
+            self.saved.emit(projectFileName, future.result(), mark)
+
+        if self.waiting:
+            snapshot, projectFileName, mark, savedHashes = self.waiting
+            self.waiting = None
+            self.running = (self.executor.submit(save, snapshot, projectFileName, savedHashes), projectFileName, mark)
+        else:
+            self.timer.stop()
+
+
+    def wait(self):
+        """
+        wait for the end of running and waiting saves
+        """
+        while self.busy():
+            if self.running:
+                self.running[0].result()
+            self.schedule()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+
+"""
+BORIS
+Behavioral Observation Research Interactive Software
+Copyright 2012-2016 Olivier Friard
+
+This file is part of BORIS.
+
+  BORIS is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 3 of the License, or
+  any later version.
+
+  BORIS is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not see <http://www.gnu.org/licenses/>.
+
+
+Project files stored in a SQLite database (without Qt)
+
+tables:
+  project (key, value): project informations (values in JSON)
+  ethogram (idx, value), subjects (idx, value), coding_maps (name, value): values in JSON
+  observations (observation, value): observations without events (values in JSON)
+  events (observation, time, subject, code, modifier, comment): events of observations
+          (read in the order of the sorted events lists: time, subject, code, modifier, comment)
+
+an existing database is updated with single-row statements: only the rows changed are inserted, replaced or deleted
+"""
+
+import os
+import json
+import sqlite3
+import logging
+
+from config import *
+from event_store import EventStore
+
+# first bytes of SQLite database files
+SQLITE_MAGIC = b"SQLite format 3\x00"
+
+# time (in s) waiting for a database locked by a save
+TIMEOUT = 30
+
+SCHEMA = ["CREATE TABLE project (key TEXT PRIMARY KEY, value TEXT)",
+          "CREATE TABLE ethogram (idx TEXT PRIMARY KEY, value TEXT)",
+          "CREATE TABLE subjects (idx TEXT PRIMARY KEY, value TEXT)",
+          "CREATE TABLE coding_maps (name TEXT PRIMARY KEY, value TEXT)",
+          "CREATE TABLE observations (observation TEXT PRIMARY KEY, value TEXT)",
+          "CREATE TABLE events (observation TEXT, time REAL, subject TEXT, code TEXT, modifier TEXT, comment TEXT)",
+          "CREATE INDEX events_idx ON events (observation, code, subject)"]
+
+
+def connect(fileName):
+    """
+    returns connection to database
+    the write-ahead log allows to read the events while a save is running
+    """
+    db = sqlite3.connect(fileName, timeout=TIMEOUT)
+    db.execute("PRAGMA journal_mode=WAL")
+    return db
+
+
+class SqliteEvents():
+    """
+    events of an observation not loaded from the database
+    (only the database file name and the observation id are kept, the object can be sent to other processes)
+    """
+
+    def __init__(self, fileName, obsId):
+        self.fileName = os.path.abspath(fileName)
+        self.obsId = obsId
+
+
+    def load(self, subjects=None, behaviors=None):
+        """
+        returns the events of observation (EventStore or list of events with float times if not possible)
+        the events can be filtered by subjects and behaviors in the database
+        """
+
+        query, parameters = "SELECT time, subject, code, modifier, comment FROM events WHERE observation = ?", [self.obsId]
+        for column, values in (("subject", subjects), ("code", behaviors)):
+            if values is not None:
+                query += " AND {} IN ({})".format(column, ",".join(["?"] * len(values)))
+                parameters.extend(values)
+
+        db = connect(self.fileName)
+        try:
+            rows = db.execute(query + " ORDER BY time, subject, code, modifier, comment", parameters).fetchall()
+        finally:
+            db.close()
+
+        store = EventStore.from_events(rows)
+        return store if store is not None else [list(row) for row in rows]
+
+
+    def subjects_behaviors(self):
+        """
+        returns the set of (subject, behavior) observed in observation
+        """
+        db = connect(self.fileName)
+        try:
+            return set(db.execute("SELECT DISTINCT subject, code FROM events WHERE observation = ?", (self.obsId,)).fetchall())
+        finally:
+            db.close()
+
+
+    def last_time(self):
+        """
+        returns the time (float) of the last event of observation (None if observation has no events)
+        """
+        db = connect(self.fileName)
+        try:
+            return db.execute("SELECT MAX(time) FROM events WHERE observation = ?", (self.obsId,)).fetchone()[0]
+        finally:
+            db.close()
+
+
+def load(fileName):
+    """
+    returns project from database
+    the events are not loaded (SqliteEvents)
+    """
+
+    logging.debug("load project database: {}".format(fileName))
+
+    db = connect(fileName)
+    try:
+        pj = dict([(key, json.loads(value)) for key, value in db.execute("SELECT key, value FROM project")])
+        for table, key in ((ETHOGRAM, "ethogram"), (SUBJECTS, "subjects"), ("coding_map", "coding_maps")):
+            pj[table] = dict([(idx, json.loads(value)) for idx, value in db.execute("SELECT * FROM {}".format(key))])
+        pj[OBSERVATIONS] = {}
+        for obsId, value in db.execute("SELECT observation, value FROM observations ORDER BY rowid"):
+            pj[OBSERVATIONS][obsId] = dict(json.loads(value), **{EVENTS: SqliteEvents(fileName, obsId)})
+    finally:
+        db.close()
+
+    return pj
+
+
+def event_row(event):
+    """
+    returns the values of event in events table (without observation)
+    """
+    return (float(event[EVENT_TIME_FIELD_IDX]), event[EVENT_SUBJECT_FIELD_IDX], event[EVENT_BEHAVIOR_FIELD_IDX],
+            event[EVENT_MODIFIER_FIELD_IDX], event[COMMENT_EVENT_FIELD_IDX])
+
+
+def write_values(db, table, key, values):
+    """
+    update the rows (key, value) of table with values (dictionary key -> value in JSON)
+    only the rows changed are written (the rows updated keep their rowid)
+    """
+    current = dict(db.execute("SELECT {}, value FROM {}".format(key, table)))
+    for k in values:
+        if k not in current:
+            db.execute("INSERT INTO {} VALUES (?, ?)".format(table), (k, values[k]))
+        elif current[k] != values[k]:
+            db.execute("UPDATE {} SET value = ? WHERE {} = ?".format(table, key), (values[k], k))
+    for k in current:
+        if k not in values:
+            db.execute("DELETE FROM {} WHERE {} = ?".format(table, key), (k,))
+
+
+def write_events(db, obsId, events):
+    """
+    update the events of observation in events table with single-row statements:
+    the rows of events not changed are kept, the rows of events removed are replaced by the new events (by rowid),
+    the remaining rows are deleted and the remaining new events are inserted
+
+    returns the number of rows written
+    """
+
+    rows = {}   # event values -> rowids
+    for row in db.execute("SELECT rowid, time, subject, code, modifier, comment FROM events WHERE observation = ? ORDER BY rowid", (obsId,)):
+        rows.setdefault(tuple(row[1:]), []).append(row[0])
+
+    # new observation
+    if not rows:
+        db.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?)", [(obsId,) + event_row(event) for event in events])
+        return len(events)
+
+    new = []
+    for event in [event_row(event) for event in events]:
+        if rows.get(event):
+            rows[event].pop(0)
+        else:
+            new.append(event)
+    removed = [rowid for rowids in rows.values() for rowid in rowids]
+
+    for rowid, event in zip(removed, new):
+        db.execute("UPDATE events SET time = ?, subject = ?, code = ?, modifier = ?, comment = ? WHERE rowid = ?", event + (rowid,))
+    for rowid in removed[len(new):]:
+        db.execute("DELETE FROM events WHERE rowid = ?", (rowid,))
+    for event in new[len(removed):]:
+        db.execute("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?)", (obsId,) + event)
+
+    return max(len(removed), len(new))
+
+
+def write(db, pj, fileName, default, unchanged=()):
+    """
+    write project in database (in one transaction)
+    only the rows changed are written (see write_values and write_events),
+    the events of observations not loaded from this database are not read
+
+    default -- function for the JSON serialization of decimals
+    unchanged -- observations with events not changed since they were written in database (not read)
+    """
+
+    with db:
+        write_values(db, "project", "key",
+                     dict([(key, json.dumps(pj[key], default=default)) for key in pj if key not in [ETHOGRAM, SUBJECTS, OBSERVATIONS, "coding_map"]]))
+
+        for table, key in ((ETHOGRAM, "ethogram"), (SUBJECTS, "subjects"), ("coding_map", "coding_maps")):
+            write_values(db, key, "name" if key == "coding_maps" else "idx",
+                         dict([(idx, json.dumps(value, default=default)) for idx, value in pj.get(table, {}).items()]))
+
+        write_values(db, "observations", "observation",
+                     dict([(obsId, json.dumps(dict([(key, pj[OBSERVATIONS][obsId][key]) for key in pj[OBSERVATIONS][obsId] if key != EVENTS]),
+                                              default=default))
+                           for obsId in pj[OBSERVATIONS]]))
+
+        count = 0
+        for obsId in pj[OBSERVATIONS]:
+            if obsId in unchanged:
+                continue
+            events = pj[OBSERVATIONS][obsId][EVENTS]
+            if isinstance(events, SqliteEvents):
+                if events.fileName == os.path.abspath(fileName) and events.obsId == obsId:
+                    continue
+                events = events.load()
+            if isinstance(events, EventStore):
+                events = events.to_json()
+            count += write_events(db, obsId, events)
+
+        # events of deleted observations
+        db.execute("DELETE FROM events WHERE observation NOT IN (SELECT observation FROM observations)")
+
+    logging.debug("rows of events written: {}".format(count))
+
+
+def save(pj, fileName, default, update=False, unchanged=()):
+    """
+    save project in database
+
+    update -- True if the database is the project file to update (only the events of loaded observations are rewritten)
+              else a new database is written in a temporary file that replaces the project file when complete
+    unchanged -- observations with events not changed since they were written in database (only if update)
+    """
+
+    logging.debug("save project database: {}".format(fileName))
+
+    if update:
+        db = connect(fileName)
+        try:
+            write(db, pj, fileName, default, unchanged)
+        finally:
+            db.close()
+        return
+
+    tmpFileName = fileName + ".tmp"
+    if os.path.isfile(tmpFileName):
+        os.remove(tmpFileName)
+    try:
+        db = sqlite3.connect(tmpFileName)
+        try:
+            for statement in SCHEMA:
+                db.execute(statement)
+            write(db, pj, tmpFileName, default)
+            db.execute("PRAGMA journal_mode=WAL")
+        finally:
+            db.close()
+        os.replace(tmpFileName, fileName)
+    except:
+        if os.path.isfile(tmpFileName):
+            os.remove(tmpFileName)
+        raise
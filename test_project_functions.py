@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+"""
+BORIS
+Behavioral Observation Research Interactive Software
+Copyright 2012-2016 Olivier Friard
+
+This file is part of BORIS.
+
+  BORIS is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 3 of the License, or
+  any later version.
+
+  BORIS is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not see <http://www.gnu.org/licenses/>.
+
+
+Tests of the loading and saving of projects (without Qt)
+run with: python3 -m unittest test_project_functions
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from decimal import Decimal
+
+from config import *
+import project_functions
+import time_budget_analysis
+
+
+def project(events):
+    """
+    returns a project with the observations events (dictionary observation id -> events)
+    """
+    pj = {"project_name": "test", "project_date": "", "project_description": "", "time_format": HHMMSS, "coding_map": {},
+          ETHOGRAM: {"0": {"key": "A", "code": "a", TYPE: "Point event", "description": "", "modifiers": "", "excluded": ""},
+                     "1": {"key": "B", "code": "b", TYPE: "State event", "description": "", "modifiers": "", "excluded": ""}},
+          SUBJECTS: {"0": {"key": "1", "name": "s1", "description": ""}},
+          OBSERVATIONS: {}}
+    for obsId in events:
+        pj[OBSERVATIONS][obsId] = {TYPE: LIVE, FILE: {PLAYER1: [], PLAYER2: []}, "date": "", "description": obsId,
+                                   TIME_OFFSET: 0, TIME_OFFSET_SECOND_PLAYER: 0, EVENTS: events[obsId]}
+    return pj
+
+
+class TestProjectFormats(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+
+    def test_sqlite_round_trip_times_with_4_decimals(self):
+        events = {"obs1": [[12.3456, "s1", "a", "", ""], [20.0, "", "b", "", "comment"]],
+                  "obs2": [[1.5, "s1", "a", "", ""]]}
+        with open(self.path("project.boris"), "w") as f:
+            json.dump(project(events), f)
+        pj, _ = project_functions.load_project(self.path("project.boris"))
+        project_functions.save_project(pj, self.path("project.sqlite"), project_functions.SQLITE_FORMAT)
+
+        # observations not opened converted to the other formats
+        for fileFormat in (project_functions.JSON_FORMAT, project_functions.COMPACT_FORMAT, project_functions.SQLITE_FORMAT):
+            pj, _ = project_functions.load_project(self.path("project.sqlite"))
+            project_functions.save_project(pj, self.path(fileFormat), fileFormat)
+            pj, _ = project_functions.load_project(self.path(fileFormat))
+            self.assertEqual(pj[OBSERVATIONS]["obs1"][EVENTS], [[Decimal("12.3456"), "s1", "a", "", ""], [Decimal("20.0"), "", "b", "", "comment"]])
+            self.assertEqual(pj[OBSERVATIONS]["obs2"][EVENTS], [[Decimal("1.5"), "s1", "a", "", ""]])
+
+
+class TestLazyObservations(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(os.path.join(self.directory, "project.boris"), "w") as f:
+            json.dump(project(dict([("obs{}".format(idx), [[idx + 0.5, "s1", "a", "", ""], [idx + 1.25, "", "b", "", ""]])
+                                    for idx in range(10)])), f)
+
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+    def load(self, fileFormat):
+        """
+        returns the test project loaded from a project file in fileFormat
+        """
+        fileName = os.path.join(self.directory, "project.boris")
+        if fileFormat != project_functions.JSON_FORMAT:
+            pj, _ = project_functions.load_project(fileName)
+            fileName = os.path.join(self.directory, fileFormat)
+            project_functions.save_project(pj, fileName, fileFormat)
+        return project_functions.load_project(fileName)[0]
+
+
+    def test_metadata_access_does_not_convert_events(self):
+        for fileFormat in (project_functions.JSON_FORMAT, project_functions.SQLITE_FORMAT, project_functions.DIRECTORY_FORMAT):
+            pj = self.load(fileFormat)
+            for obsId in pj[OBSERVATIONS]:
+                self.assertEqual(pj[OBSERVATIONS][obsId]["description"], obsId)
+                self.assertEqual(pj[OBSERVATIONS][obsId].get(TYPE), LIVE)
+            self.assertEqual(len(pj[OBSERVATIONS].undecoded), 10)
+            # events of SQLite project files not read
+            if fileFormat == project_functions.SQLITE_FORMAT:
+                self.assertFalse([obsId for obsId, observation in pj[OBSERVATIONS].raw().items()
+                                  if not isinstance(observation[EVENTS], project_functions.SqliteEvents)])
+
+            self.assertEqual(pj[OBSERVATIONS]["obs2"][EVENTS], [[Decimal("2.5"), "s1", "a", "", ""], [Decimal("3.25"), "", "b", "", ""]])
+            self.assertEqual(pj[OBSERVATIONS].undecoded, set(pj[OBSERVATIONS]) - {"obs2"})
+
+
+    def test_last_event_time_does_not_read_events(self):
+        for fileFormat in (project_functions.JSON_FORMAT, project_functions.COMPACT_FORMAT, project_functions.SQLITE_FORMAT):
+            pj = self.load(fileFormat)
+            self.assertEqual([project_functions.last_event_time(pj, obsId) for obsId in sorted(pj[OBSERVATIONS])],
+                             [Decimal(idx) + Decimal("1.25") for idx in range(10)])
+            self.assertEqual(len(pj[OBSERVATIONS].undecoded), 10)
+            pj[OBSERVATIONS]["obs1"][EVENTS] = []
+            self.assertEqual(project_functions.last_event_time(pj, "obs1"), 0)
+
+
+    def test_batch_time_budget_does_not_convert_events(self):
+        # selection, lengths and time budget as in boris_batch.time_budget
+        for fileFormat in (project_functions.JSON_FORMAT, project_functions.COMPACT_FORMAT, project_functions.SQLITE_FORMAT):
+            results = []
+            for decoded in (False, True):
+                pj = self.load(fileFormat)
+                if decoded:
+                    for obsId in pj[OBSERVATIONS]:
+                        pj[OBSERVATIONS][obsId][EVENTS]
+                selectedObservations = sorted(pj[OBSERVATIONS])
+                selectedSubjects, selectedBehaviors = project_functions.default_selection(pj, selectedObservations)
+                self.assertEqual((selectedSubjects, selectedBehaviors), ([NO_FOCAL_SUBJECT, "s1"], ["a", "b"]))
+                lengths = [project_functions.observation_length(pj, obsId) for obsId in selectedObservations]
+                results.append(time_budget_analysis.time_budget(
+                    dict([(obsId, project_functions.observation_events(pj, obsId, selectedBehaviors)) for obsId in selectedObservations]),
+                    {"a": "Point event", "b": "State event"}, selectedSubjects, selectedBehaviors, False, False, 0, float(sum(lengths))))
+                self.assertEqual(len(pj[OBSERVATIONS].undecoded), 0 if decoded else 10)
+            self.assertEqual(results[0], results[1])
+
+
+    def test_project_metadata_hash_ignores_events(self):
+        pj = self.load(project_functions.JSON_FORMAT)
+        hash_ = project_functions.project_metadata_hash(pj)
+        self.assertEqual(len(pj[OBSERVATIONS].undecoded), 10)
+        pj[OBSERVATIONS]["obs1"][EVENTS].append([Decimal("20.0"), "s1", "a", "", ""])
+        self.assertEqual(project_functions.project_metadata_hash(pj), hash_)
+
+        for change in (lambda pj: pj[OBSERVATIONS]["obs2"].update({"description": "changed"}),
+                       lambda pj: pj[OBSERVATIONS].__setitem__("new", dict(pj[OBSERVATIONS]["obs3"].items(), **{EVENTS: []})),
+                       lambda pj: pj[ETHOGRAM]["0"].update({"code": "c"})):
+            change(pj)
+            self.assertNotEqual(project_functions.project_metadata_hash(pj), hash_)
+            hash_ = project_functions.project_metadata_hash(pj)
+
+
+    def test_metadata_changed_without_events_access_is_saved(self):
+        for fileFormat in (project_functions.SQLITE_FORMAT, project_functions.DIRECTORY_FORMAT):
+            pj = self.load(fileFormat)
+            pj[OBSERVATIONS]["obs3"]["media_info"] = {"length": {}, "fps": {}}
+            pj[OBSERVATIONS]["obs3"]["media_info"]["length"]["video.mp4"] = 60.0
+            project_functions.save_project(pj, os.path.join(self.directory, fileFormat))
+            self.assertEqual(len(pj[OBSERVATIONS].undecoded), 10)
+
+            pj = project_functions.load_project(os.path.join(self.directory, fileFormat))[0]
+            self.assertEqual(pj[OBSERVATIONS]["obs3"]["media_info"]["length"], {"video.mp4": 60.0})
+            self.assertEqual(pj[OBSERVATIONS]["obs3"][EVENTS], [[Decimal("3.5"), "s1", "a", "", ""], [Decimal("4.25"), "", "b", "", ""]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+
+"""
+BORIS
+Behavioral Observation Research Interactive Software
+Copyright 2012-2016 Olivier Friard
+
+This file is part of BORIS.
+
+  BORIS is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 3 of the License, or
+  any later version.
+
+  BORIS is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not see <http://www.gnu.org/licenses/>.
+
+
+Time budget computation
+
+events are grouped in one pass by subject, behavior and modifiers (if included),
+then durations and inter-event intervals of each group are computed with numpy
+"""
+
+import statistics
+import numpy as np
+
+from config import *
+from event_store import EventStore
+
+
+def mean_stdev(values):
+    """
+    return mean and standard deviation (rounded to 3 decimals) of values
+    "NA" if not available
+
+    the statistics module is used for exact rounding of results
+    """
+    values = values.tolist()
+    mean = round(statistics.mean(values), 3) if len(values) else "NA"
+    stdev = round(statistics.stdev(values), 3) if len(values) > 1 else "NA"
+    return mean, stdev
+
+
+def observation_groups(events, rank, selectedSubjects, selectedBehaviors, includeModifiers):
+    """
+    group the events of an observation by (subject, behavior) and then by modifiers (modifiers are in order of first occurence)
+
+    events -- list of events or EventStore
+    rank -- rank of observation in the selected observations
+    return dictionary {(subject, behavior): {modifiers: (times array, observations ranks array)}}
+    """
+
+    if isinstance(events, EventStore):
+        return store_groups(events, rank, selectedSubjects, selectedBehaviors, includeModifiers)
+
+    selectedSubjects, selectedBehaviors = set(selectedSubjects), set(selectedBehaviors)
+
+    groups = {}
+    for event in events:
+        subject = NO_FOCAL_SUBJECT if event[EVENT_SUBJECT_FIELD_IDX] == "" else event[EVENT_SUBJECT_FIELD_IDX]
+        if subject not in selectedSubjects or event[EVENT_BEHAVIOR_FIELD_IDX] not in selectedBehaviors:
+            continue
+        modifiers = groups.setdefault((subject, event[EVENT_BEHAVIOR_FIELD_IDX]), {})
+        modifiers.setdefault(event[EVENT_MODIFIER_FIELD_IDX] if includeModifiers else "", []).append(float(event[EVENT_TIME_FIELD_IDX]))
+
+    for k in groups:
+        for modifier in groups[k]:
+            times = np.sort(np.array(groups[k][modifier], dtype=float), kind="mergesort")
+            groups[k][modifier] = (times, np.full(len(times), rank, dtype=int))
+
+    return groups
+
+
+def store_groups(store, rank, selectedSubjects, selectedBehaviors, includeModifiers):
+    """
+    group the events of an EventStore (see observation_groups)
+    the events are selected and grouped on the arrays of indexes of strings
+    """
+
+    subjects = store.codes_array(EVENT_SUBJECT_FIELD_IDX)
+    behaviors = store.codes_array(EVENT_BEHAVIOR_FIELD_IDX)
+    modifiers = store.codes_array(EVENT_MODIFIER_FIELD_IDX) if includeModifiers else np.zeros(len(store), dtype=np.int32)
+
+    # "" is the subject of events without focal subject
+    subjectsCodes = store.string_codes([subject for subject in selectedSubjects if subject] + ([""] if NO_FOCAL_SUBJECT in selectedSubjects else []))
+    selected = np.nonzero(np.isin(subjects, subjectsCodes) & np.isin(behaviors, store.string_codes(selectedBehaviors)))[0]
+
+    nStrings = len(store.strings)
+    keys = (subjects[selected].astype(np.int64) * nStrings + behaviors[selected]) * nStrings + modifiers[selected]
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+    # events of each group in order of time
+    times = store.times_array()[selected]
+    order = np.lexsort((times, inverse))
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(inverse, minlength=len(first)))))
+
+    groups = {}
+    # groups in order of first occurence
+    for group in np.argsort(first, kind="mergesort"):
+        eventIdx = selected[first[group]]
+        subject = store.strings[subjects[eventIdx]]
+        k = (NO_FOCAL_SUBJECT if subject == "" else subject, store.strings[behaviors[eventIdx]])
+        modifier = store.strings[modifiers[eventIdx]] if includeModifiers else ""
+        groupTimes = times[order[bounds[group]:bounds[group + 1]]]
+        # events without focal subject and events of a subject named NO_FOCAL_SUBJECT are in the same group
+        if modifier in groups.get(k, {}):
+            groupTimes = np.sort(np.concatenate((groups[k][modifier][0], groupTimes)), kind="mergesort")
+        groups.setdefault(k, {})[modifier] = (groupTimes, np.full(len(groupTimes), rank, dtype=int))
+
+    return groups
+
+
+def merge_groups(groupsList):
+    """
+    merge the groups of events of observations
+    groupsList -- groups of observations in order of selection
+    the events of each group are sorted by observation rank and time
+    """
+
+    merged = {}
+    for groups in groupsList:
+        for k in groups:
+            modifiers = merged.setdefault(k, {})
+            for modifier in groups[k]:
+                modifiers.setdefault(modifier, []).append(groups[k][modifier])
+
+    for k in merged:
+        for modifier in merged[k]:
+            times = np.concatenate([x[0] for x in merged[k][modifier]])
+            ranks = np.concatenate([x[1] for x in merged[k][modifier]])
+            order = np.lexsort((times, ranks))
+            merged[k][modifier] = (times[order], ranks[order])
+
+    return merged
+
+
+def observations_ranks(events):
+    """
+    rank of observations in alphabetic order
+
+    events -- dictionary of events (lists or EventStore) by observation id
+    """
+    return dict((obsId, rank) for rank, obsId in enumerate(sorted(events)))
+
+
+def group_events(events, selectedSubjects, selectedBehaviors, includeModifiers):
+    """
+    group events by (subject, behavior) and then by modifiers (modifiers are in order of first occurence)
+
+    events -- dictionary of events (lists or EventStore) by observation id
+    return dictionary {(subject, behavior): {modifiers: (times array, observations ranks array)}}
+    the events of each group are sorted by observation id and time
+    """
+
+    obsRank = observations_ranks(events)
+
+    return merge_groups([observation_groups(events[obsId], obsRank[obsId], selectedSubjects, selectedBehaviors, includeModifiers) for obsId in events])
+
+
+def point_results(times, ranks, startTime, endTime, oneObservation):
+    """
+    number of events and inter-event intervals for point events
+    """
+
+    if oneObservation:
+        mask = (times >= startTime) & (times <= endTime)
+        times, ranks = times[mask], ranks[mask]
+
+    # inter events duration if same observation
+    interDurations = np.diff(times)[ranks[1:] == ranks[:-1]]
+
+    interMean, interStdev = mean_stdev(interDurations)
+
+    return {"duration": "-",
+            "duration_mean": "-",
+            "duration_stdev": "-",
+            "number": len(times),
+            "inter_duration_mean": interMean,
+            "inter_duration_stdev": interStdev}
+
+
+def state_results(times, ranks, startTime, endTime, oneObservation):
+    """
+    durations and inter-event intervals for state events (events are paired start/stop)
+    """
+
+    if len(times) % 2:
+        return {"duration": UNPAIRED, "duration_mean": UNPAIRED, "duration_stdev": UNPAIRED,
+                "number": UNPAIRED, "inter_duration_mean": UNPAIRED, "inter_duration_stdev": UNPAIRED}
+
+    starts, stops = times[0::2], times[1::2]
+
+    if oneObservation:
+        # remove events outside of interval and clip the others
+        inside = ~(((starts < startTime) & (stops < startTime)) | ((starts > endTime) & (stops > endTime)))
+        starts, stops = np.maximum(starts[inside], startTime), np.minimum(stops[inside], endTime)
+
+    durations = stops - starts
+
+    # inter event if same observation and inside the interval
+    previousStops, nextStarts = times[1:-1:2], times[2::2]
+    mask = ((ranks[1:-1:2] == ranks[2::2])
+            & (previousStops >= startTime) & (previousStops <= endTime)
+            & (nextStarts >= startTime) & (nextStarts <= endTime))
+    interDurations = (nextStarts - previousStops)[mask]
+
+    durationMean, durationStdev = mean_stdev(durations)
+    interMean, interStdev = mean_stdev(interDurations)
+
+    return {"duration": round(sum(durations.tolist()), 3),
+            "duration_mean": durationMean,
+            "duration_stdev": durationStdev,
+            "number": len(durations),
+            "inter_duration_mean": interMean,
+            "inter_duration_stdev": interStdev}
+
+
+def time_budget(events, eventTypes, selectedSubjects, selectedBehaviors, includeModifiers, excludeBehaviors, startTime, endTime, groups=None):
+    """
+    return time budget of selected subjects and behaviors as a list of dictionaries
+    (keys: subject, behavior, modifiers, duration, duration_mean, duration_stdev, number, inter_duration_mean, inter_duration_stdev)
+
+    events -- dictionary of events (lists or EventStore) by observation id (selected observations)
+    eventTypes -- dictionary of type of event by behavior code
+    startTime, endTime -- interval of analysis (events are clipped only if one observation is selected)
+    groups -- events already grouped (see merge_groups), events are grouped if None
+    """
+
+    oneObservation = len(events) == 1
+    startTime, endTime = float(startTime), float(endTime)
+
+    if groups is None:
+        groups = group_events(events, selectedSubjects, selectedBehaviors, includeModifiers)
+
+    out = []
+    for subject in selectedSubjects:
+
+        for behavior in selectedBehaviors:
+
+            eventType = eventTypes.get(behavior, "").upper()
+            modifiers = groups.get((subject, behavior), {})
+
+            if includeModifiers:
+
+                if not modifiers:
+                    if not excludeBehaviors:
+                        out.append({"subject": subject, "behavior": behavior, "modifiers": "-",
+                                    "duration": "-", "duration_mean": "-", "duration_stdev": "-", "number": 0,
+                                    "inter_duration_mean": "-", "inter_duration_stdev": "-"})
+                    continue
+
+                for modifier in modifiers:
+                    times, ranks = modifiers[modifier]
+                    if POINT in eventType:
+                        out.append(dict({"subject": subject, "behavior": behavior, "modifiers": modifier},
+                                        **point_results(times, ranks, startTime, endTime, oneObservation)))
+                    if STATE in eventType:
+                        out.append(dict({"subject": subject, "behavior": behavior, "modifiers": modifier},
+                                        **state_results(times, ranks, startTime, endTime, oneObservation)))
+
+            else:  # no modifiers
+
+                times, ranks = modifiers.get("", (np.array([], dtype=float), np.array([], dtype=int)))
+
+                if POINT in eventType:
+
+                    results = point_results(times, ranks, startTime, endTime, oneObservation)
+                    if not results["number"]:
+                        if not excludeBehaviors:
+                            out.append({"subject": subject, "behavior": behavior, "modifiers": "NA",
+                                        "duration": "-", "duration_mean": "-", "duration_stdev": "-", "number": 0,
+                                        "inter_duration_mean": "-", "inter_duration_stdev": "-"})
+                        continue
+
+                    out.append(dict({"subject": subject, "behavior": behavior, "modifiers": "NA"}, **results))
+
+                if STATE in eventType:
+
+                    if not len(times):
+                        if not excludeBehaviors:  # include behaviors without events
+                            out.append({"subject": subject, "behavior": behavior, "modifiers": "NA",
+                                        "duration": 0, "duration_mean": 0, "duration_stdev": "NA", "number": 0,
+                                        "inter_duration_mean": "-", "inter_duration_stdev": "-"})
+                        continue
+
+                    out.append(dict({"subject": subject, "behavior": behavior, "modifiers": "NA"},
+                                    **state_results(times, ranks, startTime, endTime, oneObservation)))
+
+    return out
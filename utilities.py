@@ -22,12 +22,17 @@ Copyright 2012-2016 Olivier Friard
 
 """
 
+flagQt = True
 try:
     from PyQt5.QtCore import *
     from PyQt5.QtWidgets import *
 except:
-    from PyQt4.QtCore import *
-    from PyQt4.QtGui import *
+    try:
+        from PyQt4.QtCore import *
+        from PyQt4.QtGui import *
+    except:
+        # without Qt only the functions not using Qt are available (command line analysis)
+        flagQt = False
 
 
 import math
@@ -38,6 +43,8 @@ import sys
 import os
 import logging
 from config import *
+import media_cache
+import media_analysis
 
 from decimal import *
 import math
@@ -381,22 +388,87 @@ def accurate_media_analysis(ffmpeg_bin, fileName):
 
     return int(fps * duration), duration*1000, duration, fps, hasVideo, hasAudio
 
-class ThreadSignal(QObject):
-    sig = pyqtSignal(int, float, float, float, bool, bool, str, str, str)
 
-class Process(QThread):
+# extensions of files that are not analysed when a directory of media files is added
+NON_MEDIA_EXTENSIONS = [".txt", ".csv", ".tsv", ".json", ".xml", ".html", ".htm", ".md", ".log", ".ini", ".cfg",
+                        ".boris", ".py", ".pdf", ".doc", ".docx", ".odt", ".xls", ".xlsx", ".ods", ".db", ".sqlite",
+                        ".zip", ".gz", ".7z", ".rar", ".exe", ".dll", ".lnk", ".thm", ".lrv", ".srt"]
+
+def is_media_candidate(fileName):
     """
-    process for accurate video analysis
+    False if file is surely not a media file (directory, hidden file, known extension or text content)
+    without running ffmpeg
     """
-    def __init__(self, parent = None):
-        QThread.__init__(self, parent)
-        self.filePath = ''
-        self.ffmpeg_bin = ''
-        self.fileContentMD5 = ''
-        self.nPlayer = ''
-        self.filePath = ''
-        self.signal = ThreadSignal()
-
-    def run(self):
-        nframe, videoTime, videoDuration, fps, hasVideo, hasAudio = accurate_media_analysis( self.ffmpeg_bin, self.filePath )
-        self.signal.sig.emit(nframe, videoTime, videoDuration, fps,  hasVideo, hasAudio, self.fileContentMD5, self.nPlayer, self.filePath)
+
+    if not os.path.isfile(fileName) or os.path.basename(fileName).startswith("."):
+        return False
+
+    if os.path.splitext(fileName)[1].lower() in NON_MEDIA_EXTENSIONS:
+        return False
+
+    try:
+        with open(fileName, "rb") as f:
+            header = f.read(64)
+    except OSError:
+        return False
+
+    # empty file or text file
+    if not header or not header.translate(None, bytes(range(32, 127)) + b"\t\r\n"):
+        return False
+
+    return True
+
+
+mediaCache = media_cache.MediaCache()
+
+def cached_media_analysis(ffmpeg_bin, fileName):
+    """
+    media analysis (see accurate_media_analysis) from the media cache if the media file was already analysed
+    the media file is analysed with ffprobe if available else with ffmpeg
+    """
+
+    info = mediaCache.get(fileName)
+    if info:
+        logging.debug("media informations of {} from cache".format(fileName))
+        return info["nframe"], info["duration"] * 1000, info["duration"], Decimal(info["fps"]), info["hasVideo"], info["hasAudio"]
+
+    probe = media_analysis.probe(ffmpeg_bin, fileName)
+    if probe is None:
+        nframe, videoTime, videoDuration, fps, hasVideo, hasAudio = accurate_media_analysis(ffmpeg_bin, fileName)
+        streams = []
+    else:
+        nframe, videoDuration, fps, hasVideo, hasAudio, streams = (probe["nframes"], probe["duration"], probe["fps"],
+                                                                   probe["hasVideo"], probe["hasAudio"], probe["streams"])
+
+    # same types as informations from cache (the duration of ffmpeg analysis is a decimal)
+    nframe, videoDuration, fps = int(nframe), float(videoDuration), Decimal(str(fps))
+    videoTime = videoDuration * 1000
+
+    # a failed analysis (ffmpeg not found, file not readable) is not cached
+    if videoDuration:
+        mediaCache.put(fileName, {"nframe": nframe, "duration": videoDuration, "fps": str(fps), "hasVideo": hasVideo, "hasAudio": hasAudio,
+                                  "streams": streams})
+
+    return nframe, videoTime, videoDuration, fps, hasVideo, hasAudio
+
+if flagQt:
+
+    class ThreadSignal(QObject):
+        sig = pyqtSignal(int, float, float, float, bool, bool, str, str, str)
+
+    class Process(QThread):
+        """
+        process for accurate video analysis
+        """
+        def __init__(self, parent = None):
+            QThread.__init__(self, parent)
+            self.filePath = ''
+            self.ffmpeg_bin = ''
+            self.fileContentMD5 = ''
+            self.nPlayer = ''
+            self.filePath = ''
+            self.signal = ThreadSignal()
+
+        def run(self):
+            nframe, videoTime, videoDuration, fps, hasVideo, hasAudio = cached_media_analysis(self.ffmpeg_bin, self.filePath)
+            self.signal.sig.emit(nframe, videoTime, videoDuration, fps,  hasVideo, hasAudio, self.fileContentMD5, self.nPlayer, self.filePath)